@@ -1,9 +1,13 @@
 from collections import Counter
 from enum import Enum
+import inspect
 import math
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import random
 
+from StateView import EMPTY_FRONTIER, EMPTY_MANOEUVRES, FrontierView, ManoeuvreView
+from TurnPlan import TurnPlan
+
 
 class Colour(Enum):
     SEA = (0, 255, 255),
@@ -45,8 +49,9 @@ class Player():
         self.unassigned_units = unassigned_units
         self.cards = [0, 0, 0]
         self.personal_territories_hash = ""
-        self.manoeuvreable_tiles = {}
-        self.adjacent_territories_cache = []
+        self.territories_version = 0
+        self.manoeuvreable_tiles = EMPTY_MANOEUVRES
+        self.adjacent_territories_cache = EMPTY_FRONTIER
         self.base_reinforcement = 3
         
         self.card_value_dict = {
@@ -58,6 +63,7 @@ class Player():
 
     def reset(self):
         self.personal_territories = {}
+        self.territories_version += 1
         self.cards = [0, 0, 0]
         self.unassigned_units = self.base_unassigned
 
@@ -79,6 +85,7 @@ class Player():
         if num_units > 0:
 
             self.personal_territories[territory.id] = territory
+            self.territories_version += 1
             territory.owner = self
             territory.set_troop_count(num_units)
             return None
@@ -87,6 +94,7 @@ class Player():
 
     def remove_player_territory(self, territory: 'Territory') -> None:
         del self.personal_territories[territory.id]
+        self.territories_version += 1
         return None
 
     def give_player_units(self, number_of_units: int, ) -> None:
@@ -118,12 +126,7 @@ class Player():
         # Base reinforcement based on the number of territories
 
         if changed:
-            reinforcement_count = max(3, math.floor(len(self.personal_territories) / 3))
-
-            # Add region bonuses if the player owns all territories in the region
-            owned_regions = {region for region in Region if self.owns_all_territories_in_region(region)}
-            reinforcement_count += sum(REGION_BONUSES[region] for region in owned_regions)
-            self.base_reinforcement = reinforcement_count
+            reinforcement_count = self.calculate_base_reinforcement()
         else:
             reinforcement_count = self.base_reinforcement
 
@@ -144,10 +147,20 @@ class Player():
 
         return reinforcement_count
     
+    def calculate_base_reinforcement(self) -> int:
+        reinforcement_count = max(3, math.floor(len(self.personal_territories) / 3))
+
+        # Add region bonuses if the player owns all territories in the region
+        owned_regions = {region for region in Region if self.owns_all_territories_in_region(region)}
+        reinforcement_count += sum(REGION_BONUSES[region] for region in owned_regions)
+        self.base_reinforcement = reinforcement_count
+        return reinforcement_count
+
     def personal_territories_changed(self):
         
-        if hash(frozenset(set(self.personal_territories))) != self.personal_territories_hash:
-            self.personal_territories_hash = hash(frozenset(set(self.personal_territories)))
+        # territories_version is bumped on every gain or loss, so no set needs hashing
+        if self.territories_version != self.personal_territories_hash:
+            self.personal_territories_hash = self.territories_version
             return True
         else:
             
@@ -190,13 +203,22 @@ class Player():
         pass
 
     # Abstract
-    def invade(self, adjacent_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def invade(self, adjacent_territories: FrontierView) -> Tuple['Territory', 'Territory', int]:
         pass
 
     # Abstract
-    def manoeuvre(self, manoeuverable_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def manoeuvre(self, manoeuverable_territories: ManoeuvreView) -> Tuple['Territory', 'Territory', int]:
         pass
 
+    # Optional: decide the whole turn at once and have the game execute it (see TurnPlan).
+    # None keeps the reinforce/invade/manoeuvre callbacks for this turn.
+    def plan_turn(self, total_reinforcements : int) -> TurnPlan:
+        return None
+
+    # Optional: a planned step can no longer be carried out; return a replacement step or None to drop it
+    def on_invalid_step(self, step, reason : str):
+        return None
+
 
 class RandomAgent(Player):
     def make_selection(self, available_territories: List['Territory']) -> 'Territory':
@@ -219,18 +241,16 @@ class RandomAgent(Player):
 
         return reinforcement_allocation
 
-    def invade(self, adjacent_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def invade(self, adjacent_territories: FrontierView) -> Tuple['Territory', 'Territory', int]:
         max_troops_territory = max(self.personal_territories.values(), key=lambda t: t.troop_count)
 
         if max_troops_territory.troop_count <= 3:
             return None
 
-        adjacent_enemy_territories = []
-        for territory, adjacents in adjacent_territories:
-            if territory == max_troops_territory:
-                for adjacent in adjacents:
-                    if adjacent.get_owner().id != self.id:
-                        adjacent_enemy_territories.append(adjacent)
+        adjacent_enemy_territories = [
+            adjacent for adjacent in adjacent_territories.targets(max_troops_territory)
+            if adjacent.get_owner().id != self.id
+        ]
 
         if not adjacent_enemy_territories:
             return None
@@ -241,7 +261,7 @@ class RandomAgent(Player):
         return max_troops_territory, min_troops_enemy_territory, troops_to_use
 
 
-    def manoeuvre(self, manoeuverable_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def manoeuvre(self, manoeuverable_territories: ManoeuvreView) -> Tuple['Territory', 'Territory', int]:
         # Filter out territories that don't have enough troops to manoeuvre
         valid_manoeuverable_territories = [
             (source, targets) for source, targets in manoeuverable_territories
@@ -264,3 +284,33 @@ class RandomAgent(Player):
 
     def get_player_name(self):
         return (f"Random Agent {self.id}")
+
+
+class AgentPolicy():
+    # Immutable description of an agent: its Player subclass and constructor arguments (for an
+    # evolved agent, its genome). The Player objects playing a game are seats created from it,
+    # each with its own territories, cards and caches, so one policy can fill several seats of
+    # the same game. Argument values are shared by every seat and must be treated as read-only.
+
+    def __init__(self, agent_class: type, **kwargs):
+        object.__setattr__(self, "agent_class", agent_class)
+        object.__setattr__(self, "arguments", tuple(sorted(kwargs.items())))
+        # Agents that search the board (e.g. MCTSAgent) are handed the game's territories
+        object.__setattr__(self, "takes_territories", "territories" in inspect.signature(agent_class).parameters)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AgentPolicy is immutable")
+
+    @property
+    def kwargs(self) -> dict:
+        return dict(self.arguments)
+
+    def create_seat(self, id: int, unassigned_units: int, territories: Dict[int, 'Territory'] = None) -> Player:
+        kwargs = dict(self.arguments)
+        if self.takes_territories:
+            kwargs["territories"] = territories
+        return self.agent_class(id, unassigned_units, **kwargs)
+
+    def __repr__(self) -> str:
+        arguments = ", ".join(f"{name}={value!r}" for name, value in self.arguments)
+        return f"AgentPolicy({self.agent_class.__name__}{', ' if arguments else ''}{arguments})"
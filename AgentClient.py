@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import traceback
+from typing import Callable, Dict
+
+from Agent import Player
+from RiskUI import Game, create_territories
+from TournamentServer import encode_frame, read_frame
+from Viewer import ReplayPlayer
+
+
+def load_agent_factory(class_path: str) -> Callable[[int, int, Dict[int, 'Territory']], Player]:
+    # "module.Class"; agents that take the board (e.g. MCTSAgent) get the mirrored territories
+    module_name, class_name = class_path.rsplit(".", 1)
+    agent_class = getattr(importlib.import_module(module_name), class_name)
+    if "territories" in inspect.signature(agent_class).parameters:
+        return lambda id, unassigned_units, territories: agent_class(id, unassigned_units, territories=territories)
+    return lambda id, unassigned_units, territories: agent_class(id, unassigned_units)
+
+
+class AgentMirror():
+    # Local copy of one seat of one server game, kept in sync from the state vectors in requests
+
+    def __init__(self, seat: int, agent_factory: Callable[[int, int, Dict[int, 'Territory']], Player]):
+        territories = create_territories()
+        self.game = Game([], territories, simulating=True)
+        self.agent = agent_factory(seat, 0, territories)
+        self.players_by_id = {seat: self.agent}
+
+    def apply_state(self, state: list) -> None:
+        owners, troops = state
+        for owner_id in owners:
+            if owner_id != -1 and owner_id not in self.players_by_id:
+                self.players_by_id[owner_id] = ReplayPlayer(owner_id, str(owner_id))
+        self.game.apply_snapshot((0, -1, owners, troops), self.players_by_id)
+        return None
+
+    def handle(self, method: str, args: list) -> object:
+        agent = self.agent
+        territories = self.game.territories
+        if method == "make_selection":
+            return agent.make_selection([territories[territory_id] for territory_id in args[0]]).id
+        if method == "add_infantry":
+            return agent.add_infantry().id
+        if method == "reinforce":
+            return [[territory.id, count] for territory, count in agent.reinforce(args[0])]
+        if method == "invade":
+            invasion = agent.invade(self.game.get_enemy_adjacent_territories(agent, changed=True))
+            if invasion is None:
+                return None
+            source, target, num_troops = invasion
+            return [source.id, target.id, num_troops]
+        if method == "manoeuvre":
+            source, destination, num_troops = agent.manoeuvre(self.game.get_manoeuvreable_territories(agent, changed=True))
+            if source is None:
+                return [None, None, 0]
+            return [source.id, destination.id, num_troops]
+        raise ValueError(f"Unknown method {method}")
+
+
+class AgentClient():
+
+    def __init__(self, name: str, agent_factory: Callable[[int, int, Dict[int, 'Territory']], Player]):
+        self.name = name
+        self.agent_factory = agent_factory
+        self.mirrors = {}
+
+    def handle(self, message: dict) -> object:
+        key = (message["game"], message["seat"])
+        if message["method"] == "end_game":
+            self.mirrors.pop(key, None)
+            return None
+
+        mirror = self.mirrors.get(key)
+        if mirror is None:
+            mirror = AgentMirror(message["seat"], self.agent_factory)
+            self.mirrors[key] = mirror
+        if "state" in message:
+            mirror.apply_state(message["state"])
+        return mirror.handle(message["method"], message["args"])
+
+    async def run(self, host: str, port: int) -> None:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode_frame({"hello": self.name}))
+        await writer.drain()
+        try:
+            while True:
+                message = await read_frame(reader)
+                try:
+                    result = self.handle(message)
+                except Exception:
+                    # A failing decision becomes a null reply; the server substitutes its fallback
+                    traceback.print_exc()
+                    result = None
+                if "id" in message:
+                    writer.write(encode_frame({"id": message["id"], "result": result}))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def run_client(name: str, class_path: str, host: str, port: int) -> None:
+    asyncio.run(AgentClient(name, load_agent_factory(class_path)).run(host, port))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a Player subclass to a TournamentServer")
+    parser.add_argument("name", help="agent name the server schedules by")
+    parser.add_argument("agent", help="agent class as module.Class, e.g. Agent.RandomAgent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--processes", type=int, default=1, help="connections (processes) to open under this name")
+    arguments = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=run_client, args=(arguments.name, arguments.agent, arguments.host, arguments.port))
+        for _ in range(arguments.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -1,86 +1,80 @@
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 from Agent import Player
+from StateView import FrontierView, ManoeuvreView
 import random
 from enum import Enum
 
 
+# Same values as RiskUI.Continent, which can't be imported here
+class Continent(Enum):
+    NORTH_AMERICA = 1
+    SOUTH_AMERICA = 2
+    EUROPE = 3
+    AFRICA = 4
+    ASIA = 5
+    AUSTRALIA = 6
 
 
+# Selection preference, best first; SELECTION_RANK maps a continent value to its position
+SELECTION_ORDER = (Continent.NORTH_AMERICA, Continent.SOUTH_AMERICA, Continent.AUSTRALIA, Continent.AFRICA, Continent.EUROPE, Continent.ASIA)
+SELECTION_RANK = {continent.value: rank for rank, continent in enumerate(SELECTION_ORDER)}
+
+
+# Attack bonus for targets of strategic value; shared by every AggressiveAgent
+POSITIONS_OF_INTEREST = {
+    39: 1, # Indonesia
+    9 : 1, # Central America
+    10 : 0.75, # Venezuala
+    3 : 0.75, # Greenland
+    11 : 0.75, # Brazil
+    21 : 0.75, # North Africa
+    23 : 0.5, # East Africa
+    22 : 0.5, # Egypt
+    43 : 0.5, # Alaska
+    38 : 0.25, # Siam
+    30 : 0.25, # Kamchatka
+}
+
 
 class AggressiveAgent(Player):
 
-    def __init__(self, id: int, unassigned_units: int, weightings : dict[int]):
-        self.positions_of_interest = {
-            39: 1, # Indonesia
-            9 : 1, # Central America
-            10 : 0.75, # Venezuala
-            3 : 0.75, # Greenland
-            11 : 0.75, # Brazil
-            21 : 0.75, # North Africa
-            23 : 0.5, # East Africa
-            22 : 0.5, # Egypt
-            43 : 0.5, # Alaska
-            38 : 0.25, # Siam
-            30 : 0.25, # Kamchatka
-        }
-        # self.attack_heuristic_weightings = {
-        #     1: 1, # Point of interest
-        #     2: 1, # If the territory is able to attack and gain the entire continent.
-        #     3: 1, # If it places you below max troops
-        #     4: 1, # Gives increased reinforcements  ( increasing from 13 territories to 14)
-        #     5: 1, # If you're able to find a chain of attacks
-        #     6: 1, # If the territory attack is able to decrease the number of borders.
-        #     7: 1, # If the opponent is winning
-        #     8: 1, # Troop differential
-        #     9: 1, # If it exposes you to chaining
-        #     10: 7, # Heuristic threshold
-            
-            
-        # }
+    def __init__(self, id: int, unassigned_units: int, weightings : Dict[int, float], opening_book = None):
+        # weightings is the genome, keyed like this (see GeneticAlgorithm):
+        #     1: Point of interest
+        #     2: If the territory is able to attack and gain the entire continent.
+        #     3: If it places you below max troops
+        #     4: Gives increased reinforcements  ( increasing from 13 territories to 14)
+        #     5: If you're able to find a chain of attacks
+        #     6: If the territory attack is able to decrease the number of borders.
+        #     7: If the opponent is winning
+        #     8: Troop differential
+        #     9: If it exposes you to chaining
+        #     10: Heuristic threshold
+        # It's shared with every other seat of the same AgentPolicy, so it's never modified here.
+        # opening_book: optional OpeningBook.OpeningBook used for territory selection
+        self.attack_heuristic_weightings = weightings
+        self.opening_book = opening_book
+        self.positions_of_interest = POSITIONS_OF_INTEREST
 
         super().__init__(id, unassigned_units)
 
     def make_selection(self, available_territories: List['Territory']) -> 'Territory':
-        class Continent(Enum):
-            NORTH_AMERICA = 1
-            SOUTH_AMERICA = 2
-            EUROPE = 3
-            AFRICA = 4
-            ASIA = 5
-            AUSTRALIA = 6
-        choice = random.choice(available_territories)
-        #print(choice.name)
-        #print(choice.id)
-        #print(choice.continent)
-        # Get available territories in each continent
-        # Initialize empty array to store territories
-        continents = []
-        for i in range(6):
-            continents.append([])
-        # Store each territory in respective array corresponding to a continent
-        for t in available_territories:
-            continents[t.continent.value-1].append(t)
-
-        # Create arbitrary ranks of continents
-        if len(continents[Continent.NORTH_AMERICA.value-1]) > 0:
-            choice = random.choice(continents[Continent.NORTH_AMERICA.value-1])
-        elif len(continents[Continent.SOUTH_AMERICA.value-1]) > 0:
-            choice = random.choice(continents[Continent.SOUTH_AMERICA.value-1])
-        elif len(continents[Continent.AUSTRALIA.value-1]) > 0:
-            choice = random.choice(continents[Continent.AUSTRALIA.value-1])
-        elif len(continents[Continent.AFRICA.value-1]) > 0:
-            choice = random.choice(continents[Continent.AFRICA.value-1])
-        elif len(continents[Continent.EUROPE.value-1]) > 0:
-            choice = random.choice(continents[Continent.EUROPE.value-1])
-        elif len(continents[Continent.ASIA.value-1]) > 0:
-            choice = random.choice(continents[Continent.ASIA.value-1])
-
-        # Min / max fraction
-
-        # input("Enter to continue")
-        return choice
+        if self.opening_book is not None:
+            return self.opening_book.best_pick(self, available_territories)
+
+        # Random territory from the best ranked continent that still has one free
+        best_rank = len(SELECTION_RANK)
+        candidates = []
+        for territory in available_territories:
+            rank = SELECTION_RANK[territory.continent.value]
+            if rank < best_rank:
+                best_rank = rank
+                candidates = [territory]
+            elif rank == best_rank:
+                candidates.append(territory)
+        return random.choice(candidates)
 
     def add_infantry(self) -> 'Territory':
         if not self.personal_territories:
@@ -100,7 +94,7 @@ class AggressiveAgent(Player):
 
         return reinforcement_allocation
 
-    def invade(self, adjacent_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def invade(self, adjacent_territories: FrontierView) -> Tuple['Territory', 'Territory', int]:
 
         attacking_heuristics = self.generate_attacking_heuristic(adjacent_territories)
         #valid_attacks = []
@@ -120,12 +114,10 @@ class AggressiveAgent(Player):
         if max_troops_territory.troop_count <= 3:
             return None
 
-        adjacent_enemy_territories = []
-        for territory, adjacents in adjacent_territories:
-            if territory == max_troops_territory:
-                for adjacent in adjacents:
-                    if adjacent.get_owner().id != self.id:
-                        adjacent_enemy_territories.append(adjacent)
+        adjacent_enemy_territories = [
+            adjacent for adjacent in adjacent_territories.targets(max_troops_territory)
+            if adjacent.get_owner().id != self.id
+        ]
 
         if not adjacent_enemy_territories:
             return None
@@ -230,7 +222,7 @@ class AggressiveAgent(Player):
             
 
 
-    def manoeuvre(self, manoeuverable_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def manoeuvre(self, manoeuverable_territories: ManoeuvreView) -> Tuple['Territory', 'Territory', int]:
         # Filter out territories that don't have enough troops to manoeuvre
         valid_manoeuverable_territories = [
             (source, targets) for source, targets in manoeuverable_territories
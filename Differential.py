@@ -0,0 +1,292 @@
+import argparse
+import math
+import random
+import sys
+from collections import Counter
+from typing import Callable, List, Optional, Tuple
+
+from Agent import Player
+from ForwardModel import REGION_OF, REGIONS, ForwardModel
+from RiskUI import Game, GameObserver, Territory, create_territories, starting_infantry_dict
+from Tournament import AgentConfig
+
+
+# Differential testing of the optimised engines against Game, the reference.
+#
+# Step by step: ForwardModelMirror rides along a real game as an observer, applies every action
+# the reference performs to a ForwardModel and compares the two states after each one. Dice
+# results are taken from the reference, so the deterministic rules (reinforcement, card trade-in,
+# unit cap, captures, manoeuvres) are checked exactly.
+#
+# Statistically: where an engine draws its randomness differently (ForwardModel resolves a dice
+# round with one draw from a precomputed table) states can't be compared step by step, so the
+# outcome distributions of both are compared over large batches with a chi-square test.
+
+
+class Divergence():
+
+    def __init__(self, game_index: int, turn: int, player_id: int, step: str, detail: str):
+        self.game_index = game_index
+        self.turn = turn
+        self.player_id = player_id
+        self.step = step
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return f"game {self.game_index} turn {self.turn} player {self.player_id} after {self.step}: {self.detail}"
+
+
+class ForwardModelMirror(GameObserver):
+    # After a divergence the model is re-synchronised from the reference, so one rule difference
+    # is reported where it happens instead of cascading through the rest of the game.
+
+    def __init__(self, max_divergences: int = 100):
+        self.max_divergences = max_divergences
+        self.divergences = []
+        self.divergence_kinds = Counter()
+        self.steps = 0
+        self.game_index = -1
+        self.model = None
+        self.seats = {}
+
+    def resync(self, game: Game) -> None:
+        self.model = ForwardModel.from_territories(game.territories, game.stored_players, game.unit_cap)
+        return None
+
+    def diverge(self, game: Game, player: Optional[Player], step: str, kind: str, detail: str) -> None:
+        self.divergence_kinds[kind] += 1
+        if len(self.divergences) < self.max_divergences:
+            self.divergences.append(Divergence(self.game_index, game.turn_count, -1 if player is None else player.id, step, f"{kind}: {detail}"))
+        self.resync(game)
+        return None
+
+    def compare(self, game: Game, player: Optional[Player], step: str) -> None:
+        self.steps += 1
+        model = self.model
+        territory_count = [0] * model.num_seats
+        region_count = [[0] * len(REGIONS) for _ in range(model.num_seats)]
+        for territory_id, territory in game.territories.items():
+            seat = -1 if territory.owner is None else self.seats[id(territory.owner)]
+            if model.owner[territory_id] != seat or model.troops[territory_id] != territory.troop_count:
+                self.diverge(game, player, step, "territory",
+                             f"{territory.name} is seat {seat} with {territory.troop_count}, model has seat {model.owner[territory_id]} with {model.troops[territory_id]}")
+                return None
+            if seat >= 0:
+                territory_count[seat] += 1
+                region_count[seat][REGION_OF[territory_id]] += 1
+        # The model keeps these incrementally, so check them against a recount
+        if territory_count != model.territory_count or region_count != model.region_count:
+            self.diverge(game, player, step, "counters", f"territory/region counts {model.territory_count} {model.region_count}")
+        return None
+
+    def on_game_start(self, game: Game) -> None:
+        self.game_index += 1
+        self.seats = {id(player): seat for seat, player in enumerate(game.stored_players)}
+        self.resync(game)
+        self.captured = False
+        return None
+
+    def on_turn_start(self, game: Game, player: Player, reinforcement_count: int) -> None:
+        seat = self.seats[id(player)]
+        expected = self.model.calculate_reinforcement(seat)
+        if expected != reinforcement_count:
+            self.diverge(game, player, "reinforcement", "reinforcement", f"model gives {expected}, engine gave {reinforcement_count}")
+        elif self.model.cards[seat] != player.cards:
+            self.diverge(game, player, "reinforcement", "cards", f"model has {self.model.cards[seat]}, engine has {player.cards}")
+        return None
+
+    def on_action(self, game: Game, player: Player, kind: str, source: Territory, target: Territory, count: int) -> None:
+        model = self.model
+        if kind == "reinforce":
+            model.troops[target.id] += count
+        elif kind == "attack":
+            # Replay the reference's dice: the defenders it lost and, on a capture, the survivors
+            defenders = model.troops[target.id]
+            if target.owner is player:
+                model.attack_round(source.id, target.id, count, count - target.troop_count, defenders)
+                self.captured = True
+            else:
+                model.attack_round(source.id, target.id, count, 0, defenders - target.troop_count)
+        elif kind == "manoeuvre" or kind == "manoeuvre_penalty":
+            model.manoeuvre(source.id, target.id, count)
+        self.compare(game, player, kind)
+        return None
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        # Which card is drawn is random; the model must agree that one was drawn at all
+        seat = self.seats[id(player)]
+        model_cards = self.model.cards[seat]
+        drawn = sum(player.cards) - sum(model_cards)
+        if drawn != (1 if self.captured else 0) or any(count < model_count for count, model_count in zip(player.cards, model_cards)):
+            self.diverge(game, player, "turn end", "cards", f"model has {model_cards}, engine has {player.cards} (captured: {self.captured})")
+        self.model.cards[seat] = list(player.cards)
+        self.captured = False
+        self.compare(game, player, "turn end")
+        return None
+
+    def report(self) -> str:
+        lines = [f"{self.game_index + 1} games, {self.steps} steps compared, {sum(self.divergence_kinds.values())} divergences"]
+        for kind, count in self.divergence_kinds.most_common():
+            lines.append(f"  {kind:<14} {count}")
+        lines.extend(f"  {divergence}" for divergence in self.divergences)
+        return "\n".join(lines)
+
+
+def run_step_check(games: int, lineup: Optional[List[AgentConfig]] = None, max_turns: int = 200, seed: int = 0, unit_cap: int = None) -> ForwardModelMirror:
+    if lineup is None:
+        lineup = [AgentConfig("random", "Agent.RandomAgent")] * 3
+    mirror = ForwardModelMirror()
+    random.seed(seed)
+    territories = create_territories()
+    agents = [config.create(player_id, starting_infantry_dict[len(lineup)], territories) for player_id, config in enumerate(lineup)]
+    game_kwargs = {} if unit_cap is None else {"unit_cap": unit_cap}
+    game = Game(agents, territories, simulating=True, **game_kwargs)
+    game.observers.append(mirror)
+    for _ in range(games):
+        game.play_game(max_turns=max_turns)
+    return mirror
+
+
+def chi_square_sf(statistic: float, dof: int) -> float:
+    # P(X >= statistic) for X ~ chi-square(dof): the regularised upper incomplete gamma Q(dof/2, statistic/2)
+    if dof <= 0:
+        return 1.0
+    a = dof / 2
+    x = statistic / 2
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower function P
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Continued fraction for Q (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def compare_distributions(reference: Counter, candidate: Counter) -> Tuple[float, int, float]:
+    # Chi-square test of homogeneity between two samples of outcomes; returns (statistic, dof, p)
+    reference_total = sum(reference.values())
+    candidate_total = sum(candidate.values())
+    total = reference_total + candidate_total
+    statistic = 0.0
+    outcomes = set(reference) | set(candidate)
+    for outcome in outcomes:
+        pooled = (reference[outcome] + candidate[outcome]) / total
+        for observed, sample_total in ((reference[outcome], reference_total), (candidate[outcome], candidate_total)):
+            expected = pooled * sample_total
+            statistic += (observed - expected) ** 2 / expected
+    dof = len(outcomes) - 1
+    return statistic, dof, chi_square_sf(statistic, dof)
+
+
+def reference_battle(attackers: int, defenders: int, rng: random.Random) -> Tuple[bool, int, int]:
+    # Game.invade's rules: commit min(3, source - 1) troops per round until the target falls or
+    # the source is down to one. Returns (captured, troops moved in, source troops left).
+    # Territory.attack rolls with the global RNG, so it is seeded from rng for each battle.
+    random.seed(rng.random())
+    target = Territory("target", 0, 0, None, 0)
+    target.troop_count = defenders
+    source = attackers
+    while source > 1:
+        committed = min(3, source - 1)
+        source -= committed
+        captured, survivors = target.attack(committed)
+        if captured:
+            return (True, survivors, source)
+    return (False, 0, source)
+
+
+def model_battle(attackers: int, defenders: int, rng: random.Random) -> Tuple[bool, int, int]:
+    # The same battle on a two-territory ForwardModel
+    model = ForwardModel(2)
+    model.set_territory(1, 0, attackers)
+    model.set_territory(3, 1, defenders)
+    while model.troops[1] > 1:
+        committed = min(3, model.troops[1] - 1)
+        if model.attack(1, 3, committed, rng):
+            return (True, model.troops[3], model.troops[1])
+    return (False, 0, model.troops[1])
+
+
+def run_battle_check(trials: int, seed: int = 0, attacker_range: Tuple[int, int] = (2, 8), defender_range: Tuple[int, int] = (1, 5),
+                     reference: Callable = reference_battle, candidate: Callable = model_battle) -> List[Tuple[int, int, float, int, float]]:
+    # One test per (attackers, defenders) start; returns (attackers, defenders, statistic, dof, p)
+    results = []
+    for attackers in range(attacker_range[0], attacker_range[1] + 1):
+        for defenders in range(defender_range[0], defender_range[1] + 1):
+            reference_rng = random.Random(f"{seed}-reference-{attackers}-{defenders}")
+            candidate_rng = random.Random(f"{seed}-candidate-{attackers}-{defenders}")
+            reference_outcomes = Counter(reference(attackers, defenders, reference_rng) for _ in range(trials))
+            candidate_outcomes = Counter(candidate(attackers, defenders, candidate_rng) for _ in range(trials))
+            results.append((attackers, defenders) + compare_distributions(reference_outcomes, candidate_outcomes))
+    return results
+
+
+def run_card_check(trials: int, seed: int = 0) -> Tuple[float, int, float]:
+    # Player.add_card against ForwardModel.add_card
+    random.seed(seed)
+    player = Player(0, 0)
+    reference = Counter()
+    for _ in range(trials):
+        player.cards = [0, 0, 0]
+        player.add_card()
+        reference[player.cards.index(1)] += 1
+    model = ForwardModel(1)
+    rng = random.Random(seed)
+    candidate = Counter()
+    for _ in range(trials):
+        model.cards[0] = [0, 0, 0]
+        model.add_card(0, rng)
+        candidate[model.cards[0].index(1)] += 1
+    return compare_distributions(reference, candidate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check ForwardModel against the Game engine")
+    parser.add_argument("--games", type=int, default=50, help="games for the step-by-step check")
+    parser.add_argument("--agents", nargs="+", default=["Agent.RandomAgent"] * 3, help="seat line-up for the step-by-step check, as name=module.Class specs")
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--unit-cap", type=int, default=None)
+    parser.add_argument("--trials", type=int, default=20000, help="samples per battle start for the statistical check")
+    parser.add_argument("--alpha", type=float, default=0.001, help="family-wise significance level of the statistical check")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    mirror = run_step_check(arguments.games, [AgentConfig.parse(spec) for spec in arguments.agents], arguments.max_turns, arguments.seed, arguments.unit_cap)
+    print(mirror.report())
+
+    battles = run_battle_check(arguments.trials, arguments.seed)
+    card_test = run_card_check(arguments.trials, arguments.seed)
+    # Bonferroni: every test is held to alpha over the number of tests
+    threshold = arguments.alpha / (len(battles) + 1)
+    failures = [battle for battle in battles if battle[4] < threshold]
+    print(f"{len(battles)} battle starts x {arguments.trials} trials, smallest p {min(battle[4] for battle in battles):.4g}")
+    for attackers, defenders, statistic, dof, p_value in failures:
+        print(f"  {attackers} vs {defenders}: chi-square {statistic:.1f} on {dof} dof, p {p_value:.3g}")
+    print(f"card draws: chi-square {card_test[0]:.1f} on {card_test[1]} dof, p {card_test[2]:.3g}")
+
+    if mirror.divergence_kinds or failures or card_test[2] < threshold:
+        sys.exit(1)
@@ -0,0 +1,315 @@
+from itertools import product
+import random
+from typing import Dict, List, Tuple
+
+from Agent import Player, Region, REGION_BONUSES
+from RiskUI import ADJACENCY_ARRAY
+
+
+# Flat, list based copy of the board so rollouts never touch Territory/Player objects.
+# Slots are indexed by territory id; slot 0 and 2 are unused, as in ADJACENCY_ARRAY.
+NUM_SLOTS = len(ADJACENCY_ARRAY)
+ADJACENCY = tuple(tuple(int(adjacent_id) for adjacent_id in adjacent_ids) for adjacent_ids in ADJACENCY_ARRAY)
+TERRITORY_IDS = tuple(territory_id for territory_id in range(NUM_SLOTS) if ADJACENCY[territory_id])
+
+REGIONS = tuple(Region)
+REGION_SIZES = tuple(len(region.value) for region in REGIONS)
+REGION_BONUS_LIST = tuple(REGION_BONUSES[region] for region in REGIONS)
+REGION_OF = [-1] * NUM_SLOTS
+for region_index, region in enumerate(REGIONS):
+    for territory_id in region.value:
+        REGION_OF[territory_id] = region_index
+REGION_OF = tuple(REGION_OF)
+
+# Same values as Player.card_value_dict and the default unit_cap of Player.calculate_reinforcement
+CARD_VALUES = (5, 6, 7, 10)
+UNIT_CAP = 130
+
+NO_OWNER = -1
+
+
+def _build_round_table(attacker_dice: int, defender_dice: int) -> Tuple[Tuple[float, int, int], ...]:
+    # Exact distribution of (attacker losses, defender losses) for one dice round,
+    # stored as cumulative thresholds so a round costs a single random() call.
+    counts = {}
+    for roll in product(range(1, 7), repeat=attacker_dice + defender_dice):
+        attacker = sorted(roll[:attacker_dice], reverse=True)
+        defender = sorted(roll[attacker_dice:], reverse=True)
+        attacker_losses = 0
+        defender_losses = 0
+        for a_roll, d_roll in zip(attacker, defender):
+            if a_roll > d_roll:
+                defender_losses += 1
+            else:
+                attacker_losses += 1
+        counts[(attacker_losses, defender_losses)] = counts.get((attacker_losses, defender_losses), 0) + 1
+
+    total = 6 ** (attacker_dice + defender_dice)
+    table = []
+    cumulative = 0
+    for (attacker_losses, defender_losses), count in sorted(counts.items()):
+        cumulative += count
+        table.append((cumulative / total, attacker_losses, defender_losses))
+    return tuple(table)
+
+
+ROUND_TABLES = {
+    (attacker_dice, defender_dice): _build_round_table(attacker_dice, defender_dice)
+    for attacker_dice in (1, 2, 3)
+    for defender_dice in (1, 2)
+}
+
+
+def get_card_set(cards: List[int]) -> int:
+    # Mirrors Player.get_card_set
+    max_count = max(cards)
+    if max_count > 3:
+        return cards.index(max_count)
+
+    if cards[0] > 0 and cards[1] > 0 and cards[0] > 0:
+        return 3
+    return -1
+
+
+def remove_card_set(cards: List[int], set: int) -> None:
+    # Mirrors Player.remove_card_set
+    if set == 1 or set == 2 or set == 3:
+        cards[set - 1] -= 3
+    else:
+        for x in range(len(cards)):
+            cards[x] -= 1
+
+
+class ForwardModel():
+    def __init__(self, num_seats: int, unit_cap: int = UNIT_CAP):
+        self.num_seats = num_seats
+        self.unit_cap = unit_cap
+        self.owner = [NO_OWNER] * NUM_SLOTS
+        self.troops = [0] * NUM_SLOTS
+        self.cards = [[0, 0, 0] for _ in range(num_seats)]
+        self.territory_count = [0] * num_seats
+        self.region_count = [[0] * len(REGIONS) for _ in range(num_seats)]
+
+    @classmethod
+    def from_territories(cls, territories: Dict[int, 'Territory'], seats: List[Player], unit_cap: int = UNIT_CAP) -> 'ForwardModel':
+        model = cls(len(seats), unit_cap)
+        seat_of = {id(player): seat for seat, player in enumerate(seats)}
+        for seat, player in enumerate(seats):
+            model.cards[seat] = list(player.cards)
+        for territory_id, territory in territories.items():
+            if territory.owner is None:
+                continue
+            model.set_territory(territory_id, seat_of[id(territory.owner)], territory.troop_count)
+        return model
+
+    def snapshot(self) -> tuple:
+        return (
+            self.owner[:],
+            self.troops[:],
+            [cards[:] for cards in self.cards],
+            self.territory_count[:],
+            [counts[:] for counts in self.region_count],
+        )
+
+    def restore(self, snapshot: tuple) -> None:
+        owner, troops, cards, territory_count, region_count = snapshot
+        self.owner[:] = owner
+        self.troops[:] = troops
+        self.cards = [seat_cards[:] for seat_cards in cards]
+        self.territory_count[:] = territory_count
+        self.region_count = [counts[:] for counts in region_count]
+
+    def set_territory(self, territory_id: int, seat: int, troops: int) -> None:
+        previous = self.owner[territory_id]
+        if previous != NO_OWNER:
+            self.territory_count[previous] -= 1
+            self.region_count[previous][REGION_OF[territory_id]] -= 1
+        self.owner[territory_id] = seat
+        self.troops[territory_id] = troops
+        self.territory_count[seat] += 1
+        self.region_count[seat][REGION_OF[territory_id]] += 1
+
+    def is_alive(self, seat: int) -> bool:
+        return self.territory_count[seat] > 0
+
+    def alive_seats(self) -> List[int]:
+        return [seat for seat in range(self.num_seats) if self.territory_count[seat] > 0]
+
+    def base_reinforcement(self, seat: int) -> int:
+        reinforcement_count = max(3, self.territory_count[seat] // 3)
+        region_count = self.region_count[seat]
+        for region_index in range(len(REGIONS)):
+            if region_count[region_index] == REGION_SIZES[region_index]:
+                reinforcement_count += REGION_BONUS_LIST[region_index]
+        return reinforcement_count
+
+    def calculate_reinforcement(self, seat: int) -> int:
+        # Mirrors Player.calculate_reinforcement, including trading in a card set
+        reinforcement_count = self.base_reinforcement(seat)
+
+        cards = self.cards[seat]
+        card_set_num = get_card_set(cards)
+        if card_set_num != -1:
+            reinforcement_count += CARD_VALUES[card_set_num]
+            remove_card_set(cards, card_set_num)
+
+        if self.total_troops(seat) + reinforcement_count >= self.unit_cap:
+            reinforcement_count = 0
+        return reinforcement_count
+
+    def total_troops(self, seat: int) -> int:
+        owner = self.owner
+        troops = self.troops
+        return sum(troops[territory_id] for territory_id in TERRITORY_IDS if owner[territory_id] == seat)
+
+    def owned_territories(self, seat: int) -> List[int]:
+        owner = self.owner
+        return [territory_id for territory_id in TERRITORY_IDS if owner[territory_id] == seat]
+
+    def frontier(self, seat: int) -> List[Tuple[int, int]]:
+        # (source, target) pairs where target is an enemy neighbour of source
+        owner = self.owner
+        pairs = []
+        for territory_id in TERRITORY_IDS:
+            if owner[territory_id] != seat:
+                continue
+            for adjacent_id in ADJACENCY[territory_id]:
+                if owner[adjacent_id] != seat:
+                    pairs.append((territory_id, adjacent_id))
+        return pairs
+
+    def is_frontier(self, territory_id: int) -> bool:
+        owner = self.owner
+        seat = owner[territory_id]
+        for adjacent_id in ADJACENCY[territory_id]:
+            if owner[adjacent_id] != seat:
+                return True
+        return False
+
+    def add_card(self, seat: int, rng: random.Random) -> None:
+        self.cards[seat][int(rng.random() * 3)] += 1
+
+    def attack_round(self, source_id: int, target_id: int, attacking_troops: int, attacker_losses: int, defender_losses: int) -> bool:
+        # One Game.invade step: the committed troops leave the source, the dice are
+        # resolved, and the survivors only stay alive if the target is conquered.
+        self.troops[source_id] -= attacking_troops
+        self.troops[target_id] -= defender_losses
+        if self.troops[target_id] <= 0:
+            self.set_territory(target_id, self.owner[source_id], attacking_troops - attacker_losses)
+            return True
+        return False
+
+    def attack(self, source_id: int, target_id: int, attacking_troops: int, rng: random.Random) -> bool:
+        table = ROUND_TABLES[(min(attacking_troops, 3), min(self.troops[target_id], 2))]
+        roll = rng.random()
+        for threshold, attacker_losses, defender_losses in table:
+            if roll < threshold:
+                break
+        return self.attack_round(source_id, target_id, attacking_troops, attacker_losses, defender_losses)
+
+    def manoeuvre(self, source_id: int, destination_id: int, num_troops: int) -> None:
+        # Mirrors Game.manoeuvre, including the punishment for asking for too many troops
+        if self.troops[source_id] < num_troops:
+            if self.troops[source_id] > 1:
+                self.troops[source_id] -= 1
+            return None
+        self.troops[source_id] -= num_troops
+        self.troops[destination_id] += num_troops
+        return None
+
+    def connected_territories(self, territory_id: int) -> List[int]:
+        owner = self.owner
+        seat = owner[territory_id]
+        visited = {territory_id}
+        stack = [territory_id]
+        while stack:
+            current = stack.pop()
+            for adjacent_id in ADJACENCY[current]:
+                if adjacent_id not in visited and owner[adjacent_id] == seat:
+                    visited.add(adjacent_id)
+                    stack.append(adjacent_id)
+        return list(visited)
+
+    def score(self, seat: int) -> float:
+        # Share of (territories + base reinforcement), the two non-win terms of Game.get_fitness
+        if self.territory_count[seat] == 0:
+            return 0.0
+        total = 0
+        for other_seat in range(self.num_seats):
+            if self.territory_count[other_seat] > 0:
+                total += self.territory_count[other_seat] + self.base_reinforcement(other_seat)
+        own = self.territory_count[seat] + self.base_reinforcement(seat)
+        if own == total:
+            return 1.0
+        return own / total
+
+    # Rollout policy: greedy and cheap, roughly what the one-ply agents do.
+
+    def rollout_reinforce(self, seat: int, reinforcement_count: int) -> None:
+        if reinforcement_count <= 0:
+            return None
+        troops = self.troops
+        best_id = -1
+        for territory_id in self.owned_territories(seat):
+            if (best_id == -1 or troops[territory_id] > troops[best_id]) and self.is_frontier(territory_id):
+                best_id = territory_id
+        if best_id != -1:
+            troops[best_id] += reinforcement_count
+        return None
+
+    def rollout_attacks(self, seat: int, rng: random.Random, max_attacks: int = 8) -> bool:
+        # A single Game.invade round can remove at most two defenders, so only weak targets are worth it
+        # Scans the frontier pairs in frontier() order without building the list; this is the
+        # rollouts' hot loop
+        owner = self.owner
+        troops = self.troops
+        captured = False
+        for _ in range(max_attacks):
+            best_source = -1
+            best_target = -1
+            best_margin = 0
+            for source_id in TERRITORY_IDS:
+                source_troops = troops[source_id]
+                if source_troops < 3 or owner[source_id] != seat:
+                    continue
+                for target_id in ADJACENCY[source_id]:
+                    if troops[target_id] <= 2 and owner[target_id] != seat and source_troops - troops[target_id] > best_margin:
+                        best_source = source_id
+                        best_target = target_id
+                        best_margin = source_troops - troops[target_id]
+            if best_source == -1:
+                break
+            if self.attack(best_source, best_target, troops[best_source] - 1, rng):
+                captured = True
+        return captured
+
+    def rollout_manoeuvre(self, seat: int) -> None:
+        troops = self.troops
+        source_id = -1
+        for territory_id in self.owned_territories(seat):
+            if troops[territory_id] > 1 and not self.is_frontier(territory_id):
+                if source_id == -1 or troops[territory_id] > troops[source_id]:
+                    source_id = territory_id
+        if source_id == -1:
+            return None
+        for territory_id in self.connected_territories(source_id):
+            if self.is_frontier(territory_id):
+                self.manoeuvre(source_id, territory_id, troops[source_id] - 1)
+                break
+        return None
+
+    def rollout_turn(self, seat: int, rng: random.Random) -> None:
+        self.rollout_reinforce(seat, self.calculate_reinforcement(seat))
+        if self.rollout_attacks(seat, rng):
+            self.add_card(seat, rng)
+        self.rollout_manoeuvre(seat)
+
+    def rollout(self, first_seat: int, rounds: int, rng: random.Random) -> None:
+        for _ in range(rounds):
+            for offset in range(self.num_seats):
+                seat = (first_seat + offset) % self.num_seats
+                if self.territory_count[seat] > 0:
+                    self.rollout_turn(seat, rng)
+            if len(self.alive_seats()) <= 1:
+                break
+        return None
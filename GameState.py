@@ -0,0 +1,190 @@
+import random
+import struct
+from typing import List, Optional, Tuple
+
+from Agent import Player, RandomAgent
+from RiskUI import Game, create_territories
+
+
+# Compact, versioned byte encoding of a game position, for handing positions to other processes
+# and checkpointing. Agents are not encoded: a decoded state is applied to Player objects the
+# caller supplies, one per seat. Seats are positions in the turn order (Game.stored_players).
+#
+# Layout (little endian):
+#   header    magic, format version, territory count, player count, turn number,
+#             seat of the current player (-1 for none), flags
+#   per seat  player id, seat flags, cards[0..2], unassigned units (signed: the engine lets cards
+#             go negative, see Player.get_card_set)
+#   owners    one signed byte per territory, the owning seat or -1, in Game.territories order
+#   troops    one uint32 per territory
+#   order     one byte per owned territory: each seat's territories, in seat order, as indices
+#             into Game.territories in the order the seat holds them. Agents iterate their
+#             territories in that (acquisition) order, so it's needed to replay a game exactly.
+#   rng       only with HAS_RNG: the 625 words of random.getstate() and the cached gauss value
+MAGIC = b"RSKS"
+FORMAT_VERSION = 1
+HAS_RNG = 1
+HAS_GAUSS = 2
+# Seat flag: the seat's territories changed since its adjacency caches were built, so its next
+# turn rebuilds them on every call. Otherwise the caches are reused for the whole turn, even
+# after that turn's conquests, and decoding must reproduce that to replay the game exactly.
+CACHES_STALE = 1
+
+HEADER = struct.Struct("<4sBBBIbB")
+SEAT = struct.Struct("<bBhhhi")
+RNG_WORDS = 625
+RNG = struct.Struct(f"<{RNG_WORDS}Id")
+
+
+class GameState():
+
+    def __init__(self, turn_count: int, current_seat: int, player_ids: List[int], cards: List[List[int]], unassigned_units: List[int],
+                 stale_caches: List[bool], owners: List[int], troops: List[int], territory_order: List[int], rng_state: Optional[tuple] = None):
+        self.turn_count = turn_count
+        self.current_seat = current_seat
+        self.player_ids = player_ids
+        self.cards = cards
+        self.unassigned_units = unassigned_units
+        self.stale_caches = stale_caches
+        self.owners = owners
+        self.troops = troops
+        self.territory_order = territory_order
+        self.rng_state = rng_state
+
+    @classmethod
+    def capture(cls, game: Game, include_rng: bool = True) -> 'GameState':
+        seats = {id(player): seat for seat, player in enumerate(game.stored_players)}
+        territories = game.territories.values()
+        index_of = {territory_id: index for index, territory_id in enumerate(game.territories)}
+        return cls(
+            game.turn_count,
+            seats.get(id(game.current_player), -1),
+            [player.id for player in game.stored_players],
+            [list(player.cards) for player in game.stored_players],
+            [player.unassigned_units for player in game.stored_players],
+            [player.territories_version != player.personal_territories_hash for player in game.stored_players],
+            [-1 if territory.owner is None else seats[id(territory.owner)] for territory in territories],
+            [territory.troop_count for territory in territories],
+            [index_of[territory_id] for player in game.stored_players for territory_id in player.personal_territories],
+            random.getstate() if include_rng else None
+        )
+
+    def encode(self) -> bytes:
+        flags = 0
+        if self.rng_state is not None:
+            flags |= HAS_RNG
+            if self.rng_state[2] is not None:
+                flags |= HAS_GAUSS
+        territory_count = len(self.owners)
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, territory_count, len(self.player_ids), self.turn_count, self.current_seat, flags)]
+        for player_id, stale, cards, unassigned_units in zip(self.player_ids, self.stale_caches, self.cards, self.unassigned_units):
+            parts.append(SEAT.pack(player_id, CACHES_STALE if stale else 0, *cards, unassigned_units))
+        parts.append(struct.pack(f"<{territory_count}b{territory_count}I", *self.owners, *self.troops))
+        parts.append(bytes(self.territory_order))
+        if self.rng_state is not None:
+            _, words, gauss = self.rng_state
+            parts.append(RNG.pack(*words, 0.0 if gauss is None else gauss))
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'GameState':
+        magic, version, territory_count, player_count, turn_count, current_seat, flags = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not an encoded game state")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"game state format {version} is not supported (expected {FORMAT_VERSION})")
+        offset = HEADER.size
+
+        player_ids = []
+        cards = []
+        unassigned_units = []
+        stale_caches = []
+        for _ in range(player_count):
+            player_id, seat_flags, card_0, card_1, card_2, units = SEAT.unpack_from(data, offset)
+            player_ids.append(player_id)
+            stale_caches.append(bool(seat_flags & CACHES_STALE))
+            cards.append([card_0, card_1, card_2])
+            unassigned_units.append(units)
+            offset += SEAT.size
+
+        board = struct.Struct(f"<{territory_count}b{territory_count}I")
+        values = board.unpack_from(data, offset)
+        offset += board.size
+        owners = list(values[:territory_count])
+        troops = list(values[territory_count:])
+        owned = territory_count - owners.count(-1)
+        territory_order = list(data[offset:offset + owned])
+        offset += owned
+
+        rng_state = None
+        if flags & HAS_RNG:
+            values = RNG.unpack_from(data, offset)
+            rng_state = (3, values[:RNG_WORDS], values[RNG_WORDS] if flags & HAS_GAUSS else None)
+        return cls(turn_count, current_seat, player_ids, cards, unassigned_units, stale_caches, owners, troops, territory_order, rng_state)
+
+    def apply(self, game: Game, players: Optional[List[Player]] = None) -> None:
+        # Puts game into this state. players are the seats in turn order and default to the game's
+        # own; they're re-seated in that order. The global RNG is restored if it was captured.
+        if players is None:
+            players = game.stored_players
+        if len(players) != len(self.player_ids) or len(game.territories) != len(self.owners):
+            raise ValueError(f"state is for {len(self.player_ids)} players and {len(self.owners)} territories")
+        if len(set(self.player_ids)) != len(self.player_ids):
+            raise ValueError("every seat needs its own player id")
+        for player, player_id, cards, unassigned_units in zip(players, self.player_ids, self.cards, self.unassigned_units):
+            player.id = player_id
+            player.cards = list(cards)
+            player.unassigned_units = unassigned_units
+        game.stored_players = players
+        game.turn_order = players
+        game.num_players = len(players)
+
+        # apply_snapshot rebuilds personal territories and the hash; it works with player ids
+        players_by_id = {player.id: player for player in players}
+        current_player_id = players[self.current_seat].id if self.current_seat >= 0 else -1
+        owners = tuple(-1 if seat < 0 else players[seat].id for seat in self.owners)
+        game.undo_stack = []
+        game.apply_snapshot((self.turn_count, current_player_id, owners, tuple(self.troops)), players_by_id)
+        territory_list = list(game.territories.values())
+        for player in players:
+            player.personal_territories = {}
+        for index in self.territory_order:
+            territory = territory_list[index]
+            territory.owner.personal_territories[territory.id] = territory
+        for player, stale in zip(players, self.stale_caches):
+            game.invalidate_player_caches(player)
+            if not stale:
+                game.get_enemy_adjacent_territories(player, changed=True)
+                game.get_manoeuvreable_territories(player, changed=True)
+                player.personal_territories_hash = player.territories_version
+        game.adjudication = None
+        game.reset_stalemate_tracking()
+        if self.rng_state is not None:
+            random.setstate(self.rng_state)
+        return None
+
+    def build_game(self, players: Optional[List[Player]] = None, **game_kwargs) -> Game:
+        # A new simulating Game in this state. Without players every seat gets a RandomAgent.
+        if players is None:
+            players = [RandomAgent(player_id, units) for player_id, units in zip(self.player_ids, self.unassigned_units)]
+        game_kwargs.setdefault("simulating", True)
+        game = Game(list(players), create_territories(), shuffle_turn_order=False, **game_kwargs)
+        self.apply(game)
+        return game
+
+    def resume(self, game: Game, max_turns: int = 200) -> Tuple[int, List[int]]:
+        # Plays game, already in this state, to the end as play_game would have from here. The
+        # state is taken to be at the end of the current seat's turn, as an on_turn_end
+        # checkpoint is.
+        next_seat = self.current_seat + 1
+        alive = [player for player in game.stored_players if player.personal_territories]
+        start = sum(1 for player in game.stored_players[:next_seat] if player.personal_territories)
+        return game.play_rounds(alive, max_turns, start)
+
+
+def encode_game(game: Game, include_rng: bool = True) -> bytes:
+    return GameState.capture(game, include_rng).encode()
+
+
+def decode_game(data: bytes, players: Optional[List[Player]] = None, **game_kwargs) -> Game:
+    return GameState.decode(data).build_game(players, **game_kwargs)
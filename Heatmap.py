@@ -0,0 +1,263 @@
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from RiskUI import Game, create_territories, starting_infantry_dict, territories
+from Tournament import AgentConfig, open_pool
+
+
+# Territory-control statistics over many games. Counters are indexed [territory, round bucket,
+# player type]: rounds are grouped bucket_rounds at a time, the last bucket also taking every later
+# round, and a player's type is its name in player_types (by player id), or else its agent class.
+# Types are added as they're met, so heatmaps from different batches merge by name.
+#
+#   held          per round, the territories each player held once the round was over
+#   held_won      the same, for players that went on to win
+#   captures      territories taken, counted in the round they were taken
+#   captures_won  the same, for players that went on to win
+#   rounds        [bucket, type] player-rounds played, i.e. how many held samples were possible
+#   rounds_won    the same, for players that went on to win
+TERRITORY_IDS = np.array(list(territories))
+TERRITORY_COUNT = len(TERRITORY_IDS)
+INDEX_OF_ID = np.zeros(TERRITORY_IDS.max() + 1, dtype=np.intp)
+INDEX_OF_ID[TERRITORY_IDS] = np.arange(TERRITORY_COUNT)
+BUCKET_ROUNDS = 10
+BUCKETS = 10
+COUNTERS = ("held", "held_won", "captures", "captures_won")
+
+
+def phi(held_won: np.ndarray, held_lost: np.ndarray, free_won: np.ndarray, free_lost: np.ndarray) -> np.ndarray:
+    # Phi coefficient of a 2x2 table of (held, not held) x (won, lost) counts; 0 where undefined
+    held_won = np.asarray(held_won, dtype=np.float64)
+    denominator = np.sqrt((held_won + held_lost) * (free_won + free_lost) * (held_won + free_won) * (held_lost + free_lost))
+    return np.divide(held_won * free_lost - held_lost * free_won, denominator, out=np.zeros_like(held_won), where=denominator > 0)
+
+
+class TerritoryHeatmap():
+    # Game calls start_game, end_turn, end_round and end_game (see Game.heatmap). A game's counts
+    # are kept by seat and only folded into the per-type counters when it ends. A game resumed with
+    # Game.play_rounds must be started by the caller, with start_game.
+
+    def __init__(self, bucket_rounds: int = BUCKET_ROUNDS, buckets: int = BUCKETS):
+        self.bucket_rounds = bucket_rounds
+        self.buckets = buckets
+        self.types = []
+        self.type_index = {}
+        for name in COUNTERS:
+            setattr(self, name, np.zeros((TERRITORY_COUNT, buckets, 0), dtype=np.int64))
+        self.rounds = np.zeros((buckets, 0), dtype=np.int64)
+        self.rounds_won = np.zeros((buckets, 0), dtype=np.int64)
+        self.games = np.zeros(0, dtype=np.int64)
+        self.wins = np.zeros(0, dtype=np.int64)
+        self.player_types = {}
+        self.seat_players = None
+
+    def __getstate__(self):
+        # Only the totals travel between processes, not the game in progress
+        state = dict(self.__dict__)
+        for name in ("seat_of", "owner_seats", "game_held", "game_captures", "game_rounds", "conquests_seen"):
+            state.pop(name, None)
+        state["seat_players"] = None
+        return state
+
+    def type_slot(self, name: str) -> int:
+        index = self.type_index.get(name)
+        if index is None:
+            index = len(self.types)
+            self.types.append(name)
+            self.type_index[name] = index
+            for counter in COUNTERS:
+                setattr(self, counter, np.concatenate([getattr(self, counter), np.zeros((TERRITORY_COUNT, self.buckets, 1), dtype=np.int64)], axis=2))
+            self.rounds = np.concatenate([self.rounds, np.zeros((self.buckets, 1), dtype=np.int64)], axis=1)
+            self.rounds_won = np.concatenate([self.rounds_won, np.zeros((self.buckets, 1), dtype=np.int64)], axis=1)
+            self.games = np.append(self.games, 0)
+            self.wins = np.append(self.wins, 0)
+        return index
+
+    def bucket(self, round_number: int) -> int:
+        return min(round_number // self.bucket_rounds, self.buckets - 1)
+
+    def start_game(self, game: Game) -> None:
+        self.seat_players = list(game.stored_players)
+        self.seat_of = {player.id: seat for seat, player in enumerate(self.seat_players)}
+        self.owner_seats = np.zeros(TERRITORY_COUNT, dtype=np.intp)
+        for territory in game.territories.values():
+            if territory.owner is not None:
+                self.owner_seats[INDEX_OF_ID[territory.id]] = self.seat_of[territory.owner.id]
+        shape = (TERRITORY_COUNT, self.buckets, len(self.seat_players))
+        self.game_held = np.zeros(shape, dtype=np.int64)
+        self.game_captures = np.zeros(shape, dtype=np.int64)
+        self.game_rounds = np.zeros(self.buckets, dtype=np.int64)
+        self.conquests_seen = game.conquests
+        return None
+
+    def end_turn(self, game: Game, player: 'Player') -> None:
+        # Only the player moving can gain territories during its turn, and it can't lose any, so
+        # its captures are the territories it holds that weren't its own before
+        if game.conquests == self.conquests_seen:
+            return None
+        self.conquests_seen = game.conquests
+        seat = self.seat_of[player.id]
+        owned = INDEX_OF_ID[np.fromiter(player.personal_territories, dtype=np.intp, count=len(player.personal_territories))]
+        captured = owned[self.owner_seats[owned] != seat]
+        self.owner_seats[captured] = seat
+        self.game_captures[captured, self.bucket(game.turn_count), seat] += 1
+        return None
+
+    def end_round(self, game: Game) -> None:
+        bucket = self.bucket(game.turn_count)
+        self.game_held[np.arange(TERRITORY_COUNT), bucket, self.owner_seats] += 1
+        self.game_rounds[bucket] += 1
+        return None
+
+    def end_game(self, game: Game, winner_id: int) -> None:
+        if self.seat_players is None:
+            return None
+        for seat, player in enumerate(self.seat_players):
+            index = self.type_slot(self.player_types.get(player.id) or type(player).__name__)
+            won = player.id == winner_id
+            self.held[:, :, index] += self.game_held[:, :, seat]
+            self.captures[:, :, index] += self.game_captures[:, :, seat]
+            self.rounds[:, index] += self.game_rounds
+            self.games[index] += 1
+            if won:
+                self.held_won[:, :, index] += self.game_held[:, :, seat]
+                self.captures_won[:, :, index] += self.game_captures[:, :, seat]
+                self.rounds_won[:, index] += self.game_rounds
+                self.wins[index] += 1
+        self.seat_players = None
+        return None
+
+    def merge(self, other: 'TerritoryHeatmap') -> 'TerritoryHeatmap':
+        if (other.bucket_rounds, other.buckets) != (self.bucket_rounds, self.buckets):
+            raise ValueError("heatmaps with different round buckets can't be merged")
+        for other_index, name in enumerate(other.types):
+            index = self.type_slot(name)
+            for counter in COUNTERS:
+                getattr(self, counter)[:, :, index] += getattr(other, counter)[:, :, other_index]
+            self.rounds[:, index] += other.rounds[:, other_index]
+            self.rounds_won[:, index] += other.rounds_won[:, other_index]
+            self.games[index] += other.games[other_index]
+            self.wins[index] += other.wins[other_index]
+        return self
+
+    def ownership_share(self) -> np.ndarray:
+        # [territory, bucket, type]: the fraction of a type's player-rounds in which it held the territory
+        return self.held / np.maximum(self.rounds, 1)[None, :, :]
+
+    def win_correlation(self) -> np.ndarray:
+        # [territory, bucket, type]: phi coefficient between holding the territory at the end of a
+        # round and winning the game, over the type's player-rounds in that bucket
+        held_lost = self.held - self.held_won
+        free_won = self.rounds_won[None, :, :] - self.held_won
+        free_lost = (self.rounds - self.rounds_won)[None, :, :] - held_lost
+        return phi(self.held_won, held_lost, free_won, free_lost)
+
+    def save(self, path: str) -> None:
+        counters = {name: getattr(self, name) for name in COUNTERS + ("rounds", "rounds_won", "games", "wins")}
+        np.savez_compressed(path, territory_ids=TERRITORY_IDS, types=np.array(self.types, dtype=str),
+                            buckets=np.array([self.bucket_rounds, self.buckets]), **counters)
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> 'TerritoryHeatmap':
+        with np.load(path) as data:
+            if data["territory_ids"].tolist() != TERRITORY_IDS.tolist():
+                raise ValueError(f"{path} was built for a different map")
+            bucket_rounds, buckets = data["buckets"].tolist()
+            heatmap = cls(bucket_rounds, buckets)
+            heatmap.types = data["types"].tolist()
+            heatmap.type_index = {name: index for index, name in enumerate(heatmap.types)}
+            for name in COUNTERS + ("rounds", "rounds_won", "games", "wins"):
+                setattr(heatmap, name, data[name])
+        return heatmap
+
+    def bucket_label(self, bucket: int) -> str:
+        first = bucket * self.bucket_rounds
+        if bucket == self.buckets - 1:
+            return f"{first}+"
+        return f"{first}-{first + self.bucket_rounds - 1}"
+
+    def report(self, top: int = 5) -> str:
+        names = [territories[territory_id].name for territory_id in TERRITORY_IDS.tolist()]
+        lines = []
+        played = [bucket for bucket in range(self.buckets) if self.rounds[bucket].any()]
+
+        captures = self.captures.sum(axis=(1, 2))
+        contested = np.argsort(-captures, kind="stable")[:top]
+        lines.append("most captured: " + ", ".join(f"{names[index]} {captures[index]}" for index in contested))
+
+        share = self.ownership_share()
+        correlation = self.win_correlation()
+        for index, name in enumerate(self.types):
+            games = self.games[index]
+            lines.append(f"{name}: {games} games, {self.wins[index] / max(games, 1):.0%} won, {self.captures[:, :, index].sum() / max(games, 1):.1f} captures per game")
+            held = " ".join(f"{self.bucket_label(bucket)} {share[:, bucket, index].sum() / TERRITORY_COUNT:.0%}" for bucket in played)
+            lines.append(f"    board held by round: {held}")
+            # Territories whose holding most goes with winning, over the whole game
+            rounds = self.rounds[:, index].sum()
+            rounds_won = self.rounds_won[:, index].sum()
+            held_won = self.held_won[:, :, index].sum(axis=1)
+            held_total = self.held[:, :, index].sum(axis=1)
+            overall = phi(held_won, held_total - held_won, rounds_won - held_won, rounds - rounds_won - held_total + held_won)
+            decisive = np.argsort(-overall, kind="stable")[:top]
+            lines.append("    decisive: " + ", ".join(f"{names[territory]} {overall[territory]:+.2f}" for territory in decisive))
+            if played:
+                peak = [int(np.argmax(correlation[:, bucket, index])) for bucket in played]
+                lines.append("    decisive by round: " + ", ".join(f"{self.bucket_label(bucket)} {names[territory]}" for bucket, territory in zip(played, peak)))
+        return "\n".join(lines)
+
+
+def collect(job: Tuple[List[AgentConfig], int, int, int, int, int]) -> TerritoryHeatmap:
+    lineup, first_game, games, seed, max_turns, stalemate_rounds = job
+    heatmap = TerritoryHeatmap()
+    unassigned_units = starting_infantry_dict[len(lineup)]
+    for game_index in range(first_game, first_game + games):
+        random.seed(seed + game_index)
+        # Rotate the line-up so every agent plays from every seat equally often
+        rotation = game_index % len(lineup)
+        seats = lineup[rotation:] + lineup[:rotation]
+        board = create_territories()
+        players = [config.create(seat, unassigned_units, board) for seat, config in enumerate(seats)]
+        heatmap.player_types = {seat: config.name for seat, config in enumerate(seats)}
+        game = Game(players, board, simulating=True, shuffle_turn_order=False, stalemate_rounds=stalemate_rounds, heatmap=heatmap)
+        game.play_game(max_turns=max_turns)
+    return heatmap
+
+
+def build_heatmap(lineup: List[AgentConfig], games: int, workers: int = 1, seed: int = 0, max_turns: int = 200,
+                  stalemate_rounds: Optional[int] = 20, batch: int = 50) -> TerritoryHeatmap:
+    # Plays games over a process pool and merges the workers' heatmaps
+    jobs = [(lineup, start, min(batch, games - start), seed, max_turns, stalemate_rounds) for start in range(0, games, batch)]
+    heatmap = TerritoryHeatmap()
+    with open_pool(min(workers, len(jobs))) as pool:
+        for part in pool.imap_unordered(collect, jobs):
+            heatmap.merge(part)
+    return heatmap
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play games and report which territories decide them")
+    parser.add_argument("--agents", nargs="+", default=["Agent.RandomAgent"] * 3, help='seat line-up as "module.Class" or "name=module.Class"')
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--load", nargs="*", default=[], help="saved heatmaps to merge in instead of (or as well as) playing")
+    parser.add_argument("--out", default=None, help="save the merged heatmap here (.npz)")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    heatmap = TerritoryHeatmap()
+    for path in arguments.load:
+        heatmap.merge(TerritoryHeatmap.load(path))
+    if arguments.games > 0:
+        lineup = [AgentConfig.parse(spec) for spec in arguments.agents]
+        heatmap.merge(build_heatmap(lineup, arguments.games, arguments.workers, arguments.seed, arguments.max_turns))
+    print(heatmap.report())
+    print(f"{int(heatmap.games.sum())} player-games, {time.perf_counter() - start:.1f}s")
+    if arguments.out is not None:
+        heatmap.save(arguments.out)
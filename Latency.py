@@ -0,0 +1,121 @@
+import math
+import random
+from typing import Dict, Tuple
+
+from Agent import Player
+
+
+# Log-spaced buckets from 100ns to 100s, 20 per decade (about 12% wide)
+MIN_LATENCY = 1e-7
+BUCKETS_PER_DECADE = 20
+NUM_BUCKETS = 9 * BUCKETS_PER_DECADE
+
+
+def bucket_index(seconds: float) -> int:
+    if seconds <= MIN_LATENCY:
+        return 0
+    return min(int(math.log10(seconds / MIN_LATENCY) * BUCKETS_PER_DECADE), NUM_BUCKETS - 1)
+
+
+def bucket_upper_bound(index: int) -> float:
+    return MIN_LATENCY * 10 ** ((index + 1) / BUCKETS_PER_DECADE)
+
+
+class LatencyHistogram():
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.overruns = 0
+
+    def record(self, seconds: float, overrun: bool = False) -> None:
+        self.counts[bucket_index(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if overrun:
+            self.overruns += 1
+        return None
+
+    def percentile(self, fraction: float) -> float:
+        if self.count == 0:
+            return 0.0
+        threshold = fraction * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, bucket_count in enumerate(other.counts):
+            self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.overruns += other.overruns
+        return None
+
+
+class LatencyTracker():
+    # One histogram per (agent class, method); plain data so it pickles back from worker processes
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, agent: str, method: str, seconds: float, overrun: bool = False) -> None:
+        histogram = self.histograms.get((agent, method))
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self.histograms[(agent, method)] = histogram
+        histogram.record(seconds, overrun)
+        return None
+
+    def merge(self, other: 'LatencyTracker') -> None:
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge(histogram)
+        return None
+
+    def summary(self) -> Dict[Tuple[str, str], dict]:
+        return {
+            key: {
+                "count": histogram.count,
+                "mean": histogram.total / histogram.count if histogram.count else 0.0,
+                "p50": histogram.percentile(0.5),
+                "p99": histogram.percentile(0.99),
+                "max": histogram.max,
+                "overruns": histogram.overruns
+            }
+            for key, histogram in self.histograms.items()
+        }
+
+    def report(self) -> str:
+        lines = [f"{'agent':<20} {'method':<15} {'calls':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'overruns':>9}"]
+        for (agent, method), row in sorted(self.summary().items(), key=lambda item: -item[1]["p99"]):
+            lines.append(
+                f"{agent:<20} {method:<15} {row['count']:>9} {row['p50'] * 1000:>9.3f} "
+                f"{row['p99'] * 1000:>9.3f} {row['max'] * 1000:>9.3f} {row['overruns']:>9}"
+            )
+        return "\n".join(lines)
+
+
+def random_fallback(player: Player, method: str, args: tuple) -> object:
+    # Decision used in place of an agent answer that overran its budget: RandomAgent-style
+    # placements, and no attack or manoeuvre
+    if method == "make_selection":
+        return random.choice(args[0])
+    if method == "add_infantry":
+        return random.choice(list(player.personal_territories.values())) if player.personal_territories else None
+    if method == "reinforce":
+        if not player.personal_territories:
+            return []
+        return [(random.choice(list(player.personal_territories.values())), args[0])]
+    if method == "manoeuvre":
+        return None, None, 0
+    return None
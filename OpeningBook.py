@@ -0,0 +1,174 @@
+import argparse
+import multiprocessing
+import os
+import random
+from typing import List, Tuple
+
+import numpy as np
+
+from Agent import Player, RandomAgent
+from RiskUI import Game, create_territories, starting_infantry_dict, territories
+
+
+# A pick's context is (territory, territories the picker already holds on its continent,
+# territories others hold there). Values live in a dense array indexed by that context,
+# so valuing one candidate is a single array access and a pick is O(available territories).
+TERRITORY_INDEX = {territory_id: index for index, territory_id in enumerate(territories)}
+CONTINENT_SIZES = {}
+for _territory in territories.values():
+    CONTINENT_SIZES[_territory.continent.value] = CONTINENT_SIZES.get(_territory.continent.value, 0) + 1
+MAX_CONTINENT = max(CONTINENT_SIZES.values())
+BOOK_SHAPE = (len(territories), MAX_CONTINENT + 1, MAX_CONTINENT + 1)
+# Absolute path -> (modification time, OpeningBook), see OpeningBook.load_shared
+LOADED_BOOKS = {}
+
+
+def pick_contexts(player: Player, available_territories: List['Territory']) -> List[Tuple[int, int, int]]:
+    mine = {}
+    for territory in player.personal_territories.values():
+        mine[territory.continent.value] = mine.get(territory.continent.value, 0) + 1
+    free = {}
+    for territory in available_territories:
+        free[territory.continent.value] = free.get(territory.continent.value, 0) + 1
+
+    contexts = []
+    for territory in available_territories:
+        continent = territory.continent.value
+        own = mine.get(continent, 0)
+        others = CONTINENT_SIZES[continent] - free[continent] - own
+        contexts.append((TERRITORY_INDEX[territory.id], own, others))
+    return contexts
+
+
+class OpeningBook():
+
+    def __init__(self, values: np.ndarray, counts: np.ndarray):
+        self.values = values
+        self.counts = counts
+
+    def value(self, territory: 'Territory', own: int, others: int) -> float:
+        return float(self.values[TERRITORY_INDEX[territory.id], own, others])
+
+    def best_pick(self, player: Player, available_territories: List['Territory']) -> 'Territory':
+        # One lookup per available territory, after one pass over the player's territories
+        values = self.values
+        best = None
+        best_value = -1.0
+        for territory, (index, own, others) in zip(available_territories, pick_contexts(player, available_territories)):
+            value = values[index, own, others]
+            if value > best_value:
+                best = territory
+                best_value = value
+        return best
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, values=self.values, counts=self.counts, territory_ids=np.array(list(territories)))
+        return None
+
+    @classmethod
+    def load_shared(cls, path: str) -> 'OpeningBook':
+        # Loaded once per process and file version and shared by every seat; the arrays are
+        # made read-only since all of them see the same book
+        key = os.path.abspath(path)
+        modified = os.stat(key).st_mtime_ns
+        cached = LOADED_BOOKS.get(key)
+        if cached is None or cached[0] != modified:
+            book = cls.load(path)
+            book.values.flags.writeable = False
+            book.counts.flags.writeable = False
+            cached = (modified, book)
+            LOADED_BOOKS[key] = cached
+        return cached[1]
+
+    @classmethod
+    def load(cls, path: str) -> 'OpeningBook':
+        with np.load(path) as data:
+            if data["territory_ids"].tolist() != list(territories):
+                raise ValueError(f"{path} was built for a different map")
+            return cls(data["values"], data["counts"])
+
+    @classmethod
+    def from_statistics(cls, wins: np.ndarray, counts: np.ndarray, prior_strength: float = 20.0) -> 'OpeningBook':
+        # Each context's win rate, shrunk towards its territory's overall win rate so that
+        # rarely seen contexts don't dominate the ranking
+        territory_rate = wins.sum(axis=(1, 2)) / np.maximum(counts.sum(axis=(1, 2)), 1)
+        prior = territory_rate[:, None, None]
+        values = (wins + prior_strength * prior) / (counts + prior_strength)
+        return cls(values.astype(np.float32), counts.astype(np.int32))
+
+
+class ExplorationAgent(RandomAgent):
+    # Picks territories uniformly at random during selection and remembers each pick's context
+
+    def __init__(self, id: int, unassigned_units: int):
+        super().__init__(id, unassigned_units)
+        self.picks = []
+
+    def reset(self):
+        super().reset()
+        self.picks = []
+
+    def make_selection(self, available_territories: List['Territory']) -> 'Territory':
+        position = random.randrange(len(available_territories))
+        self.picks.append(pick_contexts(self, available_territories)[position])
+        return available_territories[position]
+
+
+def simulate_openings(job: Tuple[int, int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    seed, games, players, max_turns = job
+    random.seed(seed)
+    wins = np.zeros(BOOK_SHAPE)
+    counts = np.zeros(BOOK_SHAPE)
+    agents = [ExplorationAgent(player_id, starting_infantry_dict[players]) for player_id in range(players)]
+    game = Game(list(agents), create_territories(), simulating=True, stalemate_rounds=20)
+    for _ in range(games):
+        winner_id, _ = game.play_game(max_turns=max_turns)
+        for agent in agents:
+            for context in agent.picks:
+                counts[context] += 1
+                if agent.id == winner_id:
+                    wins[context] += 1
+    return wins, counts
+
+
+def build_book(games: int, players: int = 3, max_turns: int = 200, workers: int = None, seed: int = 0, batch: int = 200) -> OpeningBook:
+    # Plays self-play games with random selection (and RandomAgent play afterwards), in
+    # batches spread over a process pool, and scores every pick by whether its picker won
+    jobs = [(seed + index, min(batch, games - start), players, max_turns) for index, start in enumerate(range(0, games, batch))]
+    wins = np.zeros(BOOK_SHAPE)
+    counts = np.zeros(BOOK_SHAPE)
+    with multiprocessing.get_context("spawn").Pool(workers or os.cpu_count()) as pool:
+        for batch_wins, batch_counts in pool.imap_unordered(simulate_openings, jobs):
+            wins += batch_wins
+            counts += batch_counts
+    return OpeningBook.from_statistics(wins, counts)
+
+
+class OpeningBookAgent(RandomAgent):
+    # RandomAgent that selects its territories from an opening book. Seats are created per game,
+    # so the book comes from OpeningBook.load_shared rather than from disk each time.
+
+    def __init__(self, id: int, unassigned_units: int, book_path: str = "opening_book.npz"):
+        super().__init__(id, unassigned_units)
+        self.opening_book = OpeningBook.load_shared(book_path)
+
+    def make_selection(self, available_territories: List['Territory']) -> 'Territory':
+        return self.opening_book.best_pick(self, available_territories)
+
+    def get_player_name(self):
+        return (f"Opening Book Agent {self.id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate territory pick values by simulation and write an opening book")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="opening_book.npz")
+    arguments = parser.parse_args()
+
+    book = build_book(arguments.games, arguments.players, arguments.max_turns, arguments.workers, arguments.seed)
+    book.save(arguments.out)
+    print(f"{int(book.counts.sum())} picks from {arguments.games} games written to {arguments.out}")
@@ -0,0 +1,157 @@
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from Agent import Region, REGION_BONUSES
+from Trajectory import NUM_TERRITORIES, TERRITORY_IDS, TrajectoryCorpus
+
+
+# Region membership and bonuses in trajectory (RiskUI.territories) order
+REGION_MATRIX = np.array([[territory_id in region.value for territory_id in TERRITORY_IDS] for region in Region], dtype=np.float64)
+REGION_SIZES = REGION_MATRIX.sum(axis=1)
+REGION_BONUS_VECTOR = np.array([REGION_BONUSES[region] for region in Region], dtype=np.float64)
+
+FEATURE_NAMES = (
+    ["bias", "territory_share", "troop_share", "reinforcement_share", "opponents"]
+    + [f"{region.name.lower()}_share" for region in Region]
+)
+WIN_BONUS = 20  # Same bonus Game.get_fitness gives the winner
+
+
+def state_features(owners: np.ndarray, troops: np.ndarray, player_id: int) -> np.ndarray:
+    # owners/troops are (states, territories); one feature row per state for player_id
+    owners = np.atleast_2d(owners)
+    troops = np.atleast_2d(troops).astype(np.float64)
+    mine = owners == player_id
+
+    territory_count = mine.sum(axis=1)
+    troop_share = (troops * mine).sum(axis=1) / np.maximum(troops.sum(axis=1), 1)
+    region_share = (mine @ REGION_MATRIX.T) / REGION_SIZES
+
+    # Base reinforcement of every owner, as in Player.calculate_base_reinforcement
+    reinforcement = np.zeros(len(owners))
+    all_reinforcement = np.zeros(len(owners))
+    alive = np.zeros(len(owners))
+    for owner_id in np.unique(owners[owners >= 0]):
+        owned = owners == owner_id
+        count = owned.sum(axis=1)
+        bonus = ((owned @ REGION_MATRIX.T) == REGION_SIZES) @ REGION_BONUS_VECTOR
+        owner_reinforcement = np.where(count > 0, np.maximum(3, count // 3) + bonus, 0)
+        all_reinforcement += owner_reinforcement
+        alive += count > 0
+        if owner_id == player_id:
+            reinforcement = owner_reinforcement
+
+    return np.column_stack([
+        np.ones(len(owners)),
+        territory_count / NUM_TERRITORIES,
+        troop_share,
+        reinforcement / np.maximum(all_reinforcement, 1),
+        np.maximum(alive - 1, 0),
+        region_share
+    ])
+
+
+def corpus_dataset(corpus: TrajectoryCorpus, min_turn: int = 0, stride: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    # Every stride-th recorded turn from min_turn on, once per player still alive in it,
+    # labelled with whether that player went on to win
+    winners = dict(zip(corpus.games["game_id"].tolist(), corpus.games["winner"].tolist()))
+    features = []
+    labels = []
+    for game_id, records in corpus.iter_games():
+        winner = winners[game_id]
+        records = records[(records["turn"] >= min_turn)][::stride]
+        if len(records) == 0:
+            continue
+        owners = np.asarray(records["owners"])
+        troops = np.asarray(records["troops"])
+        for player_id in np.unique(owners[owners >= 0]):
+            alive = (owners == player_id).any(axis=1)
+            features.append(state_features(owners[alive], troops[alive], player_id))
+            labels.append(np.full(alive.sum(), player_id == winner, dtype=np.float64))
+    if not features:
+        return np.empty((0, len(FEATURE_NAMES))), np.empty(0)
+    return np.concatenate(features), np.concatenate(labels)
+
+
+class OutcomeModel():
+    # Logistic regression for P(player wins | mid-game state), fitted with Newton's method
+
+    def __init__(self, weights: Optional[np.ndarray] = None):
+        self.weights = np.zeros(len(FEATURE_NAMES)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    def fit(self, features: np.ndarray, labels: np.ndarray, l2: float = 1e-3, iterations: int = 25) -> 'OutcomeModel':
+        weights = np.zeros(features.shape[1])
+        regulariser = l2 * len(labels) * np.eye(features.shape[1])
+        regulariser[0, 0] = 0
+        for _ in range(iterations):
+            probabilities = 1 / (1 + np.exp(-features @ weights))
+            gradient = features.T @ (probabilities - labels) + regulariser @ weights
+            hessian = (features * (probabilities * (1 - probabilities))[:, None]).T @ features + regulariser
+            step = np.linalg.solve(hessian, gradient)
+            weights -= step
+            if np.abs(step).max() < 1e-8:
+                break
+        self.weights = weights
+        return self
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return 1 / (1 + np.exp(-np.atleast_2d(features) @ self.weights))
+
+    def log_loss(self, features: np.ndarray, labels: np.ndarray) -> float:
+        probabilities = np.clip(self.predict(features), 1e-12, 1 - 1e-12)
+        return float(-np.mean(labels * np.log(probabilities) + (1 - labels) * np.log(1 - probabilities)))
+
+    def win_probabilities(self, game: 'Game') -> List[float]:
+        # Per player of game.stored_players, normalised to sum to 1. Players are matched to
+        # territories by identity, so the prediction doesn't depend on player ids.
+        seats = {id(player): seat for seat, player in enumerate(game.stored_players)}
+        owners = np.array([[seats.get(id(territory.owner), -1) for territory in game.territories.values()]])
+        troops = np.array([[territory.troop_count for territory in game.territories.values()]])
+        probabilities = np.array([
+            self.predict(state_features(owners, troops, seat))[0] if (owners == seat).any() else 0.0
+            for seat in range(len(game.stored_players))
+        ])
+        return (probabilities / max(probabilities.sum(), 1e-12)).tolist()
+
+    def expected_fitness(self, game: 'Game') -> List[float]:
+        # Game.get_fitness with the win bonus replaced by its predicted expectation
+        return [
+            len(player.personal_territories) + player.base_reinforcement + WIN_BONUS * probability
+            for player, probability in zip(game.stored_players, self.win_probabilities(game))
+        ]
+
+    def save(self, path: str) -> None:
+        np.savez(path, weights=self.weights, feature_names=np.array(FEATURE_NAMES))
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> 'OutcomeModel':
+        with np.load(path) as data:
+            if data["feature_names"].tolist() != FEATURE_NAMES:
+                raise ValueError(f"{path} was trained on different features")
+            return cls(data["weights"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the mid-game outcome model on a trajectory corpus (see Trajectory)")
+    parser.add_argument("corpus", help="trajectory corpus directory")
+    parser.add_argument("--out", default="outcome_model.npz", help="weight file to write")
+    parser.add_argument("--min-turn", type=int, default=0, help="skip states before this turn")
+    parser.add_argument("--stride", type=int, default=1, help="use every n-th recorded turn")
+    parser.add_argument("--l2", type=float, default=1e-3)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of games kept for validation")
+    arguments = parser.parse_args()
+
+    corpus = TrajectoryCorpus(arguments.corpus)
+    features, labels = corpus_dataset(corpus, arguments.min_turn, arguments.stride)
+    # Split by row order, which follows game order, so whole games stay on one side
+    split = int(len(labels) * (1 - arguments.holdout))
+    model = OutcomeModel().fit(features[:split], labels[:split], arguments.l2)
+    print(f"{len(corpus)} games, {len(labels)} states")
+    print(f"train log loss {model.log_loss(features[:split], labels[:split]):.4f}, "
+          f"holdout log loss {model.log_loss(features[split:], labels[split:]):.4f}")
+    for name, weight in zip(FEATURE_NAMES, model.weights):
+        print(f"{name:<24} {weight:+.4f}")
+    model.save(arguments.out)
@@ -0,0 +1,49 @@
+from typing import Dict, List, Optional
+
+from Agent import RandomAgent
+from RiskUI import ADJACENCY_ARRAY
+from TurnPlan import AttackStep, ManoeuvreStep, TurnPlan
+
+
+class PlanningAgent(RandomAgent):
+    # Plays every turn as a single TurnPlan: stack the reinforcements on the strongest border
+    # territory, attack its neighbours weakest first while the odds hold, then pull the largest
+    # interior stack up to an adjacent border territory. Placement is RandomAgent's.
+
+    def __init__(self, id: int, unassigned_units: int, territories: Dict[int, 'Territory'], troops_per_round: int = 3, stop_at: int = 2, min_odds: float = 0.3):
+        super().__init__(id, unassigned_units)
+        self.territories = territories
+        self.troops_per_round = troops_per_round
+        self.stop_at = stop_at
+        self.min_odds = min_odds
+
+    def neighbours(self, territory: 'Territory') -> List['Territory']:
+        return [self.territories[adjacent_id] for adjacent_id in ADJACENCY_ARRAY[territory.id]]
+
+    def enemy_neighbours(self, territory: 'Territory') -> List['Territory']:
+        return [adjacent for adjacent in self.neighbours(territory) if adjacent.owner is not self]
+
+    def plan_turn(self, total_reinforcements: int) -> TurnPlan:
+        borders = [territory for territory in self.personal_territories.values() if self.enemy_neighbours(territory)]
+        if not borders:
+            return TurnPlan(self.reinforce(total_reinforcements))
+
+        staging = max(borders, key=lambda t: t.troop_count)
+        reinforcements = [(staging, total_reinforcements)] if total_reinforcements > 0 else []
+        targets = sorted(self.enemy_neighbours(staging), key=lambda t: t.troop_count)
+        attacks = [AttackStep(staging, target, self.troops_per_round, self.stop_at, self.min_odds) for target in targets]
+        return TurnPlan(reinforcements, attacks, self.plan_manoeuvre())
+
+    def plan_manoeuvre(self) -> Optional[ManoeuvreStep]:
+        interior = [
+            territory for territory in self.personal_territories.values()
+            if territory.troop_count > 1 and not self.enemy_neighbours(territory)
+        ]
+        for source in sorted(interior, key=lambda t: -t.troop_count):
+            for destination in self.neighbours(source):
+                if destination.owner is self and self.enemy_neighbours(destination):
+                    return ManoeuvreStep(source, destination, source.troop_count - 1)
+        return None
+
+    def get_player_name(self):
+        return (f"Planning Agent {self.id}")
@@ -0,0 +1,79 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from Agent import Player
+from RiskUI import Game, GameObserver
+
+
+class Replay():
+    # One recorded game: a Game.snapshot() after placement and after every player's turn
+
+    def __init__(self, territory_ids: List[int], player_ids: List[int], player_names: List[str]):
+        self.territory_ids = list(territory_ids)
+        self.player_ids = list(player_ids)
+        self.player_names = list(player_names)
+        self.snapshots = []
+        self.winner_id = -1
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            territory_ids=np.array(self.territory_ids, dtype=np.int16),
+            player_ids=np.array(self.player_ids, dtype=np.int16),
+            player_names=np.array(self.player_names, dtype=str),
+            turns=np.array([snapshot[0] for snapshot in self.snapshots], dtype=np.int32),
+            current_players=np.array([snapshot[1] for snapshot in self.snapshots], dtype=np.int8),
+            owners=np.array([snapshot[2] for snapshot in self.snapshots], dtype=np.int8).reshape(len(self.snapshots), -1),
+            troops=np.array([snapshot[3] for snapshot in self.snapshots], dtype=np.int32).reshape(len(self.snapshots), -1),
+            winner_id=np.array(self.winner_id, dtype=np.int16)
+        )
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> 'Replay':
+        with np.load(path) as data:
+            replay = cls(data["territory_ids"].tolist(), data["player_ids"].tolist(), data["player_names"].tolist())
+            turns = data["turns"].tolist()
+            current_players = data["current_players"].tolist()
+            owners = data["owners"].tolist()
+            troops = data["troops"].tolist()
+            replay.winner_id = int(data["winner_id"])
+        replay.snapshots = [
+            (turn, current_player, tuple(owner_row), tuple(troop_row))
+            for turn, current_player, owner_row, troop_row in zip(turns, current_players, owners, troops)
+        ]
+        return replay
+
+
+class GameRecorder(GameObserver):
+    # Records every game played by the Game it is attached to. With a directory set,
+    # each finished game is written there as game_<n>.npz.
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.replay = None
+        self.games_recorded = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def on_game_start(self, game: Game) -> None:
+        self.replay = Replay(
+            list(game.territories),
+            [player.id for player in game.stored_players],
+            [player.get_player_name() for player in game.stored_players]
+        )
+        self.replay.snapshots.append(game.snapshot())
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        self.replay.snapshots.append(game.snapshot())
+
+    def on_game_end(self, game: Game, winner_id: int) -> None:
+        self.replay.winner_id = winner_id
+        if self.directory is not None:
+            self.replay.save(os.path.join(self.directory, f"game_{self.games_recorded:06d}.npz"))
+        self.games_recorded += 1
@@ -0,0 +1,158 @@
+import argparse
+import multiprocessing
+import os
+from typing import List, Optional, Tuple
+
+import pygame
+
+from Replay import Replay
+from RiskUI import Colour, Drawing, Game, territories
+from Viewer import ReplayPlayer
+
+
+class OffscreenRenderer():
+    # Draws replay snapshots with the normal Drawing code on pygame's dummy video driver
+
+    def __init__(self):
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        self.game = Game([], territories, simulating=True)
+        self.drawing = Drawing(self.game)
+        self.players_by_id = {}
+
+    def load_players(self, replay: Replay) -> None:
+        self.players_by_id = {
+            player_id: ReplayPlayer(player_id, name)
+            for player_id, name in zip(replay.player_ids, replay.player_names)
+        }
+        return None
+
+    def render(self, replay: Replay, frame_index: int) -> pygame.Surface:
+        snapshot = replay.snapshots[frame_index]
+        if replay.territory_ids != list(self.game.territories):
+            snapshot = reorder_snapshot(snapshot, replay.territory_ids, list(self.game.territories))
+        self.game.apply_snapshot(snapshot, self.players_by_id)
+        self.drawing.draw_map(self.game.territories, [])
+
+        frame = self.drawing.window.copy()
+        current_player = self.players_by_id.get(snapshot[1])
+        label = f"Turn {snapshot[0]}" + (f" - {current_player.get_player_name()}" if current_player else "")
+        frame.blit(self.drawing.font.render(label, True, Colour.BLACK.value[0]), (10, 10))
+        return frame
+
+
+def reorder_snapshot(snapshot: tuple, from_ids: List[int], to_ids: List[int]) -> tuple:
+    position = {territory_id: index for index, territory_id in enumerate(from_ids)}
+    turn, current_player, owners, troops = snapshot
+    return (
+        turn,
+        current_player,
+        tuple(owners[position[territory_id]] for territory_id in to_ids),
+        tuple(troops[position[territory_id]] for territory_id in to_ids)
+    )
+
+
+def select_key_frames(replay: Replay, max_frames: int = 12) -> List[int]:
+    # First and last frame, every elimination, then the turns with the most ownership changes
+    last = len(replay) - 1
+    eliminations = []
+    swings = []
+    for index in range(1, len(replay)):
+        previous_owners = replay.snapshots[index - 1][2]
+        owners = replay.snapshots[index][2]
+        if len(set(owners) - {-1}) < len(set(previous_owners) - {-1}):
+            eliminations.append(index)
+        changes = sum(1 for before, after in zip(previous_owners, owners) if before != after)
+        if changes:
+            swings.append((changes, index))
+
+    chosen = {0, last}
+    for index in eliminations + [index for changes, index in sorted(swings, reverse=True)]:
+        if len(chosen) >= max_frames:
+            break
+        chosen.add(index)
+    return sorted(chosen)
+
+
+_renderer = None
+
+
+def get_renderer() -> OffscreenRenderer:
+    # One renderer (and pygame display) per worker process
+    global _renderer
+    if _renderer is None:
+        _renderer = OffscreenRenderer()
+    return _renderer
+
+
+def render_frames(replay_path: str, output_directory: str, every: int = 1) -> List[str]:
+    renderer = get_renderer()
+    replay = Replay.load(replay_path)
+    renderer.load_players(replay)
+
+    name = os.path.splitext(os.path.basename(replay_path))[0]
+    frame_directory = os.path.join(output_directory, name)
+    os.makedirs(frame_directory, exist_ok=True)
+
+    written = []
+    for frame_index in range(0, len(replay), every):
+        path = os.path.join(frame_directory, f"frame_{frame_index:05d}.png")
+        pygame.image.save(renderer.render(replay, frame_index), path)
+        written.append(path)
+    return written
+
+
+def render_contact_sheet(replay_path: str, output_directory: str, max_frames: int = 12, columns: int = 4, scale: float = 0.3) -> List[str]:
+    renderer = get_renderer()
+    replay = Replay.load(replay_path)
+    renderer.load_players(replay)
+
+    frame_indexes = select_key_frames(replay, max_frames)
+    window_width, window_height = renderer.drawing.window.get_size()
+    thumbnail_size = (int(window_width * scale), int(window_height * scale))
+    rows = (len(frame_indexes) + columns - 1) // columns
+
+    sheet = pygame.Surface((thumbnail_size[0] * min(columns, len(frame_indexes)), thumbnail_size[1] * rows))
+    sheet.fill(Colour.WHITE.value[0])
+    for position, frame_index in enumerate(frame_indexes):
+        thumbnail = pygame.transform.smoothscale(renderer.render(replay, frame_index), thumbnail_size)
+        sheet.blit(thumbnail, ((position % columns) * thumbnail_size[0], (position // columns) * thumbnail_size[1]))
+
+    os.makedirs(output_directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(replay_path))[0]
+    path = os.path.join(output_directory, f"{name}_sheet.png")
+    pygame.image.save(sheet, path)
+    return [path]
+
+
+def _render_job(job: Tuple[str, str, str, dict]) -> List[str]:
+    mode, replay_path, output_directory, options = job
+    if mode == "frames":
+        return render_frames(replay_path, output_directory, **options)
+    return render_contact_sheet(replay_path, output_directory, **options)
+
+
+def render_batch(replay_paths: List[str], output_directory: str, mode: str = "sheet", workers: Optional[int] = None, **options) -> List[str]:
+    jobs = [(mode, replay_path, output_directory, options) for replay_path in replay_paths]
+    written = []
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        for paths in pool.imap_unordered(_render_job, jobs):
+            written.extend(paths)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render recorded games (see Replay.GameRecorder) to PNG files offscreen")
+    parser.add_argument("replays", nargs="+", help="replay .npz files")
+    parser.add_argument("--out", default="renders", help="output directory")
+    parser.add_argument("--mode", choices=["sheet", "frames"], default="sheet", help="contact sheet of key moments or every frame")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--every", type=int, default=1, help="frames mode: render every n-th snapshot")
+    parser.add_argument("--max-frames", type=int, default=12, help="sheet mode: number of key moments")
+    arguments = parser.parse_args()
+
+    if arguments.mode == "frames":
+        options = {"every": arguments.every}
+    else:
+        options = {"max_frames": arguments.max_frames}
+    written = render_batch(arguments.replays, arguments.out, arguments.mode, arguments.workers, **options)
+    print(f"Wrote {len(written)} files to {arguments.out}")
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from Agent import Player
+from RiskUI import Game, GameObserver
+
+
+# One row per game. Per-seat columns are padded to MAX_SEATS with -1.
+MAX_SEATS = 6
+COLUMNS = {
+    "seed": (np.int64, ()),
+    "players": (np.int8, ()),
+    "agents": (np.int16, (MAX_SEATS,)),
+    "winner_seat": (np.int8, ()),
+    "turns": (np.int32, ()),
+    "fitness": (np.int32, (MAX_SEATS,)),
+    "elapsed": (np.float32, ()),
+    "adjudicated": (np.bool_, ())
+}
+MANIFEST = "manifest.json"
+
+
+class ResultWriter():
+    # Appends game results to <directory>/chunk_<n>/<column>.npy, chunk_size rows at a time,
+    # so memory stays bounded however many games are written. Agent names are stored once in
+    # the manifest and referenced by index.
+
+    def __init__(self, directory: str, chunk_size: int = 65536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.chunks = []
+        self.agent_names = []
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            with open(os.path.join(directory, MANIFEST)) as file:
+                manifest = json.load(file)
+            self.chunks = manifest["chunks"]
+            self.agent_names = manifest["agents"]
+        self.agent_indexes = {name: index for index, name in enumerate(self.agent_names)}
+        self.buffers = {name: np.full((chunk_size,) + shape, -1, dtype=dtype) for name, (dtype, shape) in COLUMNS.items()}
+        self.rows = 0
+
+    def agent_index(self, name: str) -> int:
+        index = self.agent_indexes.get(name)
+        if index is None:
+            index = len(self.agent_names)
+            self.agent_names.append(name)
+            self.agent_indexes[name] = index
+        return index
+
+    def append(self, result: dict) -> None:
+        # result is a Tournament.play_match() dict; seed, elapsed and adjudicated are optional
+        row = self.rows
+        players = len(result["agents"])
+        buffers = self.buffers
+        buffers["seed"][row] = result.get("seed", -1)
+        buffers["players"][row] = players
+        buffers["agents"][row, :players] = [self.agent_index(name) for name in result["agents"]]
+        buffers["winner_seat"][row] = result["winner_seat"]
+        buffers["turns"][row] = result["turns"]
+        buffers["fitness"][row, :players] = result["fitness"]
+        buffers["elapsed"][row] = result.get("elapsed", np.nan)
+        buffers["adjudicated"][row] = result.get("adjudicated", False)
+        self.rows += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+        return None
+
+    def flush(self) -> None:
+        if self.rows == 0:
+            return None
+        chunk_name = f"chunk_{len(self.chunks):05d}"
+        chunk_directory = os.path.join(self.directory, chunk_name)
+        os.makedirs(chunk_directory, exist_ok=True)
+        for name, buffer in self.buffers.items():
+            np.save(os.path.join(chunk_directory, f"{name}.npy"), buffer[:self.rows])
+            buffer.fill(-1)
+        self.chunks.append({"name": chunk_name, "rows": self.rows})
+        self.rows = 0
+
+        # The manifest only lists complete chunks, so readers never see a half-written one
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with open(manifest_path + ".tmp", "w") as file:
+            json.dump({"columns": list(COLUMNS), "agents": self.agent_names, "chunks": self.chunks}, file)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return None
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ResultReader():
+    # Memory-maps the chunks listed in a ResultWriter manifest
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file)
+        self.agent_names = manifest["agents"]
+        self.chunk_names = [chunk["name"] for chunk in manifest["chunks"]]
+        self.num_rows = sum(chunk["rows"] for chunk in manifest["chunks"])
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def chunks(self, columns: Optional[List[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        # Zero-copy: each chunk's columns are np.memmap views of the .npy files
+        for chunk_name in self.chunk_names:
+            yield {
+                name: np.load(os.path.join(self.directory, chunk_name, f"{name}.npy"), mmap_mode="r")
+                for name in (columns or COLUMNS)
+            }
+
+    def column(self, name: str) -> np.ndarray:
+        # Concatenates one column across chunks (this copies)
+        parts = [chunk[name] for chunk in self.chunks([name])]
+        if not parts:
+            dtype, shape = COLUMNS[name]
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.concatenate(parts)
+
+    def win_counts(self) -> Dict[str, int]:
+        counts = np.zeros(len(self.agent_names), dtype=np.int64)
+        for chunk in self.chunks(["agents", "winner_seat"]):
+            winners = chunk["agents"][np.arange(len(chunk["winner_seat"])), chunk["winner_seat"]]
+            counts += np.bincount(winners, minlength=len(self.agent_names))
+        return {name: int(count) for name, count in zip(self.agent_names, counts)}
+
+
+class ResultRecorder(GameObserver):
+    # Streams the outcome of every game a Game plays into a ResultWriter, with agents named
+    # by class. Game has no per-game seed, so seed is left at -1.
+
+    def __init__(self, writer: ResultWriter):
+        self.writer = writer
+        self.start = None
+
+    def on_game_start(self, game: Game) -> None:
+        self.start = time.perf_counter()
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        pass
+
+    def on_game_end(self, game: Game, winner_id: int) -> None:
+        players = game.stored_players
+        self.writer.append({
+            "agents": [type(player).__name__ for player in players],
+            "winner_seat": [player.id for player in players].index(winner_id),
+            "turns": game.turn_count,
+            "fitness": game.get_fitness(winner_id),
+            "elapsed": time.perf_counter() - self.start,
+            "adjudicated": game.adjudication is not None or game.turn_count >= game.max_turns
+        })
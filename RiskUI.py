@@ -1,17 +1,21 @@
 
 
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 from enum import Enum
 import time
 import numpy as np
 import pygame
 import sys
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
 import random
 
 
-from Agent import RandomAgent, Player
+from Agent import AgentPolicy, RandomAgent, Player
 from AggressiveAgent import AggressiveAgent
+from Latency import LatencyTracker, random_fallback
+from StateView import EMPTY_FRONTIER, EMPTY_MANOEUVRES, FrontierView, LazyView, ManoeuvreView
+from Trace import AGENT_CALL, ATTACK_ROUND, CACHE_REBUILD, CAPTURE, PHASE, TURN_START, GameTracer
+from TurnPlan import AttackStep, ManoeuvreStep, TurnPlan, conquest_odds
 
 
 
@@ -105,11 +109,44 @@ REGION_BONUSES = {
     Region.AUSTRALIA: 2
 }
 
+# Zobrist keys, drawn from a fixed seed so hashes agree across processes and stored corpora
+ZOBRIST_PLAYER_SLOTS = 8  # slot 0 is "no owner", player ids map to id + 1
+ZOBRIST_TROOP_BUCKETS = 24
+ZOBRIST_CARD_BUCKETS = 8
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_TERRITORIES = [[[_zobrist_random.getrandbits(64) for _ in range(ZOBRIST_TROOP_BUCKETS)] for _ in range(ZOBRIST_PLAYER_SLOTS)] for _ in range(len(ADJACENCY_ARRAY))]
+ZOBRIST_CURRENT_PLAYER = [_zobrist_random.getrandbits(64) for _ in range(ZOBRIST_PLAYER_SLOTS)]
+ZOBRIST_CARDS = [[[_zobrist_random.getrandbits(64) for _ in range(ZOBRIST_CARD_BUCKETS)] for _ in range(3)] for _ in range(ZOBRIST_PLAYER_SLOTS)]
+
+
+def troop_bucket(troop_count: int) -> int:
+    # Exact up to 15 troops, then one bucket per power of two
+    if troop_count < 16:
+        return max(troop_count, 0)
+    return min(11 + troop_count.bit_length(), ZOBRIST_TROOP_BUCKETS - 1)
+
+
 x_width_multiplier = 1.3
 y_height_multiplier = 1.5
 
 WIDTH, HEIGHT = 800*x_width_multiplier, 600*y_height_multiplier
 
+TERRITORY_DRAW_RADIUS = 42  # Covers the territory circle and the highlight ring
+
+# Cached sweep results (Sweep.py) are keyed on this and on a hash of the engine's and the agents'
+# source files, so editing code invalidates them by itself. Bump it for changes that alter results
+# without touching those files: data read from elsewhere (e.g. an opening book's contents), or a
+# dependency whose behaviour changes results (numpy, the random module), or a fix to how Sweep.py
+# scores games.
+ENGINE_VERSION = 3
+
+UNIT_CAP = 130  # Default of Player.calculate_reinforcement
+
+# Stalemate adjudication (Game.stalemate_rounds): quiet rounds with every player at the unit cap,
+# and times the same board may recur between ownership changes
+STALEMATE_CAPPED_ROUNDS = 3
+STALEMATE_REPEATS = 3
+
 
 
 
@@ -118,6 +155,17 @@ WIDTH, HEIGHT = 800*x_width_multiplier, 600*y_height_multiplier
     
     
 
+def compare_dice(attacker_dice: List[int], defender_dice: List[int]) -> Tuple[int, int]:
+    attacker_losses = 0
+    defender_losses = 0
+    for a_roll, d_roll in zip(sorted(attacker_dice, reverse=True), sorted(defender_dice, reverse=True)):
+        if a_roll > d_roll:
+            defender_losses += 1
+        else:
+            attacker_losses += 1
+    return attacker_losses, defender_losses
+
+
 class Territory():
     def __init__(self, name: str, x_pos: int, y_pos: int, continent: Continent, id: int):
         self.name = name
@@ -182,15 +230,13 @@ class Territory():
             raise ValueError("Defending territory has no troops")
 
         # Dice rolls
-        attacker_dice = sorted([random.randint(1, 6) for _ in range(min(attacking_troops, 3))], reverse=True)
-        defender_dice = sorted([random.randint(1, 6) for _ in range(min(self.troop_count, 2))], reverse=True)
+        attacker_dice = [random.randint(1, 6) for _ in range(min(attacking_troops, 3))]
+        defender_dice = [random.randint(1, 6) for _ in range(min(self.troop_count, 2))]
 
         # Compare dice rolls
-        for a_roll, d_roll in zip(attacker_dice, defender_dice):
-            if a_roll > d_roll:
-                self.troop_count -= 1
-            else:
-                attacking_troops -= 1
+        attacker_losses, defender_losses = compare_dice(attacker_dice, defender_dice)
+        self.troop_count -= defender_losses
+        attacking_troops -= attacker_losses
 
         # Check if the territory has been conquered
         if self.troop_count <= 0:
@@ -211,10 +257,14 @@ class Territory():
 
 
 class Game():
-    def __init__(self, players : List[Player], territories : Dict[Territory, int], simulating : bool  = False, num_players = 3):
-        if not simulating:
-            self.drawing = Drawing()
-        random.shuffle(players) # random.shuffle shuffles in-place.
+    def __init__(self, players : List[Player], territories : Dict[Territory, int], simulating : bool  = False, num_players = 3,
+                 latency_tracker : LatencyTracker = None, decision_budget : float = None,
+                 budget_fallback : Callable[[Player, str, tuple], object] = random_fallback, shuffle_turn_order : bool = True,
+                 stalemate_rounds : int = None, tracer : GameTracer = None, unit_cap : int = UNIT_CAP, heatmap : 'TerritoryHeatmap' = None):
+        # Tournaments fix the seat order themselves and rotate it between games
+        self.shuffle_turn_order = shuffle_turn_order
+        if shuffle_turn_order:
+            random.shuffle(players) # random.shuffle shuffles in-place.
         self.turn_order = players
 
         
@@ -231,44 +281,155 @@ class Game():
             adjacent_ids = ADJACENCY_ARRAY[territory_id]
             adjacent_territories = [self.territories[adjacent_id] for adjacent_id in adjacent_ids]
             self.precomputed_adjacent_territories[territory_id] = adjacent_territories
+        self.undo_stack = []
+        self.current_player = None
+        self.turn_count = 0
+        self.zobrist_hash = self.compute_zobrist_hash()
+        self.observers = []
+        self.latency_tracker = latency_tracker
+        # Seconds allowed per agent decision; an overrunning answer is discarded for budget_fallback's
+        self.decision_budget = decision_budget
+        self.budget_fallback = budget_fallback
+        # Rounds without an ownership change before a game is adjudicated; None plays to max_turns
+        self.stalemate_rounds = stalemate_rounds
+        self.stalemate_stats = Counter()
+        self.tracer = tracer
+        # Territory-control statistics (Heatmap.TerritoryHeatmap), fed directly rather than as an
+        # observer so that leaving it on costs next to nothing
+        self.heatmap = heatmap
+        # Reinforcements stop once a player's troops would reach unit_cap
+        self.unit_cap = unit_cap
+        # The turn cap of the game being played, for observers judging how it ended
+        self.max_turns = None
+        self.adjudication = None
+        self.conquests = 0
+        self.capped_players = set()
+        self.reset_stalemate_tracking()
+        self.viewer = None
+        if not simulating:
+            # The viewer runs in its own process so rendering never blocks the engine.
+            # Imported here because Viewer itself builds on this module.
+            from Viewer import ViewerProcess
+            self.viewer = ViewerProcess()
+            self.observers.append(self.viewer)
         # self.start_turns(players)
 
     
     def reset_game(self):
+        self.undo_stack = []
         for territory in self.territories.values():
             territory.reset()
 
         for player in self.stored_players:
             player.reset()
-        random.shuffle(self.stored_players)
+        if self.shuffle_turn_order:
+            random.shuffle(self.stored_players)
+        self.current_player = None
+        self.turn_count = 0
+        self.zobrist_hash = self.compute_zobrist_hash()
+        self.adjudication = None
+        self.conquests = 0
+        self.capped_players = set()
+        self.reset_stalemate_tracking()
+
+    def reset_stalemate_tracking(self) -> None:
+        self.quiet_rounds = 0
+        self.capped_rounds = 0
+        self.conquests_seen = self.conquests
+        self.seen_states = Counter()
+        return None
+
+    def detect_stalemate(self, players: List[Player]) -> str:
+        # Called after every round; returns why the game is stalled, or None
+        if self.conquests != self.conquests_seen:
+            self.reset_stalemate_tracking()
+            return None
+        self.quiet_rounds += 1
+        if self.quiet_rounds >= self.stalemate_rounds:
+            return "no_conquest"
+
+        # Nobody can grow and nobody has taken anything
+        if all(player in self.capped_players for player in players):
+            self.capped_rounds += 1
+            if self.capped_rounds >= STALEMATE_CAPPED_ROUNDS:
+                return "capped"
+        else:
+            self.capped_rounds = 0
+
+        _, _, owners, troops = self.snapshot()
+        self.seen_states[(owners, troops)] += 1
+        if self.seen_states[(owners, troops)] >= STALEMATE_REPEATS:
+            return "repeated"
+        return None
+
+    def call_agent(self, player: Player, method: str, *args) -> object:
+        tracing = self.tracer is not None and self.tracer.active
+        if self.latency_tracker is None and self.decision_budget is None and not tracing:
+            return getattr(player, method)(*args)
+        start = time.perf_counter_ns()
+        result = getattr(player, method)(*args)
+        elapsed_ns = time.perf_counter_ns() - start
+        elapsed = elapsed_ns / 1e9
+        if tracing:
+            self.tracer.record(AGENT_CALL, method, start, elapsed_ns, player.id)
+        # Agents can't be interrupted mid-decision, so an overrun is only caught once it returns
+        overrun = self.decision_budget is not None and elapsed > self.decision_budget
+        if self.latency_tracker is not None:
+            self.latency_tracker.record(type(player).__name__, method, elapsed, overrun)
+        if overrun:
+            return self.budget_fallback(player, method, args)
+        return result
 
     def play_game(self, players: List[Player] = None, max_turns: int = 200) -> int:
         self.reset_game()
+        if self.tracer is not None:
+            self.tracer.start_game()
         if players is None:
             players = self.stored_players
         players = self.selection(players)
         players = self.add_infantry(players)
+        for observer in self.observers:
+            observer.on_game_start(self)
+        self.turn_count = 0
+        if self.heatmap is not None:
+            self.heatmap.start_game(self)
+        return self.play_rounds(players, max_turns)
+
+    def play_rounds(self, players: List[Player], max_turns: int = 200, start: int = 0) -> int:
+        # The main loop of play_game. The first round starts at players[start]; the players
+        # before it have already moved this round, which lets a game resume mid-round.
+        self.max_turns = max_turns
         running = True
-        turn_count = 0
         while running:
             # Create a new list to store active players
-            active_players = []
-            for player in players:
+            active_players = [player for player in players[:start] if player.personal_territories]
+            for player in players[start:]:
                 if player.personal_territories:
                     active_players.append(player)
                     self.main_section(player)
-                    if not self.simulating:
-                        time.sleep(0.1)
+                    if self.heatmap is not None:
+                        self.heatmap.end_turn(self, player)
+                    for observer in self.observers:
+                        observer.on_turn_end(self, player)
+            if self.heatmap is not None:
+                self.heatmap.end_round(self)
         
             # Update the list of players with active players
             players = active_players
+            start = 0
 
             # arr = [(x, 0) for x in range(0,len(ADJACENCY_ARRAY))]
             # print(arr)
 
+            if self.stalemate_rounds is not None and len(players) > 1 and self.turn_count < max_turns:
+                self.adjudication = self.detect_stalemate(players)
+
             # Check if there is only one player remaining or the maximum number of turns is reached
-            if len(players) == 1 or turn_count >= max_turns:
+            if len(players) == 1 or self.turn_count >= max_turns or self.adjudication is not None:
                 running = False
+                self.stalemate_stats["games"] += 1
+                if self.adjudication is not None:
+                    self.stalemate_stats[self.adjudication] += 1
 
                 # Count the number of territories each player has
                 player_territory_count = {}
@@ -279,15 +440,40 @@ class Game():
                 
                 max_territories_player = max(player_territory_count, key=player_territory_count.get)
                 fitnesses = self.get_fitness(max_territories_player)
+                if self.heatmap is not None:
+                    self.heatmap.end_game(self, max_territories_player)
+                for observer in self.observers:
+                    observer.on_game_end(self, max_territories_player)
                 return max_territories_player, fitnesses
-            if not self.simulating:
-                self.drawing.draw_map(self.territories)
 
-            turn_count += 1
+            self.turn_count += 1
             # input()
 
         return None
     
+    def snapshot(self) -> tuple:
+        # Owner id (-1 when unowned) and troop count per territory, in self.territories order
+        owners = tuple(-1 if territory.owner is None else territory.owner.id for territory in self.territories.values())
+        troops = tuple(territory.troop_count for territory in self.territories.values())
+        current_player_id = -1 if self.current_player is None else self.current_player.id
+        return (self.turn_count, current_player_id, owners, troops)
+
+    def apply_snapshot(self, snapshot: tuple, players_by_id: Dict[int, Player]) -> None:
+        turn_count, current_player_id, owners, troops = snapshot
+        for player in players_by_id.values():
+            player.personal_territories = {}
+            player.territories_version += 1
+        for territory, owner_id, troop_count in zip(self.territories.values(), owners, troops):
+            # Troops can legitimately be 0 after an all-in invasion, so bypass give_player_territory
+            territory.owner = players_by_id.get(owner_id)
+            territory.troop_count = troop_count
+            if territory.owner is not None:
+                territory.owner.personal_territories[territory.id] = territory
+        self.turn_count = turn_count
+        self.current_player = players_by_id.get(current_player_id)
+        self.zobrist_hash = self.compute_zobrist_hash()
+        return None
+
     def get_fitness(self, best_player : Player) -> List[int]:
         fitness_scores = []
         for player in self.stored_players:
@@ -303,21 +489,23 @@ class Game():
         
 
     def selection(self, players: List[Player]) -> List[Player]:  # I'm going to make this return the state of turns when it's done selection
-        for x in range(len(territories.items())):
+        for x in range(len(self.territories)):
             current_player = players.pop(0)
             players.append(current_player)  # Circular 
+            self.set_current_player(current_player)
 
             available_territories = self.get_available_territories()
-            selected_territory = current_player.make_selection(available_territories)
+            selected_territory = self.call_agent(current_player, "make_selection", available_territories)
+            territory_key = self.territory_key(selected_territory)
             current_player.give_player_territory(selected_territory, 1)
+            self.zobrist_hash ^= territory_key ^ self.territory_key(selected_territory)
             current_player.remove_player_units(1)
 
         return players
 
     def get_available_territories(self) -> List[Territory]:
         available_territories = []
-        for territory_id in territories:
-            territory = territories[territory_id]
+        for territory in self.territories.values():
             if territory.get_owner() is None:
                 available_territories.append(territory)
 
@@ -329,25 +517,72 @@ class Game():
 
             current_player = players.pop(0)
             players.append(current_player)  # Circular 
+            self.set_current_player(current_player)
 
-            selected_territory = current_player.add_infantry()
+            selected_territory = self.call_agent(current_player, "add_infantry")
+            territory_key = self.territory_key(selected_territory)
             selected_territory.increment_troop_count(1)
+            self.zobrist_hash ^= territory_key ^ self.territory_key(selected_territory)
             current_player.remove_player_units(1)
         return players
 
     def main_section(self, player: Player) -> None:
+        self.set_current_player(player)
+        tracing = self.tracer is not None and self.tracer.active
+        if tracing:
+            self.tracer.record(TURN_START, f"turn {self.turn_count}", time.perf_counter_ns(), 0, player.id)
+            phase_start = time.perf_counter_ns()
         personal_territories_changed = player.personal_territories_changed()
-        self.reinforce(player, personal_territories_changed = personal_territories_changed)
+        reinforcement_count = self.begin_reinforcement(player, personal_territories_changed)
+        for observer in self.observers:
+            observer.on_turn_start(self, player, reinforcement_count)
+
+        # Agents may decide the whole turn at once; None falls back to the per-step callbacks
+        plan = self.call_agent(player, "plan_turn", reinforcement_count)
+        if plan is not None:
+            self.execute_plan(player, plan, reinforcement_count, personal_territories_changed)
+            if tracing:
+                self.trace_phase("plan", player, phase_start)
+            return None
+
+        self.place_reinforcements(player, self.call_agent(player, "reinforce", reinforcement_count), reinforcement_count)
+        if tracing:
+            phase_start = self.trace_phase("reinforce", player, phase_start)
+        if not personal_territories_changed:
+            self.build_unused_caches(player)
         self.invade(player, personal_territories_changed = personal_territories_changed)
+        if tracing:
+            phase_start = self.trace_phase("invade", player, phase_start)
         self.manoeuvre(player, personal_territories_changed = personal_territories_changed)
+        if tracing:
+            self.trace_phase("manoeuvre", player, phase_start)
         
+    def trace_phase(self, name: str, player: Player, start_ns: int) -> int:
+        # Records the phase that began at start_ns and returns its end, the next phase's start
+        end = time.perf_counter_ns()
+        self.tracer.record(PHASE, name, start_ns, end - start_ns, player.id)
+        return end
+
 
     def reinforce(self, player: Player, personal_territories_changed : bool = False) -> None:
-        reinforcement_count = player.calculate_reinforcement(personal_territories_changed)
+        reinforcement_count = self.begin_reinforcement(player, personal_territories_changed)
+        self.place_reinforcements(player, self.call_agent(player, "reinforce", reinforcement_count), reinforcement_count)
+        return None
+
+    def begin_reinforcement(self, player: Player, personal_territories_changed : bool = False) -> int:
+        cards_key = self.cards_key(player)
+        reinforcement_count = player.calculate_reinforcement(personal_territories_changed, self.unit_cap)
+        self.zobrist_hash ^= cards_key ^ self.cards_key(player)
+        # Base reinforcement is at least 3, so 0 means the unit cap was hit
+        if reinforcement_count == 0:
+            self.capped_players.add(player)
+        else:
+            self.capped_players.discard(player)
 
         player.give_player_units(reinforcement_count)
-        reinforcement_tuples = player.reinforce(reinforcement_count)
+        return reinforcement_count
 
+    def place_reinforcements(self, player: Player, reinforcement_tuples: List[Tuple[Territory, int]], reinforcement_count: int) -> None:
         # Verify that the total number of reinforcements does not exceed the allowed reinforcement count
         total_reinforcements = sum(t[1] for t in reinforcement_tuples)
         
@@ -356,7 +591,11 @@ class Game():
 
         for reinforcement_tuple in reinforcement_tuples:
             if reinforcement_tuple[1] > 0:
+                territory_key = self.territory_key(reinforcement_tuple[0])
                 reinforcement_tuple[0].increment_troop_count(reinforcement_tuple[1])
+                self.zobrist_hash ^= territory_key ^ self.territory_key(reinforcement_tuple[0])
+                if self.observers:
+                    self.notify_action(player, "reinforce", None, reinforcement_tuple[0], reinforcement_tuple[1])
             player.reset_player_units()
 
         return None
@@ -365,11 +604,13 @@ class Game():
         invading = True
         successfully_attacked = False
         while invading:
-            invasion = player.invade(self.get_enemy_adjacent_territories(player, changed = personal_territories_changed))
+            invasion = self.call_agent(player, "invade", self.lazy_enemy_adjacent_territories(player, personal_territories_changed))
             if invasion is None:
                 invading = False
                 if successfully_attacked:
+                    cards_key = self.cards_key(player)
                     player.add_card()
+                    self.zobrist_hash ^= cards_key ^ self.cards_key(player)
             else:
 
                 home_territory, target_territory, num_attacking_troops = invasion
@@ -378,63 +619,179 @@ class Game():
                     print(f"Cannot invade own territory: {target_territory.name}")
                     continue
 
-                home_territory.decrement_troop_count(num_attacking_troops)
-
-                success, num_remaining = target_territory.attack(num_attacking_troops)
-                if success:
-                    target_territory.owner.remove_player_territory(target_territory)
-                    player.give_player_territory(target_territory, num_remaining)
-                    target_territory.set_owner(player)
-                    target_territory.set_troop_count(num_remaining)
+                if self.attack_round(player, home_territory, target_territory, num_attacking_troops):
                     successfully_attacked = True
-                    
-                        
-                    # player.add_card(card)
-                    
-                    
-                else:
-                    pass
 
                 
         return successfully_attacked
+
+    def attack_round(self, player: Player, home_territory: Territory, target_territory: Territory, num_attacking_troops: int) -> bool:
+        # One invasion: commit the troops for a single dice round; returns whether the target fell
+        home_key = self.territory_key(home_territory)
+        target_key = self.territory_key(target_territory)
+        home_territory.decrement_troop_count(num_attacking_troops)
+
+        success, num_remaining = target_territory.attack(num_attacking_troops)
+        if success:
+            if self.tracer is not None and self.tracer.active:
+                self.tracer.record(CAPTURE, target_territory.name, time.perf_counter_ns(), 0, player.id,
+                                   {"from": target_territory.owner.id, "troops": num_remaining})
+            target_territory.owner.remove_player_territory(target_territory)
+            player.give_player_territory(target_territory, num_remaining)
+            target_territory.set_owner(player)
+            target_territory.set_troop_count(num_remaining)
+            self.conquests += 1
+        self.zobrist_hash ^= home_key ^ self.territory_key(home_territory) ^ target_key ^ self.territory_key(target_territory)
+        if self.observers:
+            self.notify_action(player, "attack", home_territory, target_territory, num_attacking_troops)
+        if self.tracer is not None and self.tracer.active:
+            self.tracer.record(ATTACK_ROUND, f"{home_territory.name} -> {target_territory.name}", time.perf_counter_ns(), 0, player.id,
+                               {"troops": num_attacking_troops, "defenders_left": target_territory.troop_count, "captured": success})
+        return success
+
+    def execute_plan(self, player: Player, plan: TurnPlan, reinforcement_count: int, personal_territories_changed: bool = False) -> None:
+        self.place_reinforcements(player, plan.reinforcements, reinforcement_count)
+
+        successfully_attacked = False
+        steps = deque(plan.attacks)
+        while steps:
+            step = steps.popleft()
+            problem = self.invalid_attack_step(player, step)
+            if problem is not None:
+                # The only agent call during a planned turn: replace or drop the broken step
+                replacement = self.call_agent(player, "on_invalid_step", step, problem)
+                if replacement is not None and replacement is not step:
+                    steps.appendleft(replacement)
+                continue
+
+            while step.target.owner is not player:
+                available = step.source.troop_count - step.stop_at
+                if available <= 0 or conquest_odds(available, step.target.troop_count, step.troops_per_round) < step.min_odds:
+                    break
+                if self.attack_round(player, step.source, step.target, min(step.troops_per_round, available)):
+                    successfully_attacked = True
+
+        if successfully_attacked:
+            cards_key = self.cards_key(player)
+            player.add_card()
+            self.zobrist_hash ^= cards_key ^ self.cards_key(player)
+
+        step = plan.manoeuvre
+        while step is not None:
+            problem = self.invalid_manoeuvre_step(player, step)
+            if problem is None:
+                self.move_troops(player, step.source, step.destination, step.troops)
+                break
+            replacement = self.call_agent(player, "on_invalid_step", step, problem)
+            step = None if replacement is step else replacement
+
+        # The plan path never rebuilds the frontier caches, so have the next turn rebuild them
+        if personal_territories_changed:
+            self.invalidate_player_caches(player)
+        return None
+
+    def invalid_attack_step(self, player: Player, step: AttackStep) -> str:
+        if step.source.owner is not player:
+            return "source lost"
+        if step.target.owner is player:
+            return "target already owned"
+        if step.target not in self.precomputed_adjacent_territories[step.source.id]:
+            return "target not adjacent"
+        if step.troops_per_round <= 0:
+            return "no troops committed"
+        return None
+
+    def invalid_manoeuvre_step(self, player: Player, step: ManoeuvreStep) -> str:
+        if step.source.owner is not player or step.destination.owner is not player:
+            return "territory lost"
+        if step.troops <= 0 or step.source.troop_count < step.troops:
+            return "not enough troops"
+        return None
         
 
 
-    def get_enemy_adjacent_territories(self, player: Player,changed : bool) -> List[Tuple[Territory, List[Territory]]]:
-        if changed:
+    def lazy_enemy_adjacent_territories(self, player: Player, changed: bool) -> FrontierView:
+        # A rebuild is left to the agent's first use of the view, so agents that ignore it skip it
+        if changed and player.adjacent_territories_cache.version != player.territories_version:
+            return LazyView(lambda: self.get_enemy_adjacent_territories(player, True))
+        return player.adjacent_territories_cache
+
+    def lazy_manoeuvreable_territories(self, player: Player, changed: bool) -> ManoeuvreView:
+        if changed and player.manoeuvreable_tiles.version != player.territories_version:
+            return LazyView(lambda: self.get_manoeuvreable_territories(player, True))
+        return player.manoeuvreable_tiles
+
+    def build_unused_caches(self, player: Player) -> None:
+        # A turn without changes reuses the caches as they were when it started. If the agent
+        # never looked at a view during the turn that should have rebuilt it, it's built now,
+        # before this turn's conquests, from the same territories.
+        if player.adjacent_territories_cache.version != player.territories_version:
+            self.get_enemy_adjacent_territories(player, True)
+        if player.manoeuvreable_tiles.version != player.territories_version:
+            self.get_manoeuvreable_territories(player, True)
+        return None
+
+    def get_enemy_adjacent_territories(self, player: Player,changed : bool) -> FrontierView:
+        # A view built at the current territories_version is still exact, so it's kept
+        if changed and player.adjacent_territories_cache.version != player.territories_version:
+            rebuild_start = time.perf_counter_ns()
             player_territories_set = set(player.personal_territories)
             enemy_adjacent_territories = []
+            targets_by_id = {}
 
             for territory_id in player.personal_territories:
                 adjacent_territories = self.precomputed_adjacent_territories[territory_id]
                 adjacent_enemy_territories = [t for t in adjacent_territories if t.id not in player_territories_set]
                 enemy_adjacent_territories.append((self.territories[territory_id], adjacent_enemy_territories))
+                targets_by_id[territory_id] = adjacent_enemy_territories
 
-            player.adjacent_territories_cache = enemy_adjacent_territories
+            player.adjacent_territories_cache = FrontierView(enemy_adjacent_territories, self.territories, targets_by_id)
+            player.adjacent_territories_cache.version = player.territories_version
+            if self.tracer is not None and self.tracer.active:
+                self.tracer.record(CACHE_REBUILD, "enemy_adjacent", rebuild_start, time.perf_counter_ns() - rebuild_start, player.id)
 
         return player.adjacent_territories_cache
     
     def manoeuvre(self, player: Player, personal_territories_changed: bool = True) -> None:
         
-        manoveureable_territories = self.get_manoeuvreable_territories(player, changed = personal_territories_changed)
+        manoveureable_territories = self.lazy_manoeuvreable_territories(player, personal_territories_changed)
         
-        source_territory, destination_territory, num_troops = player.manoeuvre(manoveureable_territories)
+        source_territory, destination_territory, num_troops = self.call_agent(player, "manoeuvre", manoveureable_territories)
         
         if source_territory is None:
             return None 
         
+        self.move_troops(player, source_territory, destination_territory, num_troops)
+        return None
+
+    def move_troops(self, player: Player, source_territory: Territory, destination_territory: Territory, num_troops: int) -> None:
+        source_key = self.territory_key(source_territory)
         if source_territory.get_troop_count()<num_troops:
             if source_territory.get_troop_count()>1:
                 source_territory.decrement_troop_count(1) # Bad programming punishment.
+                self.zobrist_hash ^= source_key ^ self.territory_key(source_territory)
+                if self.observers:
+                    self.notify_action(player, "manoeuvre_penalty", source_territory, destination_territory, num_troops)
             return None
         
+        destination_key = self.territory_key(destination_territory)
         source_territory.decrement_troop_count(num_troops)
         destination_territory.increment_troop_count(num_troops)
+        self.zobrist_hash ^= source_key ^ destination_key
+        self.zobrist_hash ^= self.territory_key(source_territory) ^ self.territory_key(destination_territory)
+        if self.observers:
+            self.notify_action(player, "manoeuvre", source_territory, destination_territory, num_troops)
+
+        return None
 
+    def notify_action(self, player: Player, kind: str, source: Territory, target: Territory, count: int) -> None:
+        for observer in self.observers:
+            observer.on_action(self, player, kind, source, target, count)
         return None
     
-    def get_manoeuvreable_territories(self, player: Player, changed: bool = True) -> List[Tuple[Territory, List[Territory]]]:
-        if changed:
+    def get_manoeuvreable_territories(self, player: Player, changed: bool = True) -> ManoeuvreView:
+        if changed and player.manoeuvreable_tiles.version != player.territories_version:
+            rebuild_start = time.perf_counter_ns()
             player_territories_set = set(player.personal_territories)
             maneuverable_territories = []
 
@@ -466,65 +823,361 @@ class Game():
                     dfs(territory_id, island_num)
 
             # Create maneuverable territories using the island information
+            reachable_by_id = {}
             for territory_id in player_territories_set:
                 island_num = island_map[territory_id]
                 reachable_territories = [self.territories[t_id] for t_id in island_territories[island_num] if t_id != territory_id]
                 maneuverable_territories.append((self.territories[territory_id], reachable_territories))
+                reachable_by_id[territory_id] = reachable_territories
 
+            maneuverable_territories = ManoeuvreView(maneuverable_territories, self.territories, reachable_by_id, island_map)
+            maneuverable_territories.version = player.territories_version
             player.manoeuvreable_tiles = maneuverable_territories
+            if self.tracer is not None and self.tracer.active:
+                self.tracer.record(CACHE_REBUILD, "manoeuvreable", rebuild_start, time.perf_counter_ns() - rebuild_start, player.id)
             return maneuverable_territories
         else:
             return player.manoeuvreable_tiles
-    
+
+    # Make/unmake API: apply a single action to the live state and revert it exactly with unmake().
+    # Search agents use this instead of deep copying the Game, its Territories and Players.
+
+    def make_reinforce(self, territory: Territory, num_troops: int) -> None:
+        self.undo_stack.append(("reinforce", self.zobrist_hash, territory, num_troops))
+        territory_key = self.territory_key(territory)
+        territory.increment_troop_count(num_troops)
+        self.zobrist_hash ^= territory_key ^ self.territory_key(territory)
+        return None
+
+    def make_attack_round(self, home_territory: Territory, target_territory: Territory, num_attacking_troops: int, attacker_dice: List[int], defender_dice: List[int]) -> Tuple[bool, int]:
+        # Same resolution as Game.invade: the committed troops leave home and only survive through make_capture
+        if num_attacking_troops <= 0:
+            raise ValueError("Attacking troops must be positive")
+        if len(attacker_dice) != min(num_attacking_troops, 3) or len(defender_dice) != min(target_territory.troop_count, 2):
+            raise ValueError("Dice count does not match the attacking and defending troops")
+
+        attacker_losses, defender_losses = compare_dice(attacker_dice, defender_dice)
+        self.undo_stack.append(("attack", self.zobrist_hash, home_territory, target_territory, num_attacking_troops, defender_losses))
+        self.zobrist_hash ^= self.territory_key(home_territory) ^ self.territory_key(target_territory)
+        home_territory.troop_count -= num_attacking_troops
+        target_territory.troop_count -= defender_losses
+        self.zobrist_hash ^= self.territory_key(home_territory) ^ self.territory_key(target_territory)
+
+        if target_territory.troop_count <= 0:
+            return (True, num_attacking_troops - attacker_losses)
+        return (False, 0)
+
+    def make_capture(self, player: Player, target_territory: Territory, num_troops: int) -> None:
+        previous_owner = target_territory.owner
+        # Agents iterate territories in acquisition order, so unmake puts the target back in its
+        # place rather than at the end
+        position = next(index for index, territory_id in enumerate(previous_owner.personal_territories)
+                        if territory_id == target_territory.id)
+        record = (
+            "capture",
+            self.zobrist_hash,
+            player,
+            target_territory,
+            previous_owner,
+            target_territory.troop_count,
+            self.save_player_caches(player),
+            self.save_player_caches(previous_owner),
+            position,
+            player.territories_version,
+            previous_owner.territories_version
+        )
+        territory_key = self.territory_key(target_territory)
+        # give_player_territory raises before changing anything, so it goes first and the
+        # record is only pushed once the capture has happened
+        player.give_player_territory(target_territory, num_troops)
+        previous_owner.remove_player_territory(target_territory)
+        self.undo_stack.append(record)
+        self.zobrist_hash ^= territory_key ^ self.territory_key(target_territory)
+        self.invalidate_player_caches(player)
+        self.invalidate_player_caches(previous_owner)
+        return None
+
+    def make_manoeuvre(self, source_territory: Territory, destination_territory: Territory, num_troops: int) -> None:
+        # Same rules as Game.manoeuvre, including the punishment for asking for too many troops
+        source_key = self.territory_key(source_territory)
+        if source_territory.get_troop_count() < num_troops:
+            punished = source_territory.get_troop_count() > 1
+            self.undo_stack.append(("punish", self.zobrist_hash, source_territory, punished))
+            if punished:
+                source_territory.decrement_troop_count(1)
+                self.zobrist_hash ^= source_key ^ self.territory_key(source_territory)
+            return None
+
+        self.undo_stack.append(("manoeuvre", self.zobrist_hash, source_territory, destination_territory, num_troops))
+        destination_key = self.territory_key(destination_territory)
+        source_territory.decrement_troop_count(num_troops)
+        destination_territory.increment_troop_count(num_troops)
+        self.zobrist_hash ^= source_key ^ destination_key
+        self.zobrist_hash ^= self.territory_key(source_territory) ^ self.territory_key(destination_territory)
+        return None
+
+    def unmake(self) -> None:
+        record = self.undo_stack.pop()
+        kind = record[0]
+        self.zobrist_hash = record[1]
+        if kind == "reinforce":
+            _, _, territory, num_troops = record
+            territory.troop_count -= num_troops
+        elif kind == "attack":
+            _, _, home_territory, target_territory, num_attacking_troops, defender_losses = record
+            home_territory.troop_count += num_attacking_troops
+            target_territory.troop_count += defender_losses
+        elif kind == "capture":
+            (_, _, player, target_territory, previous_owner, previous_troops, player_caches, previous_owner_caches,
+             position, player_version, previous_owner_version) = record
+            player.remove_player_territory(target_territory)
+            # Only the territories acquired after the target move
+            territories = previous_owner.personal_territories
+            following = list(territories.items())[position:]
+            for territory_id, _ in following:
+                del territories[territory_id]
+            territories[target_territory.id] = target_territory
+            territories.update(following)
+            player.territories_version = player_version
+            previous_owner.territories_version = previous_owner_version
+            target_territory.owner = previous_owner
+            target_territory.troop_count = previous_troops
+            self.restore_player_caches(player, player_caches)
+            self.restore_player_caches(previous_owner, previous_owner_caches)
+        elif kind == "manoeuvre":
+            _, _, source_territory, destination_territory, num_troops = record
+            source_territory.troop_count += num_troops
+            destination_territory.troop_count -= num_troops
+        elif kind == "punish":
+            _, _, source_territory, punished = record
+            if punished:
+                source_territory.troop_count += 1
+        return None
+
+    def territory_key(self, territory: Territory) -> int:
+        owner_slot = 0 if territory.owner is None else territory.owner.id + 1
+        return ZOBRIST_TERRITORIES[territory.id][owner_slot][troop_bucket(territory.troop_count)]
+
+    def cards_key(self, player: Player) -> int:
+        player_cards = ZOBRIST_CARDS[player.id + 1]
+        key = 0
+        for card_index, count in enumerate(player.cards):
+            key ^= player_cards[card_index][min(max(count, 0), ZOBRIST_CARD_BUCKETS - 1)]
+        return key
+
+    def set_current_player(self, player: Player) -> None:
+        if self.current_player is not None:
+            self.zobrist_hash ^= ZOBRIST_CURRENT_PLAYER[self.current_player.id + 1]
+        self.current_player = player
+        if player is not None:
+            self.zobrist_hash ^= ZOBRIST_CURRENT_PLAYER[player.id + 1]
+        return None
+
+    def compute_zobrist_hash(self) -> int:
+        # Full recomputation; every mutation in Game keeps self.zobrist_hash equal to this incrementally
+        zobrist_hash = 0
+        for territory in self.territories.values():
+            zobrist_hash ^= self.territory_key(territory)
+        for player in self.stored_players:
+            zobrist_hash ^= self.cards_key(player)
+        if self.current_player is not None:
+            zobrist_hash ^= ZOBRIST_CURRENT_PLAYER[self.current_player.id + 1]
+        return zobrist_hash
+
+    def save_player_caches(self, player: Player) -> tuple:
+        return (player.personal_territories_hash, player.adjacent_territories_cache, player.manoeuvreable_tiles, player.base_reinforcement)
+
+    def restore_player_caches(self, player: Player, caches: tuple) -> None:
+        player.personal_territories_hash, player.adjacent_territories_cache, player.manoeuvreable_tiles, player.base_reinforcement = caches
+        return None
+
+    def invalidate_player_caches(self, player: Player) -> None:
+        # The territory-derived caches are rebuilt on the next call with changed=True;
+        # clearing the hash makes personal_territories_changed() report the change.
+        player.personal_territories_hash = ""
+        player.adjacent_territories_cache = EMPTY_FRONTIER
+        player.manoeuvreable_tiles = EMPTY_MANOEUVRES
+        player.calculate_base_reinforcement()
+        return None
+
+
+class TerritoryGrid():
+    # Uniform grid over the window; each cell lists the territories whose circle bounds overlap it,
+    # so a hit test only checks the few territories in the cell under the point.
+
+    def __init__(self, territories: Dict[int, Territory], radius: float = 36, cell_size: float = 48):
+        self.radius = radius
+        self.cell_size = cell_size
+        self.columns = int(WIDTH // cell_size) + 1
+        self.rows = int(HEIGHT // cell_size) + 1
+        self.cells = [[] for _ in range(self.columns * self.rows)]
+
+        for territory in territories.values():
+            x_pos, y_pos = territory.get_position()
+            first_column = max(int((x_pos - radius) // cell_size), 0)
+            last_column = min(int((x_pos + radius) // cell_size), self.columns - 1)
+            first_row = max(int((y_pos - radius) // cell_size), 0)
+            last_row = min(int((y_pos + radius) // cell_size), self.rows - 1)
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    self.cells[row * self.columns + column].append(territory)
+
+    def get_territory_at(self, position: Tuple[float, float]) -> Territory:
+        column = int(position[0] // self.cell_size)
+        row = int(position[1] // self.cell_size)
+        if column < 0 or row < 0 or column >= self.columns or row >= self.rows:
+            return None
+
+        radius_squared = self.radius * self.radius
+        for territory in self.cells[row * self.columns + column]:
+            x_offset = position[0] - territory.x_pos
+            y_offset = position[1] - territory.y_pos
+            if x_offset * x_offset + y_offset * y_offset < radius_squared:
+                return territory
+        return None
+
+
+class GameObserver():
+    # Observers attached to Game.observers are notified by play_game
+
+    def on_game_start(self, game: Game) -> None:
+        pass
+
+    def on_turn_start(self, game: Game, player: Player, reinforcement_count: int) -> None:
+        # Called once the player's reinforcements (including any card trade-in) are decided
+        pass
+
+    def on_action(self, game: Game, player: Player, kind: str, source: Territory, target: Territory, count: int) -> None:
+        # kind is "reinforce" (source is None), "attack" (called once the round is resolved), "manoeuvre"
+        # or "manoeuvre_penalty" (asked to move more troops than source has; source lost one)
+        pass
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        pass
+
+    def on_game_end(self, game: Game, winner_id: int) -> None:
+        pass
+
 
 class Drawing():
 
-    def __init__(self):
+    def __init__(self, game: Game):
         pygame.init()
+        self.game = game
+        self.territory_grid = TerritoryGrid(game.territories)
         self.territories = []
         self.font = pygame.font.Font(None, 20)
         self.window = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("Risk Game UI")
 
+        # Static layer (background, connections, Kamchatka-Alaska curve) is rendered once per map,
+        # later frames only repaint the territories that changed and the overlays of the last frame.
+        self.background = None
+        self.map_territories = None
+        self.territory_rects = {}
+        self.drawn_state = {}
+        self.overlay_rects = []
+        self.text_cache = {}
+
 
-    def draw_map(self,territories):
+    def draw_map(self,territories, events = None):
         
-        for event in pygame.event.get():
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = pygame.mouse.get_pos()
-                self.handle_mouse_click(mouse_pos, game)
+                self.handle_mouse_click(mouse_pos, self.game)
                 clicked = True
 
-                
-        self.window.fill(Colour.WHITE.value)
+        if self.background is None or territories is not self.map_territories:
+            self.build_static_layer(territories)
+            self.window.blit(self.background, (0, 0))
+            self.drawn_state = {}
+            self.overlay_rects = []
+            full_redraw = True
+        else:
+            full_redraw = False
 
-        self.draw_connections(territories)
-        self.draw_territories(territories)
+        # Regions under last frame's tooltip and highlights, plus every territory whose owner or troops changed
+        dirty_rects = self.overlay_rects
+        for territory_id, territory in territories.items():
+            if self.drawn_state.get(territory_id) != self.get_territory_state(territory):
+                dirty_rects.append(self.territory_rects[territory_id])
+        self.restore_regions(territories, dirty_rects)
+
+        overlay_rects = []
         mouse_pos = pygame.mouse.get_pos()
         hovered_territory = self.get_hovered_territory(mouse_pos)
         if hovered_territory:
-           self.display_territory_info(hovered_territory, mouse_pos)
-        self.highlight_territories()
-        
+           overlay_rects.append(self.display_territory_info(hovered_territory, mouse_pos))
+        overlay_rects.extend(self.highlight_territories())
+        self.overlay_rects = overlay_rects
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects + overlay_rects)
 
-        pygame.display.flip()
+    def build_static_layer(self, territories: Dict[int, Territory]) -> None:
+        self.background = pygame.Surface(self.window.get_size())
+        self.background.fill(Colour.WHITE.value[0])
+        self.draw_connections(territories, self.background)
+        self.map_territories = territories
 
-    def draw_territories(self, territories : List[Territory]) -> None:
+        self.territory_rects = {}
         for territory_id, territory in territories.items():
-            position = territory.get_position()
-            territory_size = 36
-            pygame.draw.circle(self.window, territory.get_owner().get_colour() if territory.get_owner() else Colour.WHITE.value[0], position, territory_size)
-            pygame.draw.circle(self.window, territory.get_outline_colour(), position, territory_size, 5)
+            rect = pygame.Rect(0, 0, 2 * TERRITORY_DRAW_RADIUS, 2 * TERRITORY_DRAW_RADIUS)
+            rect.center = territory.get_position()
+            self.territory_rects[territory_id] = rect
+        return None
+
+    def restore_regions(self, territories: Dict[int, Territory], rects: List[pygame.Rect]) -> None:
+        # Repaint each rect from the static layer, then redraw, clipped to it, every territory touching it
+        territory_ids = list(self.territory_rects)
+        territory_rect_list = list(self.territory_rects.values())
+        for rect in rects:
+            self.window.set_clip(rect)
+            self.window.blit(self.background, rect, rect)
+            for index in rect.collidelistall(territory_rect_list):
+                self.draw_territory(territories[territory_ids[index]])
+        self.window.set_clip(None)
+        return None
 
-            # Render the text and get its rectangle
-            text = self.font.render(territory.name, True, Colour.BLACK.value)
-            text_rect = text.get_rect(center=position)
+    def get_territory_state(self, territory: Territory) -> tuple:
+        owner = territory.get_owner()
+        return (owner.get_colour() if owner else None, territory.troop_count)
+
+    def render_text(self, text: str) -> pygame.Surface:
+        surface = self.text_cache.get(text)
+        if surface is None:
+            if len(self.text_cache) > 1024:
+                self.text_cache = {}
+            surface = self.font.render(text, True, Colour.BLACK.value[0])
+            self.text_cache[text] = surface
+        return surface
+
+    def draw_territory(self, territory: Territory) -> None:
+        position = territory.get_position()
+        territory_size = 36
+        pygame.draw.circle(self.window, territory.get_owner().get_colour() if territory.get_owner() else Colour.WHITE.value[0], position, territory_size)
+        pygame.draw.circle(self.window, territory.get_outline_colour(), position, territory_size, 5)
+
+        # Name centred on the territory, troop count just below it
+        text = self.render_text(territory.name)
+        self.window.blit(text, text.get_rect(center=position))
+        troop_text = self.render_text(str(territory.troop_count))
+        self.window.blit(troop_text, troop_text.get_rect(center=(position[0], position[1] + self.font.get_height())))
+
+        self.drawn_state[territory.id] = self.get_territory_state(territory)
+        return None
 
-            # Draw the text
-            self.window.blit(text, text_rect)
+    def draw_territories(self, territories : Dict[int, Territory]) -> None:
+        for territory in territories.values():
+            self.draw_territory(territory)
 
-    def draw_quadratic_bezier_curve(self, start_pos : Tuple[int], end_pos : Tuple[int], colour : Tuple[int], width=2, multiplier=1.5) -> None:
+    def draw_quadratic_bezier_curve(self, surface : pygame.Surface, start_pos : Tuple[int], end_pos : Tuple[int], colour : Tuple[int], width=2, multiplier=1.5) -> None:
         points = []
         control_pos = ((start_pos[0] + end_pos[0]) // 2, start_pos[1] - int(100 * multiplier))
         for t in range(0, 101):
@@ -532,11 +1185,11 @@ class Drawing():
             x = (1-t)**2 * start_pos[0] + 2*(1-t)*t * control_pos[0] + t**2 * end_pos[0]
             y = (1-t)**2 * start_pos[1] + 2*(1-t)*t * control_pos[1] + t**2 * end_pos[1]
             points.append((int(x), int(y)))
-        pygame.draw.lines(self.window, colour, False, points, width)
+        pygame.draw.lines(surface, colour, False, points, width)
 
         return None
     
-    def draw_connections(self, territories: Dict[int, Territory]) -> None:
+    def draw_connections(self, territories: Dict[int, Territory], surface: pygame.Surface) -> None:
         for territory_id, territory in territories.items():
             if territory_id == 0:
                 continue  # Skip territory ID 0 since it's not used
@@ -545,21 +1198,15 @@ class Drawing():
                     continue  # Skip the Kamchatka-Alaska connection for now
                 start_pos = territory.get_position()
                 end_pos = territories[neighbor_id].get_position()
-                pygame.draw.line(self.window, Colour.BLACK.value, start_pos, end_pos, 2)
+                pygame.draw.line(surface, Colour.BLACK.value[0], start_pos, end_pos, 2)
         # Draw the curved connection between Kamchatka and Alaska
         kamchatka_pos = territories[30].get_position()
         alaska_pos = territories[43].get_position()
-        self.draw_quadratic_bezier_curve(kamchatka_pos, alaska_pos, Colour.BLACK.value, 2, multiplier=y_height_multiplier)
+        self.draw_quadratic_bezier_curve(surface, kamchatka_pos, alaska_pos, Colour.BLACK.value[0], 2, multiplier=y_height_multiplier)
         return None
 
     def get_hovered_territory(self, mouse_pos):
-        for territory in territories.values():
-            position = territory.get_position()
-            territory_size = 36
-            distance = ((mouse_pos[0] - position[0]) ** 2 + (mouse_pos[1] - position[1]) ** 2) ** 0.5
-            if distance < territory_size:
-                return territory
-        return None
+        return self.territory_grid.get_territory_at(mouse_pos)
 
     def display_territory_info(self, territory, mouse_pos):
         info_text = f"Territory: {territory.name}\nOwner: {territory.get_owner().get_player_name() if territory.get_owner() else 'None'}\nTroop count: {territory.troop_count}"
@@ -570,15 +1217,18 @@ class Drawing():
         text_height = self.font.get_height() * len(lines) + 20
 
         # Draw a white rectangle as the background for the text box
-        pygame.draw.rect(self.window, Colour.WHITE.value[0], (mouse_pos[0] + 10, mouse_pos[1] + 10, text_width, text_height))
-        pygame.draw.rect(self.window, Colour.BLACK.value[0], (mouse_pos[0] + 10, mouse_pos[1] + 10, text_width, text_height), 1)  # Border
+        box_rect = pygame.Rect(mouse_pos[0] + 10, mouse_pos[1] + 10, text_width, text_height)
+        pygame.draw.rect(self.window, Colour.WHITE.value[0], box_rect)
+        pygame.draw.rect(self.window, Colour.BLACK.value[0], box_rect, 1)  # Border
 
         y_offset = 0
         for line in lines:
-            info_surface = self.font.render(line, True, Colour.BLACK.value[0])
+            info_surface = self.render_text(line)
             self.window.blit(info_surface, (mouse_pos[0] + 20, mouse_pos[1] + 20 + y_offset))
             y_offset += self.font.get_height()
 
+        return box_rect
+
     def handle_mouse_click(self, mouse_pos, game):
         clicked_territory = self.get_hovered_territory(mouse_pos)
         if clicked_territory:
@@ -595,22 +1245,28 @@ class Drawing():
                         self.territories = dest_territories
                         break
 
-    def highlight_territories(self):
+    def highlight_territories(self) -> List[pygame.Rect]:
         #print("Highlighting territories:")
+        highlighted_rects = []
         for territory in self.territories:
             #print(territory.name)
             position = territory.get_position()
             territory_size = 40
-            pygame.draw.circle(self.window, Colour.LIME.value, position, territory_size, 5)
+            highlighted_rects.append(pygame.draw.circle(self.window, Colour.LIME.value, position, territory_size, 5))
+        return highlighted_rects
 
 
 class GeneticAlgorithm():
     
         
-    def __init__(self, num_generations : int, population_size : int, game : Game) -> None:
+    def __init__(self, num_generations : int, population_size : int, game : Game, truncate_turns : int = None, outcome_model = None) -> None:
         self.num_generations = num_generations
         self.population_size = population_size
         self.game = game
+        # Truncated evaluation: stop games after truncate_turns and score them with an
+        # OutcomeModel's expected fitness instead of playing them out
+        self.truncate_turns = truncate_turns
+        self.outcome_model = outcome_model
         
         
 
@@ -631,11 +1287,11 @@ class GeneticAlgorithm():
             
         # }
         
+        # Individuals are policies (genomes); evaluate_fitness seats fresh players from them every game
         population = []
         for _ in range(self.population_size):
-            weightings  = [random.random() for _ in range(10)]
-            player = AggressiveAgent(0, starting_infantry_dict[self.game.num_players], weightings)  # Assuming RandomAgent is used for all players
-            population.append(player)
+            weightings = {index: random.random() for index in range(1, 11)}
+            population.append(AgentPolicy(AggressiveAgent, weightings=weightings))
         return population
     
     def evolve(self):
@@ -654,30 +1310,36 @@ class GeneticAlgorithm():
         fitness_scores = []
         start_time = time.time()
         num_games = 10
+        unassigned_units = starting_infantry_dict[game.num_players]
+        stored_players = game.stored_players
 
         for individual in population:
             total_fitness = 0
 
             for _ in range(num_games):
-                # Create a new list of players for each game
-                players = [individual]
-                
-                # Add random players to the game
-                for _ in range(game.num_players-1):
-                    random_player = random.choice(population)
-                    players.append(random_player)
+                # Opponents are drawn from the population too and may share a policy with the
+                # individual or each other; every seat is still its own player
+                policies = [individual] + [random.choice(population) for _ in range(game.num_players - 1)]
+                players = [policy.create_seat(seat, unassigned_units, game.territories) for seat, policy in enumerate(policies)]
+                individual_seat = players[0]
                 game.stored_players = players
 
                 
                 
 
                 # Play the game and get the fitness score
-                winner_id, fitness = game.play_game(players, max_turns=200)
-                total_fitness += fitness[0]  # Assuming we only care about the first player's fitness
+                if self.outcome_model is not None and self.truncate_turns is not None:
+                    game.play_game(players, max_turns=self.truncate_turns)
+                    fitness = self.outcome_model.expected_fitness(game)
+                else:
+                    winner_id, fitness = game.play_game(players, max_turns=200)
+                # Fitness follows stored_players, which play_game may have shuffled
+                total_fitness += fitness[game.stored_players.index(individual_seat)]
 
             # Calculate the average fitness score over the 10 games
             average_fitness = total_fitness / num_games
             fitness_scores.append(average_fitness)
+        game.stored_players = stored_players
         print(time.time()-start_time)
         return fitness_scores
     
@@ -747,11 +1409,17 @@ territories = {
     }
 
 
+def create_territories() -> Dict[int, Territory]:
+    # Fresh, unowned Territory objects; every concurrently running Game needs its own set
+    return {
+        territory_id: Territory(territory.name, territory.x_pos, territory.y_pos, territory.continent, territory.id)
+        for territory_id, territory in territories.items()
+    }
+
 
 
 
 
-player_count = 3
 
 starting_infantry_dict = {
     2: 40,
@@ -761,13 +1429,15 @@ starting_infantry_dict = {
 }
 
 
-players = []
+if __name__ == "__main__":
+    player_count = 3
 
-players.append(RandomAgent(0, starting_infantry_dict[player_count]))
+    players = []
 
-for x in range(1, player_count):
-    players.append(RandomAgent(x, starting_infantry_dict[player_count]))
+    players.append(RandomAgent(0, starting_infantry_dict[player_count]))
 
+    for x in range(1, player_count):
+        players.append(RandomAgent(x, starting_infantry_dict[player_count]))
 
 
 
@@ -776,32 +1446,35 @@ for x in range(1, player_count):
 
 
 
-game = Game(players, territories,  simulating = True)
-win_counts = {}
-for player in game.stored_players:
-    win_counts[player.id] = 0
 
-genetic_algo = GeneticAlgorithm(30, 30, game)
-genetic_algo.evolve()
+    game = Game(players, territories,  simulating = True, latency_tracker = LatencyTracker(), stalemate_rounds = 20)
+    win_counts = {}
+    for player in game.stored_players:
+        win_counts[player.id] = 0
 
-results = []
+    genetic_algo = GeneticAlgorithm(30, 30, game)
+    genetic_algo.evolve()
 
-for x in range(1, 2000):
-    winner_id, fitness = game.play_game(game.stored_players, max_turns= 200)
-    
-    print(f"Game {x}")
-    if winner_id is not None:
-        win_counts[winner_id] += 1
+    results = []
 
+    for x in range(1, 2000):
+        winner_id, fitness = game.play_game(game.stored_players, max_turns= 200)
+
+        print(f"Game {x}")
+        if winner_id is not None:
+            win_counts[winner_id] += 1
+
+
+    print("Win counts:")
+    for player in players:
+        count = win_counts[player.id]
+        print(f"{player.get_player_name()}: {count} wins")
+
+    print(game.latency_tracker.report())
+    print(f"Stalemates: {dict(game.stalemate_stats)}")
 
-print("Win counts:")
-for player in players:
-    count = win_counts[player.id]
-    print(f"{player.get_player_name()}: {count} wins")
 
-    
-    
 
-if not game.simulating:
-    pygame.quit()
-sys.exit()
+    if game.viewer is not None:
+        game.viewer.close()
+    sys.exit()
@@ -0,0 +1,116 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Read-only views of a player's board handed to agents by Game.invade and Game.manoeuvre. They
+# iterate, index and compare like the tuples of (Territory, [Territory]) pairs agents have
+# always received, and add lookups by territory id. A view is built when Game rebuilds the
+# player's cache and returned as is while the cache is current, so a decision allocates nothing.
+# Owners and troops are read from the live Territory objects. When a rebuild is due, agents get a
+# LazyView instead, and the view is only built if the agent looks at it.
+
+
+class TerritoryView(tuple):
+    # Player.territories_version the view was built at; Game sets it, -1 means never built
+    version = -1
+
+    def __new__(cls, pairs: List[Tuple['Territory', List['Territory']]], territories: Dict[int, 'Territory'], related_by_id: Dict[int, List['Territory']]):
+        # related_by_id maps each territory id of pairs to its list, and is filled by Game in the
+        # same loop that builds pairs
+        view = super().__new__(cls, pairs)
+        view.territories = territories
+        view.related_by_id = related_by_id
+        return view
+
+    def __reduce__(self):
+        return (self.__class__, (list(self), self.territories, self.related_by_id), {"version": self.version})
+
+    def includes(self, territory: 'Territory') -> bool:
+        # Whether territory has an entry, i.e. is one of the player's territories
+        return territory.id in self.related_by_id
+
+    def related(self, territory: 'Territory') -> List['Territory']:
+        return self.related_by_id.get(territory.id, [])
+
+    def owner(self, territory_id: int) -> Optional['Player']:
+        return self.territories[territory_id].owner
+
+    def troops(self, territory_id: int) -> int:
+        return self.territories[territory_id].troop_count
+
+
+class FrontierView(TerritoryView):
+    # One pair per owned territory: the territory and its neighbours the player didn't own when
+    # the view was built
+
+    def targets(self, territory: 'Territory') -> List['Territory']:
+        return self.related(territory)
+
+
+class ManoeuvreView(TerritoryView):
+    # One pair per owned territory: the territory and every other territory of its island (the
+    # owned territories connected to it), i.e. where its troops can be manoeuvred
+
+    def __new__(cls, pairs: List[Tuple['Territory', List['Territory']]], territories: Dict[int, 'Territory'], related_by_id: Dict[int, List['Territory']],
+                islands: Dict[int, int]):
+        view = super().__new__(cls, pairs, territories, related_by_id)
+        view.islands = islands
+        return view
+
+    def __reduce__(self):
+        return (self.__class__, (list(self), self.territories, self.related_by_id, self.islands), {"version": self.version})
+
+    def reachable(self, territory: 'Territory') -> List['Territory']:
+        return self.related(territory)
+
+    def can_reach(self, source: 'Territory', destination: 'Territory') -> bool:
+        island = self.islands.get(source.id)
+        return island is not None and source.id != destination.id and self.islands.get(destination.id) == island
+
+
+class LazyView():
+    # Stands in for a FrontierView or ManoeuvreView: build is called on first use and the view it
+    # returns answers everything from then on
+
+    __slots__ = ("build", "view")
+
+    def __init__(self, build: Callable[[], TerritoryView]):
+        self.build = build
+        self.view = None
+
+    def resolve(self) -> TerritoryView:
+        if self.view is None:
+            self.view = self.build()
+        return self.view
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self) -> int:
+        return len(self.resolve())
+
+    def __getitem__(self, index):
+        return self.resolve()[index]
+
+    def __contains__(self, item) -> bool:
+        return item in self.resolve()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyView):
+            other = other.resolve()
+        return self.resolve() == other
+
+    def __hash__(self) -> int:
+        return hash(self.resolve())
+
+    def __repr__(self) -> str:
+        return repr(self.resolve())
+
+    def __reduce__(self):
+        return self.resolve().__reduce__()
+
+
+EMPTY_FRONTIER = FrontierView([], {}, {})
+EMPTY_MANOEUVRES = ManoeuvreView([], {}, {}, {})
@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import types
+from typing import Dict, List, Optional, Tuple
+
+from Heatmap import TerritoryHeatmap
+from RiskUI import ENGINE_VERSION, UNIT_CAP, Game, create_territories, starting_infantry_dict
+from Tournament import AgentConfig, open_pool
+
+
+# A sweep point is a plain dict; anything it leaves out comes from DEFAULT_POINT. "agents" is the
+# seat line-up, as "module.Class" / "name=module.Class" specs or {"name", "agent", "kwargs"} entries,
+# and its length is the player count. "starting_infantry" of None means starting_infantry_dict's
+# value for that player count.
+DEFAULT_POINT = {
+    "agents": ["Agent.RandomAgent"] * 3,
+    "starting_infantry": None,
+    "unit_cap": UNIT_CAP,
+    "max_turns": 200,
+    "stalemate_rounds": None,
+    "games": 100,
+    "seed": 0
+}
+CHUNK_GAMES = 25  # Games per worker job
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_HASHES = {}  # Module names -> source_hash, per process
+
+
+def expand_grid(base: dict, grid: Dict[str, list]) -> List[dict]:
+    # Cartesian product of the grid's value lists, each applied on top of base
+    keys = list(grid)
+    points = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        point = dict(DEFAULT_POINT)
+        point.update(base)
+        point.update(zip(keys, values))
+        points.append(point)
+    return points
+
+
+def agent_config(spec) -> AgentConfig:
+    if isinstance(spec, dict):
+        return AgentConfig(spec["name"], spec["agent"], spec.get("kwargs"))
+    return AgentConfig.parse(spec)
+
+
+def local_source_files(module_names: List[str]) -> List[str]:
+    # The modules' files plus those of every module of this repository they use, found through
+    # their globals (imported modules, and the modules of imported classes and functions).
+    # Imports made inside functions aren't seen; the engine only does that for the viewer.
+    files = set()
+    pending = [importlib.import_module(name) for name in module_names]
+    while pending:
+        module = pending.pop()
+        path = getattr(module, "__file__", None)
+        if path is None:
+            continue
+        path = os.path.abspath(path)
+        if path in files or os.path.dirname(path) != ROOT_DIRECTORY:
+            continue
+        files.add(path)
+        for value in vars(module).values():
+            if isinstance(value, types.ModuleType):
+                pending.append(value)
+            else:
+                owner = sys.modules.get(getattr(value, "__module__", None) or "")
+                if owner is not None:
+                    pending.append(owner)
+    return sorted(files)
+
+
+def source_hash(module_names: Tuple[str, ...]) -> str:
+    cached = SOURCE_HASHES.get(module_names)
+    if cached is None:
+        digest = hashlib.sha256()
+        for path in local_source_files(list(module_names)):
+            digest.update(os.path.basename(path).encode() + b"\0")
+            with open(path, "rb") as file:
+                digest.update(file.read())
+        cached = digest.hexdigest()
+        SOURCE_HASHES[module_names] = cached
+    return cached
+
+
+def point_source_hash(point: dict) -> str:
+    # The engine's source and that of every agent in the line-up
+    agent_modules = {agent_config(spec).class_path.rsplit(".", 1)[0] for spec in point["agents"]}
+    return source_hash(tuple(["RiskUI"] + sorted(agent_modules)))
+
+
+def point_key(point: dict) -> str:
+    # Results depend on the point, the rules and the code of the engine and agents, so all of
+    # them go into the key
+    payload = json.dumps({"point": point, "engine": ENGINE_VERSION, "source": point_source_hash(point)}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def play_chunk(job: Tuple[int, dict, int, int]) -> Tuple[int, dict, TerritoryHeatmap]:
+    point_index, point, first_game, games = job
+    lineup = [agent_config(spec) for spec in point["agents"]]
+    player_count = len(lineup)
+    unassigned_units = point["starting_infantry"] or starting_infantry_dict[player_count]
+    names = [config.name for config in lineup]
+    totals = {
+        "games": 0,
+        "turns": 0,
+        "adjudicated": 0,
+        "stalemates": 0,
+        "seat_wins": [0] * player_count,
+        "agent_wins": {name: 0 for name in names},
+        "agent_fitness": {name: 0 for name in names},
+        "elapsed": 0.0
+    }
+    heatmap = TerritoryHeatmap()
+    start = time.perf_counter()
+    for game_index in range(first_game, first_game + games):
+        random.seed(point["seed"] + game_index)
+        # Rotate the line-up so every agent plays from every seat equally often
+        rotation = game_index % player_count
+        seats = lineup[rotation:] + lineup[:rotation]
+        territories = create_territories()
+        players = [config.create(seat, unassigned_units, territories) for seat, config in enumerate(seats)]
+        heatmap.player_types = {seat: config.name for seat, config in enumerate(seats)}
+        game = Game(players, territories, simulating=True, shuffle_turn_order=False,
+                    stalemate_rounds=point["stalemate_rounds"], unit_cap=point["unit_cap"], heatmap=heatmap)
+        winner_seat, fitness = game.play_game(max_turns=point["max_turns"])
+        # get_fitness follows the rotated turn order, not the seats
+        fitness_by_seat = {player.id: score for player, score in zip(game.stored_players, fitness)}
+
+        totals["games"] += 1
+        totals["turns"] += game.turn_count
+        totals["adjudicated"] += game.turn_count >= point["max_turns"] or game.adjudication is not None
+        totals["stalemates"] += game.adjudication is not None
+        totals["seat_wins"][winner_seat] += 1
+        totals["agent_wins"][seats[winner_seat].name] += 1
+        for seat, config in enumerate(seats):
+            totals["agent_fitness"][config.name] += fitness_by_seat[seat]
+    totals["elapsed"] = time.perf_counter() - start
+    return point_index, totals, heatmap
+
+
+def merge_totals(totals: dict, chunk: dict) -> dict:
+    if totals is None:
+        return chunk
+    for key in ("games", "turns", "adjudicated", "stalemates", "elapsed"):
+        totals[key] += chunk[key]
+    totals["seat_wins"] = [a + b for a, b in zip(totals["seat_wins"], chunk["seat_wins"])]
+    for key in ("agent_wins", "agent_fitness"):
+        for name, value in chunk[key].items():
+            totals[key][name] += value
+    return totals
+
+
+class Sweep():
+    # Runs a list of sweep points over a process pool. Each finished point is written to
+    # cache_directory under point_key, so a rerun only simulates points that are new, have
+    # changed, or were produced by other engine or agent code (see ENGINE_VERSION). Its territory
+    # heatmap is saved alongside, see load_heatmap.
+
+    def __init__(self, points: List[dict], cache_directory: str = "sweep_cache", workers: Optional[int] = None):
+        self.points = points
+        self.cache_directory = cache_directory
+        self.workers = workers or os.cpu_count()
+        self.cache_hits = 0
+
+    def cache_path(self, point: dict) -> str:
+        return os.path.join(self.cache_directory, point_key(point) + ".json")
+
+    def heatmap_path(self, point: dict) -> str:
+        return os.path.join(self.cache_directory, point_key(point) + ".heatmap.npz")
+
+    def load_heatmap(self, point: dict) -> Optional[TerritoryHeatmap]:
+        path = self.heatmap_path(point)
+        if not os.path.exists(path):
+            return None
+        return TerritoryHeatmap.load(path)
+
+    def load_cached(self, point: dict) -> Optional[dict]:
+        path = self.cache_path(point)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)["result"]
+
+    def store(self, point: dict, result: dict, heatmap: TerritoryHeatmap) -> None:
+        # Written to temporary files first so an interrupted sweep never leaves a torn entry. The
+        # heatmap goes first: a result on disk means the point is done.
+        heatmap_path = self.heatmap_path(point)
+        heatmap.save(heatmap_path + ".tmp.npz")
+        os.replace(heatmap_path + ".tmp.npz", heatmap_path)
+        path = self.cache_path(point)
+        with open(path + ".tmp", "w") as file:
+            json.dump({"point": point, "engine": ENGINE_VERSION, "source": point_source_hash(point), "result": result}, file)
+        os.replace(path + ".tmp", path)
+        return None
+
+    def run(self) -> List[dict]:
+        os.makedirs(self.cache_directory, exist_ok=True)
+        results = [self.load_cached(point) for point in self.points]
+        self.cache_hits = sum(result is not None for result in results)
+
+        jobs = []
+        remaining = {}
+        heatmaps = {}
+        for index, point in enumerate(self.points):
+            if results[index] is not None:
+                continue
+            chunks = [(index, point, first, min(CHUNK_GAMES, point["games"] - first)) for first in range(0, point["games"], CHUNK_GAMES)]
+            remaining[index] = len(chunks)
+            heatmaps[index] = TerritoryHeatmap()
+            jobs.extend(chunks)
+
+        if jobs:
+            with open_pool(min(self.workers, len(jobs))) as pool:
+                for index, chunk, heatmap in pool.imap_unordered(play_chunk, jobs):
+                    results[index] = merge_totals(results[index], chunk)
+                    heatmaps[index].merge(heatmap)
+                    remaining[index] -= 1
+                    if remaining[index] == 0:
+                        self.store(self.points[index], results[index], heatmaps.pop(index))
+        return results
+
+    def report(self, results: List[dict]) -> str:
+        # One row per point: the values that vary across the sweep, then the outcome
+        varying = [key for key in DEFAULT_POINT if len({json.dumps(point[key], sort_keys=True) for point in self.points}) > 1]
+        lines = []
+        for point, result in zip(self.points, results):
+            settings = ", ".join(f"{key}={point[key]}" for key in varying) or "base"
+            games = max(result["games"], 1)
+            win_rates = ", ".join(f"{name} {wins / games:.0%}" for name, wins in result["agent_wins"].items())
+            lines.append(
+                f"{settings}\n"
+                f"    {result['games']} games, {result['turns'] / games:.1f} turns, "
+                f"{result['adjudicated'] / games:.0%} adjudicated ({result['stalemates']} stalemates), "
+                f"wins: {win_rates}, {result['elapsed']:.1f}s"
+            )
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a grid of game configurations, caching each point's results")
+    parser.add_argument("sweep", help='JSON file of {"base": {...}, "grid": {"key": [values, ...]}}')
+    parser.add_argument("--cache", default="sweep_cache", help="directory of cached point results")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    arguments = parser.parse_args()
+
+    with open(arguments.sweep) as file:
+        definition = json.load(file)
+    sweep = Sweep(expand_grid(definition.get("base", {}), definition.get("grid", {})), arguments.cache, arguments.workers)
+    start = time.perf_counter()
+    results = sweep.run()
+    print(sweep.report(results))
+    print(f"{len(sweep.points)} points, {sweep.cache_hits} cached, {time.perf_counter() - start:.1f}s")
@@ -2,6 +2,7 @@ from typing import List, Tuple
 
 import numpy as np
 from Agent import Player
+from StateView import FrontierView, ManoeuvreView
 import random
 from enum import Enum
 
@@ -64,16 +65,13 @@ class TallAgent(Player):
         return territory
 
     def reinforce(self, total_reinforcements : int ) -> List[Tuple['Territory', int]]:
-        print(total_reinforcements, "total")
         reinforcement_allocation = []
 
         max_troops_territory = max(self.personal_territories.values(), key=lambda t: t.troop_count)
-        print(max_troops_territory.troop_count,"-pre reinforce")
 
         for neighbours in ADJACENCY_ARRAY[max_troops_territory.id]:
             if neighbours not in self.personal_territories:
                 reinforcement_allocation = [(max_troops_territory, total_reinforcements)]
-                print(1, "   ", reinforcement_allocation)
                 return reinforcement_allocation
 
 
@@ -85,18 +83,15 @@ class TallAgent(Player):
 
         return reinforcement_allocation
 
-    def invade(self, adjacent_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def invade(self, adjacent_territories: FrontierView) -> Tuple['Territory', 'Territory', int]:
         max_troops_territory = max(self.personal_territories.values(), key=lambda t: t.troop_count)
-        print(max_troops_territory.troop_count,"--pre invade-")
         if max_troops_territory.troop_count <= 3:
             return None
 
-        adjacent_enemy_territories = []
-        for territory, adjacents in adjacent_territories:
-            if territory == max_troops_territory:
-                for adjacent in adjacents:
-                    if adjacent.get_owner().id != self.id:
-                        adjacent_enemy_territories.append(adjacent)
+        adjacent_enemy_territories = [
+            adjacent for adjacent in adjacent_territories.targets(max_troops_territory)
+            if adjacent.get_owner().id != self.id
+        ]
 
         if not adjacent_enemy_territories:
             return None
@@ -107,7 +102,7 @@ class TallAgent(Player):
         return max_troops_territory, min_troops_enemy_territory, troops_to_use
 
 
-    def manoeuvre(self, manoeuverable_territories: List[Tuple['Territory', List['Territory']]]) -> Tuple['Territory', 'Territory', int]:
+    def manoeuvre(self, manoeuverable_territories: ManoeuvreView) -> Tuple['Territory', 'Territory', int]:
         # Filter out territories that don't have enough troops to manoeuvre
         valid_manoeuverable_territories = [
             (source, targets) for source, targets in manoeuverable_territories
@@ -119,14 +114,13 @@ class TallAgent(Player):
 
 
         sorted_territories = sorted(self.personal_territories.values(), key=lambda t: t.troop_count, reverse=True)
-        print(sorted_territories[0].troop_count, "++++++", sorted_territories[1].troop_count)
         if len(sorted_territories)>2:
             for neighbours in ADJACENCY_ARRAY[sorted_territories[0].id]:
                 if neighbours not in self.personal_territories:
-                    if (sorted_territories[0],sorted_territories[1]) in valid_manoeuverable_territories:
+                    if sorted_territories[1].troop_count > 1 and manoeuverable_territories.can_reach(sorted_territories[1], sorted_territories[0]):
                         num_troops = sorted_territories[1].troop_count - 1
                         return sorted_territories[1], sorted_territories[0], num_troops
-                    elif (sorted_territories[0],sorted_territories[2]) in valid_manoeuverable_territories:
+                    elif sorted_territories[2].troop_count > 1 and manoeuverable_territories.can_reach(sorted_territories[2], sorted_territories[0]):
                         num_troops = sorted_territories[2].troop_count - 1
                         return sorted_territories[2], sorted_territories[0], num_troops
 
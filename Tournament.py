@@ -0,0 +1,348 @@
+import argparse
+import importlib
+import itertools
+import json
+import math
+import multiprocessing
+import multiprocessing.pool
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from Agent import AgentPolicy, Player
+from ResultStore import ResultWriter
+from RiskUI import Game, create_territories, starting_infantry_dict
+from Trajectory import TrajectoryRecorder, TrajectoryWriter
+
+
+class AgentConfig():
+    # A named agent variant: the Player subclass as "module.Class" plus constructor keyword arguments.
+    # Plain data, so it can be shipped to worker processes.
+
+    def __init__(self, name: str, class_path: str, kwargs: Optional[dict] = None):
+        self.name = name
+        self.class_path = class_path
+        self.kwargs = dict(kwargs or {})
+
+    def policy(self) -> AgentPolicy:
+        module_name, class_name = self.class_path.rsplit(".", 1)
+        return AgentPolicy(getattr(importlib.import_module(module_name), class_name), **self.kwargs)
+
+    def create(self, id: int, unassigned_units: int, territories: Dict[int, 'Territory']) -> Player:
+        return self.policy().create_seat(id, unassigned_units, territories)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'AgentConfig':
+        # "name=module.Class" or just "module.Class"
+        if "=" in spec:
+            name, class_path = spec.split("=", 1)
+        else:
+            name, class_path = spec.rsplit(".", 1)[1], spec
+        return cls(name, class_path)
+
+
+def load_roster(paths_or_specs: List[str]) -> List[AgentConfig]:
+    # A .json file holds a list of {"name", "agent", "kwargs"}; anything else is a single agent spec
+    roster = []
+    for item in paths_or_specs:
+        if item.endswith(".json"):
+            with open(item) as file:
+                roster.extend(AgentConfig(entry["name"], entry["agent"], entry.get("kwargs")) for entry in json.load(file))
+        else:
+            roster.append(AgentConfig.parse(item))
+    return roster
+
+
+def schedule(roster_size: int, players: int, rounds: int) -> List[Tuple[int, ...]]:
+    # Every group of agents plays once from every rotation of the seats, so each agent
+    # moves first, second, ... equally often against each set of opponents
+    if roster_size >= players:
+        groups = list(itertools.combinations(range(roster_size), players))
+    else:
+        groups = [group for group in itertools.combinations_with_replacement(range(roster_size), players) if len(set(group)) > 1]
+    lineups = []
+    for _ in range(rounds):
+        for group in groups:
+            for rotation in range(players):
+                lineups.append(group[rotation:] + group[:rotation])
+    return lineups
+
+
+_trajectory_recorder = None
+
+
+def open_trajectory_shard(directory: str) -> None:
+    # Pool initializer: each worker appends to its own shard of the corpus
+    global _trajectory_recorder
+    _trajectory_recorder = TrajectoryRecorder(TrajectoryWriter(directory, f"worker_{os.getpid()}"))
+    return None
+
+
+def play_match(job: Tuple[int, List[AgentConfig], int, int, Optional[int]]) -> dict:
+    match_index, lineup, seed, max_turns, stalemate_rounds = job
+    random.seed(seed)
+    start = time.perf_counter()
+    territories = create_territories()
+    unassigned_units = starting_infantry_dict[len(lineup)]
+    players = [config.create(seat, unassigned_units, territories) for seat, config in enumerate(lineup)]
+    game = Game(players, territories, simulating=True, shuffle_turn_order=False, stalemate_rounds=stalemate_rounds)
+    if _trajectory_recorder is not None:
+        _trajectory_recorder.game_id = match_index
+        game.observers.append(_trajectory_recorder)
+    winner_seat, fitness = game.play_game(max_turns=max_turns)
+    # get_fitness follows the rotated turn order, agents and winner_seat follow the seats
+    fitness_by_seat = {player.id: score for player, score in zip(game.stored_players, fitness)}
+    return {
+        "match": match_index,
+        "seed": seed,
+        "agents": [config.name for config in lineup],
+        "winner_seat": winner_seat,
+        "fitness": [fitness_by_seat[seat] for seat in range(len(lineup))],
+        "turns": game.turn_count,
+        # The engine names the territory leader as winner when max_turns runs out or the game stalls
+        "adjudicated": game.turn_count >= max_turns or game.adjudication is not None,
+        "stalemate": game.adjudication,
+        "elapsed": time.perf_counter() - start
+    }
+
+
+def open_pool(workers: int, trajectory_directory: Optional[str] = None) -> multiprocessing.pool.Pool:
+    if trajectory_directory is not None:
+        return multiprocessing.get_context("spawn").Pool(workers, open_trajectory_shard, (trajectory_directory,))
+    return multiprocessing.get_context("spawn").Pool(workers)
+
+
+class EloRatings():
+    # Multiplayer Elo: a game is scored as every pair of seats, ranked by final fitness
+    # (the winner's fitness includes the win bonus), with K split over the opponents.
+
+    def __init__(self, names: List[str], initial: float = 1500.0, k_factor: float = 32.0):
+        self.k_factor = k_factor
+        self.ratings = {name: initial for name in names}
+        self.games = {name: 0 for name in names}
+        self.wins = {name: 0 for name in names}
+
+    def expected(self, rating: float, opponent_rating: float) -> float:
+        return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+    def update(self, agents: List[str], fitness: List[int], winner_seat: int) -> None:
+        k = self.k_factor / (len(agents) - 1)
+        deltas = [0.0] * len(agents)
+        for first, second in itertools.combinations(range(len(agents)), 2):
+            if fitness[first] == fitness[second]:
+                score = 0.5
+            else:
+                score = 1.0 if fitness[first] > fitness[second] else 0.0
+            expected = self.expected(self.ratings[agents[first]], self.ratings[agents[second]])
+            deltas[first] += k * (score - expected)
+            deltas[second] -= k * (score - expected)
+        for seat, name in enumerate(agents):
+            self.ratings[name] += deltas[seat]
+            self.games[name] += 1
+        self.wins[agents[winner_seat]] += 1
+        return None
+
+    def standings(self) -> List[Tuple[str, float, int, int]]:
+        return sorted(
+            ((name, rating, self.games[name], self.wins[name]) for name, rating in self.ratings.items()),
+            key=lambda row: -row[1]
+        )
+
+    def report(self) -> str:
+        lines = [f"{'agent':<24} {'elo':>7} {'games':>7} {'wins':>7} {'win %':>7}"]
+        for name, rating, games, wins in self.standings():
+            win_rate = 100 * wins / games if games else 0.0
+            lines.append(f"{name:<24} {rating:>7.1f} {games:>7} {wins:>7} {win_rate:>7.1f}")
+        return "\n".join(lines)
+
+
+class RoundRobin():
+
+    def __init__(self, roster: List[AgentConfig], players: int = 3, rounds: int = 1, max_turns: int = 200, seed: int = 0, workers: Optional[int] = None,
+                 trajectory_directory: Optional[str] = None, stalemate_rounds: Optional[int] = None):
+        names = [config.name for config in roster]
+        if len(set(names)) != len(names):
+            raise ValueError("Agent names in a roster must be unique")
+        self.roster = roster
+        self.players = players
+        self.rounds = rounds
+        self.max_turns = max_turns
+        self.seed = seed
+        self.workers = workers
+        self.trajectory_directory = trajectory_directory
+        self.stalemate_rounds = stalemate_rounds
+        self.ratings = EloRatings(names)
+
+    def jobs(self) -> List[Tuple[int, List[AgentConfig], int, int, Optional[int]]]:
+        return [
+            (match_index, [self.roster[index] for index in lineup], self.seed + match_index, self.max_turns, self.stalemate_rounds)
+            for match_index, lineup in enumerate(schedule(len(self.roster), self.players, self.rounds))
+        ]
+
+    def run(self, on_result: Optional[Callable[[dict], None]] = None) -> EloRatings:
+        # Results arrive in completion order and are rated as they arrive
+        jobs = self.jobs()
+        workers = self.workers or os.cpu_count()
+        chunksize = max(1, len(jobs) // (4 * workers))
+        with open_pool(workers, self.trajectory_directory) as pool:
+            for result in pool.imap_unordered(play_match, jobs, chunksize):
+                self.ratings.update(result["agents"], result["fitness"], result["winner_seat"])
+                if on_result is not None:
+                    on_result(result)
+        return self.ratings
+
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    if trials == 0:
+        return (0.0, 1.0)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(0.0, centre - half_width), min(1.0, centre + half_width))
+
+
+class SPRT():
+    # Wald's sequential probability ratio test on a Bernoulli win rate: H0 p = p0 against H1 p = p1.
+    # status() is "H1", "H0" or None while undecided.
+
+    def __init__(self, p0: float, p1: float, alpha: float = 0.05, beta: float = 0.05):
+        self.win_step = math.log(p1 / p0)
+        self.loss_step = math.log((1 - p1) / (1 - p0))
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.llr = 0.0
+
+    def update(self, wins: int, losses: int) -> None:
+        # A decided test stays decided
+        if self.status() is None:
+            self.llr += wins * self.win_step + losses * self.loss_step
+        return None
+
+    def status(self) -> Optional[str]:
+        if self.llr >= self.upper:
+            return "H1"
+        if self.llr <= self.lower:
+            return "H0"
+        return None
+
+
+class SequentialMatch():
+    # A/B match between two agents that stops as soon as it is significant. Lineups are the
+    # seat-balanced schedule of the pair (e.g. AAB and ABB in every rotation for three players),
+    # so under equal strength the candidate wins half the games. Two one-sided SPRTs run side by
+    # side: candidate better by delta, and baseline better by delta. Games are played in batches
+    # of whole schedules, and the tests are checked after each batch.
+
+    def __init__(self, candidate: AgentConfig, baseline: AgentConfig, players: int = 3, delta: float = 0.05, alpha: float = 0.05, beta: float = 0.05,
+                 max_games: int = 20000, max_turns: int = 200, seed: int = 0, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 stalemate_rounds: Optional[int] = None):
+        if candidate.name == baseline.name:
+            raise ValueError("Candidate and baseline need different names")
+        self.pair = [candidate, baseline]
+        self.lineups = schedule(2, players, 1)
+        self.max_games = max_games
+        self.max_turns = max_turns
+        self.stalemate_rounds = stalemate_rounds
+        self.seed = seed
+        self.workers = workers or os.cpu_count()
+        schedules_per_batch = max(1, (batch_size or 4 * self.workers) // len(self.lineups))
+        self.batch_size = schedules_per_batch * len(self.lineups)
+        self.candidate_better = SPRT(0.5, 0.5 + delta, alpha, beta)
+        self.baseline_better = SPRT(0.5, 0.5 - delta, alpha, beta)
+        self.wins = 0
+        self.games = 0
+
+    def verdict(self) -> Optional[str]:
+        candidate_status = self.candidate_better.status()
+        baseline_status = self.baseline_better.status()
+        if candidate_status == "H1":
+            return f"{self.pair[0].name} is stronger"
+        if baseline_status == "H1":
+            return f"{self.pair[1].name} is stronger"
+        if candidate_status == "H0" and baseline_status == "H0":
+            return "equal within tolerance"
+        return None
+
+    def report(self) -> str:
+        low, high = wilson_interval(self.wins, self.games)
+        rate = self.wins / self.games if self.games else 0.0
+        return (f"{self.pair[0].name} vs {self.pair[1].name}: {self.wins}/{self.games} won by {self.pair[0].name} "
+                f"({rate:.3f}, 95% CI {low:.3f}-{high:.3f}), LLR {self.candidate_better.llr:+.2f}/{self.baseline_better.llr:+.2f} "
+                f"(bounds {self.candidate_better.lower:.2f}, {self.candidate_better.upper:.2f})")
+
+    def run(self, on_batch: Optional[Callable[['SequentialMatch'], None]] = None) -> Optional[str]:
+        match_indexes = itertools.count()
+        with open_pool(self.workers) as pool:
+            while self.games < self.max_games and self.verdict() is None:
+                jobs = []
+                for _ in range(self.batch_size // len(self.lineups)):
+                    for lineup in self.lineups:
+                        match_index = next(match_indexes)
+                        jobs.append((match_index, [self.pair[index] for index in lineup], self.seed + match_index, self.max_turns, self.stalemate_rounds))
+                wins = 0
+                for result in pool.imap_unordered(play_match, jobs):
+                    if result["agents"][result["winner_seat"]] == self.pair[0].name:
+                        wins += 1
+                losses = len(jobs) - wins
+                self.wins += wins
+                self.games += len(jobs)
+                self.candidate_better.update(wins, losses)
+                self.baseline_better.update(wins, losses)
+                if on_batch is not None:
+                    on_batch(self)
+        return self.verdict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seat-balanced round-robin between agent variants on all cores")
+    parser.add_argument("roster", nargs="+", help="roster .json files and/or agent specs (name=module.Class)")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=1, help="times to repeat the full schedule")
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stalemate-rounds", type=int, default=None, help="adjudicate games with no conquest for this many rounds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--report-every", type=int, default=100, help="print standings every n games")
+    parser.add_argument("--results", default=None, help="directory to stream per-game results to (see ResultStore)")
+    parser.add_argument("--trajectories", default=None, help="directory to record full game trajectories to (see Trajectory)")
+    parser.add_argument("--sprt", action="store_true", help="A/B mode for two agents: stop once a sequential test decides")
+    parser.add_argument("--delta", type=float, default=0.05, help="SPRT: win rate margin over 0.5 that counts as stronger")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--max-games", type=int, default=20000, help="SPRT: give up undecided after this many games")
+    arguments = parser.parse_args()
+
+    if arguments.sprt:
+        roster = load_roster(arguments.roster)
+        if len(roster) != 2:
+            parser.error("--sprt needs exactly two agents, candidate first")
+        match = SequentialMatch(roster[0], roster[1], arguments.players, arguments.delta, arguments.alpha, arguments.beta,
+                                arguments.max_games, arguments.max_turns, arguments.seed, arguments.workers,
+                                stalemate_rounds=arguments.stalemate_rounds)
+        verdict = match.run(lambda match: print(match.report()))
+        print(verdict or f"undecided after {match.games} games")
+        sys.exit()
+
+    tournament = RoundRobin(load_roster(arguments.roster), arguments.players, arguments.rounds, arguments.max_turns, arguments.seed, arguments.workers, arguments.trajectories,
+                            arguments.stalemate_rounds)
+    total = len(tournament.jobs())
+    completed = itertools.count(1)
+    writer = ResultWriter(arguments.results) if arguments.results else None
+
+    def progress(result: dict) -> None:
+        if writer is not None:
+            writer.append(result)
+        done = next(completed)
+        if done % arguments.report_every == 0 and done != total:
+            print(f"{done}/{total} games")
+            print(tournament.ratings.report())
+
+    start = time.time()
+    tournament.run(progress)
+    if writer is not None:
+        writer.close()
+    print(f"{total} games in {time.time() - start:.1f}s")
+    print(tournament.ratings.report())
@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import struct
+from collections import Counter
+from typing import Callable, List, Optional, Tuple, Union
+
+from Agent import Player, RandomAgent
+from Latency import LatencyTracker
+from RiskUI import Game, create_territories, starting_infantry_dict
+from StateView import FrontierView, ManoeuvreView
+
+
+# Wire format: 4 byte big-endian length, then a compact JSON object.
+# Server -> agent: {"id", "game", "seat", "method", "args", ["state"]} where state is the
+#                  Game.snapshot() owner and troop vectors, only sent when they changed since
+#                  the last request for that seat.
+#                  {"game", "seat", "method": "end_game"} carries no id and expects no reply.
+# Agent -> server: {"hello": name} once, then {"id", "result"} for every request, in any order.
+FRAME_HEADER = struct.Struct(">I")
+
+
+def encode_frame(message: dict) -> bytes:
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    return json.loads(await reader.readexactly(length))
+
+
+class AgentUnavailable(Exception):
+    pass
+
+
+class AgentConnection():
+    # One agent process. Requests from many game threads are pipelined over the same socket
+    # and matched to their replies by id.
+
+    def __init__(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.pending = {}
+        self.request_ids = itertools.count()
+        self.closed = False
+
+    async def request(self, message: dict) -> object:
+        request_id = next(self.request_ids)
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        try:
+            message["id"] = request_id
+            self.writer.write(encode_frame(message))
+            await self.writer.drain()
+            return await future
+        except ConnectionError:
+            raise AgentUnavailable(self.name)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def notify(self, message: dict) -> None:
+        try:
+            self.writer.write(encode_frame(message))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def read_loop(self) -> None:
+        try:
+            while True:
+                message = await read_frame(self.reader)
+                future = self.pending.get(message["id"])
+                if future is not None and not future.done():
+                    future.set_result(message.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError, json.JSONDecodeError, KeyError):
+            pass
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(AgentUnavailable(self.name))
+            self.writer.close()
+
+    def call(self, message: dict, deadline: float) -> object:
+        # Called from a game thread; blocks until the reply arrives or the deadline passes
+        if self.closed:
+            raise AgentUnavailable(self.name)
+        future = asyncio.run_coroutine_threadsafe(self.request(message), self.loop)
+        try:
+            return future.result(timeout=deadline)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def send(self, message: dict) -> None:
+        if not self.closed:
+            asyncio.run_coroutine_threadsafe(self.notify(message), self.loop)
+
+
+def troop_number(value) -> int:
+    # Troop counts must arrive as JSON integers; anything else is a bad reply
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f"troop count {value!r} is not an integer")
+    return value
+
+
+class RemotePlayer(RandomAgent):
+    # Seat whose decisions are made by an agent process. Missed deadlines, bad replies and
+    # dead connections fall back to the RandomAgent behaviour for that decision. A reply is bad
+    # unless the engine could carry it out as is.
+
+    def __init__(self, id: int, unassigned_units: int, connection: AgentConnection, game_index: int, deadline: float, stats: Counter):
+        super().__init__(id, unassigned_units)
+        self.connection = connection
+        self.game_index = game_index
+        self.deadline = deadline
+        self.stats = stats
+        self.game = None
+        self.sent_state = None
+
+    def call(self, method: str, args: list = None) -> object:
+        # Answered calls are counted by the caller, as accepted ("calls") or not ("bad_replies")
+        message = {"game": self.game_index, "seat": self.id, "method": method, "args": args or []}
+        _, _, owners, troops = self.game.snapshot()
+        if (owners, troops) != self.sent_state:
+            message["state"] = [owners, troops]
+            self.sent_state = (owners, troops)
+        try:
+            return self.connection.call(message, self.deadline)
+        except concurrent.futures.TimeoutError:
+            self.stats[(self.connection.name, "timeouts")] += 1
+        except AgentUnavailable:
+            self.stats[(self.connection.name, "unavailable")] += 1
+        # The agent may not have applied the state, so send it again next time
+        self.sent_state = None
+        raise AgentUnavailable(self.connection.name)
+
+    def accept(self, decision: object) -> object:
+        self.stats[(self.connection.name, "calls")] += 1
+        return decision
+
+    def reject(self) -> None:
+        self.stats[(self.connection.name, "bad_replies")] += 1
+        return None
+
+    def territory(self, territory_id: int) -> 'Territory':
+        return self.game.territories[territory_id]
+
+    def connected(self, source: 'Territory', destination: 'Territory') -> bool:
+        # Whether destination can be reached through this seat's territories as they are now. The
+        # manoeuvre view can't tell: in a turn that reuses the caches it predates the turn's captures.
+        adjacency = self.game.precomputed_adjacent_territories
+        visited = {source.id}
+        pending = [source]
+        while pending:
+            for adjacent in adjacency[pending.pop().id]:
+                if adjacent.owner is self and adjacent.id not in visited:
+                    if adjacent is destination:
+                        return True
+                    visited.add(adjacent.id)
+                    pending.append(adjacent)
+        return False
+
+    def make_selection(self, available_territories: List['Territory']) -> 'Territory':
+        try:
+            reply = self.call("make_selection", [[territory.id for territory in available_territories]])
+        except AgentUnavailable:
+            return super().make_selection(available_territories)
+        try:
+            selected = self.territory(reply)
+            if selected in available_territories:
+                return self.accept(selected)
+        except (KeyError, TypeError):
+            pass
+        self.reject()
+        return super().make_selection(available_territories)
+
+    def add_infantry(self) -> 'Territory':
+        try:
+            reply = self.call("add_infantry")
+        except AgentUnavailable:
+            return super().add_infantry()
+        try:
+            selected = self.territory(reply)
+            if selected.owner is self:
+                return self.accept(selected)
+        except (KeyError, TypeError):
+            pass
+        self.reject()
+        return super().add_infantry()
+
+    def reinforce(self, total_reinforcements: int) -> List[Tuple['Territory', int]]:
+        try:
+            reply = self.call("reinforce", [total_reinforcements])
+        except AgentUnavailable:
+            return super().reinforce(total_reinforcements)
+        try:
+            allocation = [(self.territory(territory_id), troop_number(count)) for territory_id, count in reply]
+            # Every entry places at least one troop, unless there is nothing to place (unit cap)
+            minimum = 1 if total_reinforcements > 0 else 0
+            if (all(territory.owner is self and count >= minimum for territory, count in allocation)
+                    and sum(count for _, count in allocation) == total_reinforcements):
+                return self.accept(allocation)
+        except (KeyError, TypeError, ValueError):
+            pass
+        self.reject()
+        return super().reinforce(total_reinforcements)
+
+    def invade(self, adjacent_territories: FrontierView) -> Tuple['Territory', 'Territory', int]:
+        # Any commitment up to all but one troop is legal; Game.attack_round caps the dice at 3
+        try:
+            reply = self.call("invade")
+        except AgentUnavailable:
+            return super().invade(adjacent_territories)
+        if reply is None:
+            return self.accept(None)
+        try:
+            source_id, target_id, num_troops = reply
+            source, target = self.territory(source_id), self.territory(target_id)
+            num_troops = troop_number(num_troops)
+            if (source.owner is self and target.owner is not self and target in self.game.precomputed_adjacent_territories[source.id]
+                    and 1 <= num_troops <= source.troop_count - 1):
+                return self.accept((source, target, num_troops))
+        except (KeyError, TypeError, ValueError):
+            pass
+        self.reject()
+        return super().invade(adjacent_territories)
+
+    def manoeuvre(self, manoeuverable_territories: ManoeuvreView) -> Tuple['Territory', 'Territory', int]:
+        try:
+            reply = self.call("manoeuvre")
+        except AgentUnavailable:
+            return super().manoeuvre(manoeuverable_territories)
+        try:
+            source_id, destination_id, num_troops = reply
+            if source_id is None:
+                return self.accept((None, None, 0))
+            source, destination = self.territory(source_id), self.territory(destination_id)
+            num_troops = troop_number(num_troops)
+            if (source.owner is self and destination.owner is self and 0 < num_troops < source.troop_count
+                    and self.connected(source, destination)):
+                return self.accept((source, destination, num_troops))
+        except (KeyError, TypeError, ValueError):
+            pass
+        self.reject()
+        return super().manoeuvre(manoeuverable_territories)
+
+    def end_game(self) -> None:
+        self.connection.send({"game": self.game_index, "seat": self.id, "method": "end_game"})
+
+    def get_player_name(self):
+        return (f"{self.connection.name} {self.id}")
+
+
+class TournamentServer():
+    # Hosts many concurrent games, each in its own thread, against agents connected over TCP.
+    # Several processes may connect under the same agent name; each game is pinned to one of them.
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, deadline: float = 1.0, max_concurrent_games: int = 32,
+                 decision_budget: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.deadline = deadline
+        # Per-decision budget for in-process seats; remote seats are bounded by the deadline
+        self.decision_budget = decision_budget
+        self.connections = {}
+        self.stats = Counter()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_concurrent_games)
+        self.game_indexes = itertools.count()
+        self.server = None
+        self.connected = None
+        self.handlers = set()
+
+    async def start(self) -> None:
+        self.connected = asyncio.Condition()
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.handlers.add(asyncio.current_task())
+        try:
+            try:
+                hello = await read_frame(reader)
+            except (asyncio.IncompleteReadError, json.JSONDecodeError):
+                writer.close()
+                return None
+            connection = AgentConnection(hello["hello"], reader, writer, asyncio.get_running_loop())
+            self.connections.setdefault(connection.name, []).append(connection)
+            async with self.connected:
+                self.connected.notify_all()
+            await connection.read_loop()
+            self.connections[connection.name].remove(connection)
+        finally:
+            self.handlers.discard(asyncio.current_task())
+
+    async def wait_for_agents(self, names: List[str], timeout: Optional[float] = None) -> None:
+        async with self.connected:
+            await asyncio.wait_for(self.connected.wait_for(lambda: all(self.connections.get(name) for name in names)), timeout)
+
+    def create_player(self, seat: Union[str, Callable[[int, int], Player]], player_id: int, unassigned_units: int, game_index: int) -> Player:
+        # A seat is either the name of a connected agent or a factory for an in-process Player
+        if callable(seat):
+            return seat(player_id, unassigned_units)
+        connections = self.connections[seat]
+        connection = connections[game_index % len(connections)]
+        return RemotePlayer(player_id, unassigned_units, connection, game_index, self.deadline, self.stats)
+
+    def play_one(self, lineup: List[Union[str, Callable[[int, int], Player]]], max_turns: int) -> dict:
+        game_index = next(self.game_indexes)
+        unassigned_units = starting_infantry_dict[len(lineup)]
+        players = [self.create_player(seat, player_id, unassigned_units, game_index) for player_id, seat in enumerate(lineup)]
+        game = Game(list(players), create_territories(), simulating=True, latency_tracker=LatencyTracker(), decision_budget=self.decision_budget)
+        for player in players:
+            if isinstance(player, RemotePlayer):
+                player.game = game
+        try:
+            winner_id, fitness = game.play_game(max_turns=max_turns)
+        finally:
+            for player in players:
+                if isinstance(player, RemotePlayer):
+                    player.end_game()
+        return {
+            "game": game_index,
+            "lineup": [seat if isinstance(seat, str) else getattr(seat, "__name__", str(seat)) for seat in lineup],
+            "winner_seat": winner_id,
+            "turns": game.turn_count,
+            "fitness": dict(zip((player.id for player in game.stored_players), fitness)),
+            "latency": game.latency_tracker
+        }
+
+    async def run_games(self, lineups: List[List[Union[str, Callable[[int, int], Player]]]], max_turns: int = 200) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(self.executor, self.play_one, lineup, max_turns) for lineup in lineups))
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        for connections in self.connections.values():
+            for connection in connections:
+                connection.writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+
+async def serve(agent_names: List[str], games: int, players: int, port: int, deadline: float, max_turns: int) -> None:
+    server = TournamentServer(port=port, deadline=deadline)
+    await server.start()
+    print(f"Waiting for agents {agent_names} on port {server.port}")
+    await server.wait_for_agents(agent_names)
+
+    # Rotate agents through the seats so no one always moves first
+    lineups = [[agent_names[(game + seat) % len(agent_names)] for seat in range(players)] for game in range(games)]
+    results = await server.run_games(lineups, max_turns)
+
+    wins = Counter(result["lineup"][result["winner_seat"]] for result in results)
+    for name in agent_names:
+        print(f"{name}: {wins[name]} wins")
+    for (name, kind), count in sorted(server.stats.items()):
+        print(f"{name} {kind}: {count}")
+
+    latency = LatencyTracker()
+    for result in results:
+        latency.merge(result["latency"])
+    print(latency.report())
+    await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host games between agents connected with AgentClient.py")
+    parser.add_argument("agents", nargs="+", help="agent names to wait for")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--deadline", type=float, default=1.0, help="seconds allowed per decision")
+    parser.add_argument("--max-turns", type=int, default=200)
+    arguments = parser.parse_args()
+    asyncio.run(serve(arguments.agents, arguments.games, arguments.players, arguments.port, arguments.deadline, arguments.max_turns))
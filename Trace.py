@@ -0,0 +1,78 @@
+import json
+import random
+from typing import List, Optional
+
+
+# Event kinds recorded by Game when a tracer is attached (Game.tracer)
+TURN_START = 0
+PHASE = 1
+ATTACK_ROUND = 2
+CAPTURE = 3
+CACHE_REBUILD = 4
+AGENT_CALL = 5
+EVENT_NAMES = ("turn", "phase", "attack_round", "capture", "cache_rebuild", "agent_call")
+
+
+class GameTracer():
+    # Fixed-capacity ring buffer of (game, kind, name, start_ns, duration_ns, player_id, args)
+    # tuples; once full, the oldest events are overwritten. With sample_rate below 1 only that
+    # fraction of games is traced, chosen when each game starts.
+
+    def __init__(self, capacity: int = 65536, sample_rate: float = 1.0, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.written = 0
+        self.sample_rate = sample_rate
+        self.rng = random.Random(seed)
+        self.game_index = -1
+        self.active = False
+
+    def start_game(self) -> None:
+        self.game_index += 1
+        self.active = self.sample_rate >= 1 or self.rng.random() < self.sample_rate
+        return None
+
+    def record(self, kind: int, name: str, start_ns: int, duration_ns: int, player_id: int, args: Optional[dict] = None) -> None:
+        if self.active:
+            self.buffer[self.written % self.capacity] = (self.game_index, kind, name, start_ns, duration_ns, player_id, args)
+            self.written += 1
+        return None
+
+    def events(self) -> List[tuple]:
+        # Oldest first
+        if self.written <= self.capacity:
+            return self.buffer[:self.written]
+        start = self.written % self.capacity
+        return self.buffer[start:] + self.buffer[:start]
+
+    def clear(self) -> None:
+        self.buffer = [None] * self.capacity
+        self.written = 0
+        return None
+
+    def chrome_events(self) -> List[dict]:
+        # Chrome trace event format (chrome://tracing, ui.perfetto.dev): one process per game,
+        # one thread per player; timestamps in microseconds
+        trace_events = []
+        for game_index, kind, name, start_ns, duration_ns, player_id, args in self.events():
+            event = {
+                "name": name,
+                "cat": EVENT_NAMES[kind],
+                "ts": start_ns / 1000,
+                "pid": game_index,
+                "tid": player_id,
+                "args": args or {}
+            }
+            if duration_ns:
+                event["ph"] = "X"
+                event["dur"] = duration_ns / 1000
+            else:
+                event["ph"] = "i"
+                event["s"] = "t"
+            trace_events.append(event)
+        return trace_events
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, file)
+        return None
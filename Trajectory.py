@@ -0,0 +1,180 @@
+import glob
+import json
+import os
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from Agent import Player
+from RiskUI import Game, GameObserver, Territory, territories
+
+
+# Territory vectors follow the order of RiskUI.territories
+TERRITORY_IDS = list(territories)
+NUM_TERRITORIES = len(TERRITORY_IDS)
+TERRITORY_INDEX = {territory_id: index for index, territory_id in enumerate(TERRITORY_IDS)}
+
+# One fixed-width record per player turn: the board after the turn and what the turn did.
+# A game starts with a record for the board after placement (turn -1, player -1).
+TURN_DTYPE = np.dtype([
+    ("game_id", np.int64),
+    ("turn", np.int32),
+    ("player", np.int8),
+    ("owners", np.int8, (NUM_TERRITORIES,)),
+    ("troops", np.int32, (NUM_TERRITORIES,)),
+    ("reinforcements", np.int16),
+    ("attacks", np.int16),
+    ("troops_committed", np.int32),
+    ("conquests", np.int16),
+    ("manoeuvre_source", np.int8),
+    ("manoeuvre_target", np.int8),
+    ("manoeuvre_troops", np.int32)
+])
+INDEX_DTYPE = np.dtype([
+    ("game_id", np.int64),
+    ("start", np.int64),
+    ("length", np.int32),
+    ("winner", np.int8)
+])
+METADATA = "corpus.json"
+
+
+class TrajectoryWriter():
+    # Appends to one shard (<name>.traj records and <name>.idx index rows) of a corpus directory.
+    # Each worker process writes its own shard, so no locking is needed. A game is written and
+    # flushed when it ends; the index row goes last, so readers only see complete games.
+
+    def __init__(self, directory: str, shard_name: str):
+        os.makedirs(directory, exist_ok=True)
+        metadata_path = os.path.join(directory, METADATA)
+        if not os.path.exists(metadata_path):
+            temporary_path = f"{metadata_path}.{os.getpid()}"
+            with open(temporary_path, "w") as file:
+                json.dump({"territory_ids": TERRITORY_IDS, "turn_dtype": TURN_DTYPE.descr}, file)
+            os.replace(temporary_path, metadata_path)
+        self.records_file = open(os.path.join(directory, f"{shard_name}.traj"), "ab")
+        self.index_file = open(os.path.join(directory, f"{shard_name}.idx"), "ab")
+        self.next_row = self.records_file.tell() // TURN_DTYPE.itemsize
+
+    def write_game(self, records: np.ndarray, winner: int) -> None:
+        self.records_file.write(records.tobytes())
+        self.records_file.flush()
+        index_row = np.array([(records[0]["game_id"], self.next_row, len(records), winner)], dtype=INDEX_DTYPE)
+        self.index_file.write(index_row.tobytes())
+        self.index_file.flush()
+        self.next_row += len(records)
+        return None
+
+    def close(self) -> None:
+        self.records_file.close()
+        self.index_file.close()
+
+
+class TrajectoryRecorder(GameObserver):
+    # Builds the turn records of every game a Game plays and hands them to a TrajectoryWriter.
+    # Set game_id before each play_game, otherwise games are numbered from first_game_id.
+
+    def __init__(self, writer: TrajectoryWriter, first_game_id: int = 0):
+        self.writer = writer
+        self.game_id = None
+        self.next_game_id = first_game_id
+        self.records = []
+        self.current_turn = None
+
+    def new_record(self, game: Game, turn: int, player_id: int) -> np.ndarray:
+        record = np.zeros((), dtype=TURN_DTYPE)
+        record["game_id"] = self.game_id
+        record["turn"] = turn
+        record["player"] = player_id
+        record["manoeuvre_source"] = -1
+        record["manoeuvre_target"] = -1
+        return record
+
+    def fill_board(self, game: Game, record: np.ndarray) -> None:
+        record["owners"] = [-1 if territory.owner is None else territory.owner.id for territory in game.territories.values()]
+        record["troops"] = [territory.troop_count for territory in game.territories.values()]
+        return None
+
+    def on_game_start(self, game: Game) -> None:
+        if self.game_id is None:
+            self.game_id = self.next_game_id
+            self.next_game_id += 1
+        setup = self.new_record(game, -1, -1)
+        self.fill_board(game, setup)
+        self.records = [setup]
+        self.current_turn = self.new_record(game, game.turn_count, -1)
+
+    def on_action(self, game: Game, player: Player, kind: str, source: Territory, target: Territory, count: int) -> None:
+        turn = self.current_turn
+        if kind == "reinforce":
+            turn["reinforcements"] += count
+        elif kind == "attack":
+            turn["attacks"] += 1
+            turn["troops_committed"] += count
+            if target.owner is player:
+                turn["conquests"] += 1
+        elif kind == "manoeuvre":
+            turn["manoeuvre_source"] = TERRITORY_INDEX[source.id]
+            turn["manoeuvre_target"] = TERRITORY_INDEX[target.id]
+            turn["manoeuvre_troops"] = count
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        turn = self.current_turn
+        turn["turn"] = game.turn_count
+        turn["player"] = player.id
+        self.fill_board(game, turn)
+        self.records.append(turn)
+        self.current_turn = self.new_record(game, game.turn_count, -1)
+
+    def on_game_end(self, game: Game, winner_id: int) -> None:
+        self.writer.write_game(np.array(self.records, dtype=TURN_DTYPE), winner_id)
+        self.records = []
+        self.game_id = None
+
+
+class TrajectoryCorpus():
+    # Read side: every shard's records are a numpy.memmap of TURN_DTYPE, and games are
+    # zero-copy slices of it found through the shard indexes.
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, METADATA)) as file:
+            self.territory_ids = json.load(file)["territory_ids"]
+        self.shards = []
+        self.index = {}
+        index_rows = []
+        for records_path in sorted(glob.glob(os.path.join(directory, "*.traj"))):
+            index_path = records_path[:-len(".traj")] + ".idx"
+            rows = np.fromfile(index_path, dtype=INDEX_DTYPE) if os.path.exists(index_path) else np.empty(0, INDEX_DTYPE)
+            if len(rows) == 0:
+                continue
+            # Only rows covered by the index; a crashed writer may have left a partial game behind
+            num_records = int(rows["start"][-1] + rows["length"][-1])
+            shard_number = len(self.shards)
+            self.shards.append(np.memmap(records_path, dtype=TURN_DTYPE, mode="r", shape=(num_records,)))
+            for row in rows:
+                self.index[int(row["game_id"])] = (shard_number, int(row["start"]), int(row["length"]))
+            index_rows.append(rows)
+        self.games = np.concatenate(index_rows) if index_rows else np.empty(0, INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, game_id: int) -> bool:
+        return game_id in self.index
+
+    def game_ids(self) -> List[int]:
+        return list(self.index)
+
+    def game(self, game_id: int) -> np.ndarray:
+        shard_number, start, length = self.index[game_id]
+        return self.shards[shard_number][start:start + length]
+
+    def iter_games(self) -> Iterator[Tuple[int, np.ndarray]]:
+        for game_id in self.index:
+            yield game_id, self.game(game_id)
+
+    def turns(self) -> Iterator[np.ndarray]:
+        # Whole shards, for vectorised passes over every recorded turn
+        for shard in self.shards:
+            yield shard
@@ -0,0 +1,96 @@
+from itertools import product
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# A whole turn decided up front (Player.plan_turn) and executed by Game.execute_plan without
+# further agent calls. Attack steps are repeated invasions under the engine's rules: each round
+# commits troops from the source for one dice round, and committed troops are lost unless that
+# round takes the territory.
+
+class AttackStep():
+
+    def __init__(self, source: 'Territory', target: 'Territory', troops_per_round: int = 3, stop_at: int = 1, min_odds: float = 0.0):
+        # Keep attacking target until it falls, source is down to stop_at troops, or the
+        # odds of taking it this way drop below min_odds
+        self.source = source
+        self.target = target
+        self.troops_per_round = troops_per_round
+        self.stop_at = stop_at
+        self.min_odds = min_odds
+
+    def __repr__(self) -> str:
+        return f"AttackStep({self.source.name} -> {self.target.name}, {self.troops_per_round}/round, stop at {self.stop_at}, odds >= {self.min_odds})"
+
+
+class ManoeuvreStep():
+
+    def __init__(self, source: 'Territory', destination: 'Territory', troops: int):
+        self.source = source
+        self.destination = destination
+        self.troops = troops
+
+    def __repr__(self) -> str:
+        return f"ManoeuvreStep({self.source.name} -> {self.destination.name}, {self.troops})"
+
+
+class TurnPlan():
+
+    def __init__(self, reinforcements: List[Tuple['Territory', int]], attacks: Optional[List[AttackStep]] = None, manoeuvre: Optional[ManoeuvreStep] = None):
+        self.reinforcements = reinforcements
+        self.attacks = attacks or []
+        self.manoeuvre = manoeuvre
+
+
+def _round_outcomes(attacker_dice: int, defender_dice: int) -> List[Tuple[float, int]]:
+    # (probability, defender losses) of one dice round; attacker losses don't matter here
+    counts = {}
+    for roll in product(range(1, 7), repeat=attacker_dice + defender_dice):
+        attacker = sorted(roll[:attacker_dice], reverse=True)
+        defender = sorted(roll[attacker_dice:], reverse=True)
+        defender_losses = sum(1 for a_roll, d_roll in zip(attacker, defender) if a_roll > d_roll)
+        counts[defender_losses] = counts.get(defender_losses, 0) + 1
+    total = 6 ** (attacker_dice + defender_dice)
+    return [(count / total, defender_losses) for defender_losses, count in counts.items()]
+
+
+ROUND_OUTCOMES = {
+    (attacker_dice, defender_dice): _round_outcomes(attacker_dice, defender_dice)
+    for attacker_dice in (1, 2, 3)
+    for defender_dice in (1, 2)
+}
+
+# ODDS_TABLE[troops_per_round][available, defenders]: chance an AttackStep takes the target,
+# where available is the source's troops above stop_at. Counts past the table are clamped.
+MAX_ODDS_TROOPS = 100
+
+
+def _odds_table(troops_per_round: int) -> np.ndarray:
+    table = np.zeros((MAX_ODDS_TROOPS + 1, MAX_ODDS_TROOPS + 1))
+    for available in range(1, MAX_ODDS_TROOPS + 1):
+        committed = min(troops_per_round, available)
+        for defenders in range(1, MAX_ODDS_TROOPS + 1):
+            odds = 0.0
+            for probability, defender_losses in ROUND_OUTCOMES[(min(committed, 3), min(defenders, 2))]:
+                if defender_losses >= defenders:
+                    odds += probability
+                else:
+                    odds += probability * table[available - committed, defenders - defender_losses]
+            table[available, defenders] = odds
+    return table
+
+
+ODDS_TABLE = {troops_per_round: _odds_table(troops_per_round) for troops_per_round in (1, 2, 3)}
+
+
+def conquest_odds(available: int, defenders: int, troops_per_round: int = 3) -> float:
+    if available <= 0:
+        return 0.0
+    if defenders <= 0:
+        return 1.0
+    troops_per_round = max(1, troops_per_round)
+    table = ODDS_TABLE.get(troops_per_round)
+    if table is None:
+        table = ODDS_TABLE[troops_per_round] = _odds_table(troops_per_round)
+    return float(table[min(available, MAX_ODDS_TROOPS), min(defenders, MAX_ODDS_TROOPS)])
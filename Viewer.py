@@ -0,0 +1,140 @@
+import multiprocessing
+import queue
+from typing import Optional, Tuple
+
+import pygame
+
+from Agent import Player
+from RiskUI import Drawing, Game, GameObserver, territories
+
+
+class ReplayPlayer(Player):
+    # Stand-in for a player of another process: only the id (colour) and name are known
+
+    def __init__(self, id: int, name: str):
+        super().__init__(id, 0)
+        self.name = name
+
+    def get_player_name(self):
+        return (self.name)
+
+
+class GameViewer():
+    # Mirrors the engine's state from snapshots and draws it at a capped frame rate.
+    # Space pauses, Right arrow steps one frame while paused, F toggles fast-forward
+    # (jump to the newest snapshot), +/- change the frame rate.
+
+    def __init__(self, fps: int = 10):
+        self.fps = fps
+        self.paused = False
+        self.fast_forward = False
+        self.finished = False
+        self.players_by_id = {}
+        self.game = Game([], territories, simulating=True)
+        self.drawing = Drawing(self.game)
+        self.clock = pygame.time.Clock()
+
+    def apply_message(self, message: Tuple[tuple, tuple]) -> None:
+        player_names, snapshot = message
+        for player_id, name in player_names:
+            player = self.players_by_id.get(player_id)
+            if player is None or player.name != name:
+                self.players_by_id[player_id] = ReplayPlayer(player_id, name)
+        self.game.apply_snapshot(snapshot, self.players_by_id)
+        return None
+
+    def next_message(self, frame_queue: multiprocessing.Queue) -> object:
+        # Returns the next message (the newest one when fast-forwarding) or None when nothing is waiting.
+        # The end-of-stream sentinel sets self.finished.
+        message = None
+        while True:
+            try:
+                received = frame_queue.get_nowait()
+            except queue.Empty:
+                return message
+            if received is None:
+                self.finished = True
+                return message
+            message = received
+            if not self.fast_forward:
+                return message
+
+    def handle_key(self, key: int) -> bool:
+        # Returns True when a single step was requested
+        if key == pygame.K_SPACE:
+            self.paused = not self.paused
+        elif key == pygame.K_f:
+            self.fast_forward = not self.fast_forward
+        elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.fps = min(self.fps * 2, 240)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.fps = max(self.fps // 2, 1)
+        elif key == pygame.K_RIGHT:
+            return True
+        return False
+
+    def run(self, frame_queue: multiprocessing.Queue) -> None:
+        running = True
+        while running:
+            step = False
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    step = self.handle_key(event.key) or step
+
+            if not self.paused or step:
+                message = self.next_message(frame_queue)
+                if message is not None:
+                    self.apply_message(message)
+
+            self.drawing.draw_map(self.game.territories, events)
+            if self.finished:
+                running = False
+            self.clock.tick(self.fps * 4 if self.fast_forward else self.fps)
+        pygame.quit()
+        return None
+
+
+def run_viewer(frame_queue: multiprocessing.Queue, fps: int) -> None:
+    GameViewer(fps).run(frame_queue)
+
+
+class ViewerProcess(GameObserver):
+    # Engine side of the viewer. Snapshots are offered without blocking; when the viewer is
+    # behind (or paused) the queue is full and intermediate frames are dropped.
+
+    def __init__(self, fps: int = 10, queue_size: int = 4):
+        context = multiprocessing.get_context("spawn")
+        self.frame_queue = context.Queue(queue_size)
+        self.process = context.Process(target=run_viewer, args=(self.frame_queue, fps), daemon=True)
+        self.process.start()
+        self.player_names = ()
+        self.sent_frames = 0
+        self.dropped_frames = 0
+
+    def send(self, game: Game) -> None:
+        try:
+            self.frame_queue.put_nowait((self.player_names, game.snapshot()))
+            self.sent_frames += 1
+        except queue.Full:
+            self.dropped_frames += 1
+        return None
+
+    def on_game_start(self, game: Game) -> None:
+        self.player_names = tuple((player.id, player.get_player_name()) for player in game.stored_players)
+        self.send(game)
+
+    def on_turn_end(self, game: Game, player: Player) -> None:
+        self.send(game)
+
+    def close(self, timeout: Optional[float] = 5) -> None:
+        try:
+            self.frame_queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        return None
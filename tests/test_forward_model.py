@@ -0,0 +1,50 @@
+import pytest
+
+import ForwardModel
+from Differential import model_battle, run_battle_check, run_card_check, run_step_check
+from Tournament import AgentConfig
+
+
+# Keeps ForwardModel pinned to Game: the rules must agree step by step, and dice and card draws
+# in distribution. Seeds are fixed, so the statistical checks are deterministic.
+ALPHA = 0.001
+
+
+@pytest.mark.parametrize("lineup", [
+    ["Agent.RandomAgent"] * 3,
+    ["Agent.RandomAgent", "TallAgent.TallAgent", "Agent.RandomAgent", "TallAgent.TallAgent"],
+])
+def test_step_check_finds_no_divergence(lineup):
+    mirror = run_step_check(4, [AgentConfig.parse(spec) for spec in lineup], max_turns=60)
+    assert mirror.steps > 1000
+    assert not mirror.divergence_kinds, mirror.report()
+
+
+def test_step_check_respects_unit_cap():
+    mirror = run_step_check(3, max_turns=60, unit_cap=60)
+    assert not mirror.divergence_kinds, mirror.report()
+
+
+def test_step_check_detects_a_wrong_rule(monkeypatch):
+    monkeypatch.setattr(ForwardModel, "CARD_VALUES", (5, 6, 8, 10))
+    mirror = run_step_check(4, max_turns=100)
+    assert mirror.divergence_kinds
+
+
+def test_battles_match_in_distribution():
+    battles = run_battle_check(4000, attacker_range=(2, 5), defender_range=(1, 3))
+    threshold = ALPHA / (len(battles) + 1)
+    assert all(p_value >= threshold for _, _, _, _, p_value in battles), battles
+
+
+def test_battle_check_detects_a_biased_model():
+    def biased_battle(attackers, defenders, rng):
+        # The attacker gets one extra troop a fifth of the time
+        return model_battle(attackers + (rng.random() < 0.2), defenders, rng)
+
+    battles = run_battle_check(4000, attacker_range=(3, 4), defender_range=(2, 3), candidate=biased_battle)
+    assert min(p_value for _, _, _, _, p_value in battles) < ALPHA / (len(battles) + 1)
+
+
+def test_card_draws_match_in_distribution():
+    assert run_card_check(20000)[2] >= ALPHA
@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from Agent import RandomAgent
+from RiskUI import Game, create_territories
+
+
+def mid_game(seed, rounds=6):
+    random.seed(seed)
+    players = [RandomAgent(player_id, 35) for player_id in range(3)]
+    game = Game(players, create_territories(), simulating=True, shuffle_turn_order=False)
+    game.play_game(max_turns=rounds)
+    return game
+
+
+def position(game):
+    # Everything a make/unmake round trip has to give back, down to the territory order agents
+    # iterate in and the objects the caches hold
+    players = [(
+        player.id,
+        list(player.personal_territories),
+        player.territories_version,
+        player.personal_territories_hash,
+        id(player.adjacent_territories_cache),
+        id(player.manoeuvreable_tiles),
+        player.base_reinforcement,
+        list(player.cards)
+    ) for player in game.stored_players]
+    return game.snapshot(), game.zobrist_hash, players
+
+
+def random_moves(game, count):
+    # Applies up to count random legal make_* moves and returns how many were made
+    made = 0
+    for _ in range(count):
+        player = random.choice([player for player in game.stored_players if player.personal_territories])
+        owned = list(player.personal_territories.values())
+        kind = random.random()
+        if kind < 0.2:
+            game.make_reinforce(random.choice(owned), random.randint(1, 5))
+            made += 1
+            continue
+        if kind < 0.35:
+            source = random.choice(owned)
+            destinations = [t for t in game.precomputed_adjacent_territories[source.id] if t.owner is player]
+            if destinations and source.troop_count > 1:
+                game.make_manoeuvre(source, random.choice(destinations), random.randint(1, source.troop_count))
+                made += 1
+            continue
+        attacks = [(source, target) for source in owned if source.troop_count > 1
+                   for target in game.precomputed_adjacent_territories[source.id] if target.owner is not player]
+        if not attacks:
+            continue
+        source, target = random.choice(attacks)
+        troops = random.randint(1, source.troop_count - 1)
+        attacker_dice = [random.randint(1, 6) for _ in range(min(troops, 3))]
+        defender_dice = [random.randint(1, 6) for _ in range(min(target.troop_count, 2))]
+        captured, survivors = game.make_attack_round(source, target, troops, attacker_dice, defender_dice)
+        made += 1
+        if captured and survivors > 0:
+            game.make_capture(player, target, survivors)
+            made += 1
+    return made
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_round_trip_restores_position(seed):
+    game = mid_game(seed)
+    for player in game.stored_players:
+        game.get_enemy_adjacent_territories(player, True)
+        game.get_manoeuvreable_territories(player, True)
+    before = position(game)
+    made = random_moves(game, 60)
+    for _ in range(made):
+        game.unmake()
+    assert game.undo_stack == []
+    assert position(game) == before
+
+
+def test_capture_of_an_early_territory_keeps_acquisition_order():
+    game = mid_game(1)
+    # A territory from the middle of its owner's order, so a plain re-insert would move it
+    defender = max(game.stored_players, key=lambda player: len(player.personal_territories))
+    target = list(defender.personal_territories.values())[len(defender.personal_territories) // 2]
+    attacker = next(player for player in game.stored_players if player is not defender)
+    order = list(defender.personal_territories)
+    versions = (attacker.territories_version, defender.territories_version)
+
+    target.troop_count = 1
+    source = next(iter(attacker.personal_territories.values()))
+    source.troop_count += 3
+    game.make_attack_round(source, target, 3, [6, 6, 6], [1])
+    game.make_capture(attacker, target, 3)
+    assert target.owner is attacker and target.id not in defender.personal_territories
+    game.unmake()
+    game.unmake()
+
+    assert target.owner is defender
+    assert list(defender.personal_territories) == order
+    assert (attacker.territories_version, defender.territories_version) == versions
+
+
+def test_rejected_capture_leaves_no_trace():
+    game = mid_game(2)
+    defender, attacker = game.stored_players[:2]
+    target = next(iter(defender.personal_territories.values()))
+    before = position(game)
+    with pytest.raises(ArithmeticError):
+        game.make_capture(attacker, target, 0)
+    assert game.undo_stack == []
+    assert position(game) == before
+
+
+def test_search_with_unmake_leaves_seeded_game_unchanged():
+    # A search that explores and fully unwinds between turns must not change how the game continues
+    results = []
+    for search in (False, True):
+        game = mid_game(7, rounds=3)
+        if search:
+            random.seed(99)
+            made = random_moves(game, 200)
+            for _ in range(made):
+                game.unmake()
+        random.seed(5)
+        results.append(game.play_rounds(list(game.stored_players), max_turns=40))
+    assert results[0] == results[1]
@@ -0,0 +1,40 @@
+from Agent import Player
+from RiskUI import create_territories
+
+
+def dealt_player(territory_ids):
+    territories = create_territories()
+    player = Player(0, 10)
+    for territory_id in territory_ids:
+        player.give_player_territory(territories[territory_id], 1)
+    return player, territories
+
+
+def test_unchanged_territories_keep_the_caches():
+    player, _ = dealt_player([1, 3, 4])
+    assert player.personal_territories_changed()
+    assert not player.personal_territories_changed()
+
+
+# The caches follow territories_version, not the set's contents: any gain, loss or reset
+# rebuilds them, even when the set ends up as it was.
+def test_losing_and_regaining_a_territory_rebuilds_the_caches():
+    player, territories = dealt_player([1, 3, 4])
+    player.personal_territories_changed()
+    player.remove_player_territory(territories[3])
+    player.give_player_territory(territories[3], 1)
+    assert set(player.personal_territories) == {1, 3, 4}
+    assert player.personal_territories_changed()
+
+
+def test_reset_rebuilds_the_caches():
+    player, territories = dealt_player([1, 3, 4])
+    player.personal_territories_changed()
+    player.reset()
+    for territory_id in [1, 3, 4]:
+        player.give_player_territory(territories[territory_id], 1)
+    assert player.personal_territories_changed()
+    player.reset()
+    player.personal_territories_changed()
+    player.reset()
+    assert player.personal_territories_changed()
@@ -0,0 +1,17 @@
+import random
+
+from Agent import RandomAgent
+from ResultStore import ResultReader, ResultRecorder, ResultWriter
+from RiskUI import Game, create_territories
+
+
+def test_recorder_reads_the_turn_cap_the_game_was_played_with(tmp_path):
+    # Far below ResultRecorder's old default of 200, so a capped game must come from the game itself
+    random.seed(0)
+    with ResultWriter(str(tmp_path)) as writer:
+        players = [RandomAgent(player_id, 35) for player_id in range(3)]
+        game = Game(players, create_territories(), simulating=True, shuffle_turn_order=False)
+        game.observers.append(ResultRecorder(writer))
+        game.play_game(max_turns=5)
+    assert game.turn_count == 5
+    assert ResultReader(str(tmp_path)).column("adjudicated").tolist() == [True]
@@ -0,0 +1,10 @@
+from RiskUI import Game
+from Sweep import DEFAULT_POINT, play_chunk
+
+
+def test_play_chunk_credits_fitness_to_the_seated_agent(monkeypatch):
+    # With 4 players the selection phase leaves the turn order at [2, 3, 0, 1]
+    monkeypatch.setattr(Game, "get_fitness", lambda game, best_player: [10 * player.id for player in game.stored_players])
+    point = dict(DEFAULT_POINT, agents=[f"random_{seat}=Agent.RandomAgent" for seat in range(4)], max_turns=20)
+    _, totals, _ = play_chunk((0, point, 0, 1))
+    assert totals["agent_fitness"] == {"random_0": 0, "random_1": 10, "random_2": 20, "random_3": 30}
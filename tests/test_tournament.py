@@ -0,0 +1,27 @@
+from RiskUI import Game
+from Tournament import AgentConfig, EloRatings, play_match
+
+
+def lineup(players):
+    return [AgentConfig(f"random_{seat}", "Agent.RandomAgent") for seat in range(players)]
+
+
+def test_play_match_reports_fitness_in_seat_order(monkeypatch):
+    # With 4 players the selection phase leaves the turn order at [2, 3, 0, 1]
+    monkeypatch.setattr(Game, "get_fitness", lambda game, best_player: [10 * player.id for player in game.stored_players])
+    result = play_match((0, lineup(4), 7, 20, None))
+    assert result["fitness"] == [0, 10, 20, 30]
+
+
+def test_play_match_gives_the_win_bonus_to_the_winning_seat():
+    for seed in range(3):
+        result = play_match((seed, lineup(4), seed, 30, None))
+        assert result["fitness"][result["winner_seat"]] >= 20
+
+
+def test_elo_rewards_the_winning_seat_of_a_four_player_match():
+    result = play_match((0, lineup(4), 3, 30, None))
+    ratings = EloRatings(result["agents"])
+    ratings.update(result["agents"], result["fitness"], result["winner_seat"])
+    winner = result["agents"][result["winner_seat"]]
+    assert ratings.ratings[winner] == max(ratings.ratings.values()) > 1500
@@ -0,0 +1,178 @@
+import random
+from collections import Counter
+
+import pytest
+
+from Agent import RandomAgent
+from RiskUI import Game, create_territories
+from TournamentServer import AgentUnavailable, RemotePlayer
+
+
+class ScriptedConnection():
+    # Stands in for AgentConnection: every call answers with the next scripted reply
+
+    name = "scripted"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def call(self, message, deadline):
+        reply = self.replies.pop(0)
+        if reply is AgentUnavailable:
+            raise AgentUnavailable(self.name)
+        return reply
+
+    def send(self, message):
+        pass
+
+
+def board(replies):
+    # The remote seat holds Alaska (1) with 5 troops and Alberta (3) with 4, the other seat
+    # everything else with 2 each
+    random.seed(0)
+    territories = create_territories()
+    remote = RemotePlayer(0, 0, ScriptedConnection(replies), 0, 1.0, Counter())
+    other = RandomAgent(1, 0)
+    for territory in territories.values():
+        owner = remote if territory.id in (1, 3) else other
+        owner.give_player_territory(territory, 2)
+    territories[1].set_troop_count(5)
+    territories[3].set_troop_count(4)
+    game = Game([remote, other], territories, simulating=True, shuffle_turn_order=False)
+    remote.game = game
+    return game, remote, territories
+
+
+def enemy_neighbour(game, territory_id, player):
+    return next(t for t in game.precomputed_adjacent_territories[territory_id] if t.owner is not player)
+
+
+def test_reinforce_accepts_exact_positive_allocation():
+    game, remote, territories = board([[[1, 2], [3, 1]]])
+    assert remote.reinforce(3) == [(territories[1], 2), (territories[3], 1)]
+
+
+@pytest.mark.parametrize("reply", [
+    [[1, 4], [3, -1]],      # negative count keeping the sum right
+    [[1, 0], [3, 3]],       # empty entry
+    [[1, 2]],               # too few
+    [[1, 2], [3, 2]],       # too many
+    [[1, 2.5], [3, 0.5]],   # not integers
+    [[2, 3]],               # not owned
+    [[1]],                  # malformed entry
+    None,
+    AgentUnavailable,
+])
+def test_reinforce_falls_back_on_bad_reply(reply):
+    game, remote, territories = board([reply])
+    allocation = remote.reinforce(3)
+    assert sum(count for _, count in allocation) == 3
+    assert all(territory.owner is remote and count >= 1 for territory, count in allocation)
+
+
+@pytest.mark.parametrize("troops", [1, 3, 4])
+def test_invade_accepts_valid_attack(troops):
+    # Up to all but one troop may be committed; only the dice are capped at 3
+    game, remote, territories = board([])
+    target = enemy_neighbour(game, 1, remote)
+    remote.connection.replies = [[1, target.id, troops]]
+    assert remote.invade(game.get_enemy_adjacent_territories(remote, True)) == (territories[1], target, troops)
+    assert remote.stats == Counter({("scripted", "calls"): 1})
+
+
+@pytest.mark.parametrize("troops", [0, -2, 5, 100, 2.0, True, "3"])
+def test_invade_falls_back_on_bad_troop_count(troops):
+    game, remote, territories = board([])
+    target = enemy_neighbour(game, 1, remote)
+    remote.connection.replies = [[1, target.id, troops]]
+    frontier = game.get_enemy_adjacent_territories(remote, True)
+    invasion = remote.invade(frontier)
+    # RandomAgent's answer: everything but one troop from Alaska, its largest territory
+    assert invasion is not None and invasion[0] is territories[1] and invasion[2] == 4
+    assert invasion[1] in frontier.targets(territories[1])
+
+
+def test_invade_falls_back_on_bad_territories():
+    game, remote, territories = board([])
+    far_enemy = next(t for t in territories.values() if t.owner is not remote and t not in game.precomputed_adjacent_territories[1])
+    frontier = game.get_enemy_adjacent_territories(remote, True)
+    for reply in ([1, 3, 1], [2, 1, 1], [1, far_enemy.id, 1], [1, 999, 1], [1, 2], AgentUnavailable):
+        remote.connection.replies = [reply]
+        invasion = remote.invade(frontier)
+        assert invasion[1].owner is not remote and invasion[1] in frontier.targets(invasion[0])
+
+
+def test_bad_invade_replies_cannot_break_a_game():
+    # Every reply is invalid; the game must still run to completion on the fallbacks
+    game, remote, territories = board([])
+    remote.connection = ScriptedConnection([[1, 2, 0], [1, 2, 50], [[1, -5], [3, 10]], [1, 3, 99], "junk"] * 2000)
+    winner, fitness = game.play_rounds([remote, game.stored_players[1]], max_turns=20)
+    assert all(territory.troop_count >= 0 for territory in territories.values())
+
+
+def test_manoeuvre_accepts_valid_move():
+    game, remote, territories = board([[1, 3, 4]])
+    assert remote.manoeuvre(game.get_manoeuvreable_territories(remote, True)) == (territories[1], territories[3], 4)
+
+
+@pytest.mark.parametrize("reply", [
+    [1, 3, 0],      # nothing to move
+    [1, 3, 5],      # would empty the source
+    [1, 3, -1],
+    [1, 3, 1.5],
+    [1, 2, 1],      # destination not owned
+    [2, 1, 1],      # source not owned
+    [1, 1, 1],      # not a move
+    [1, 999, 1],
+    [1, 3],
+    AgentUnavailable,
+])
+def test_manoeuvre_falls_back_on_bad_reply(reply):
+    game, remote, territories = board([reply])
+    manoeuvres = game.get_manoeuvreable_territories(remote, True)
+    source, destination, num_troops = remote.manoeuvre(manoeuvres)
+    assert source.owner is remote and destination in manoeuvres.reachable(source)
+    assert 0 < num_troops < source.troop_count
+
+
+def test_manoeuvre_rejects_unconnected_destination():
+    game, remote, territories = board([])
+    # Give the remote seat a third territory that isn't connected to Alaska and Alberta
+    island = next(t for t in territories.values() if t.owner is not remote and
+                  not any(n.id in (1, 3) for n in game.precomputed_adjacent_territories[t.id]))
+    island.owner.remove_player_territory(island)
+    remote.give_player_territory(island, 3)
+    remote.connection.replies = [[1, island.id, 1]]
+    manoeuvres = game.get_manoeuvreable_territories(remote, True)
+    source, destination, num_troops = remote.manoeuvre(manoeuvres)
+    assert destination is not island
+
+
+def test_stats_separate_accepted_rejected_and_missing_replies():
+    game, remote, territories = board([])
+    target = enemy_neighbour(game, 1, remote)
+    remote.connection.replies = [[1, target.id, 2], None, [1, target.id, 5], [1, 3, 0], AgentUnavailable, [[1, 3]]]
+    frontier = game.get_enemy_adjacent_territories(remote, True)
+    for _ in range(4):
+        remote.invade(frontier)
+    remote.manoeuvre(game.get_manoeuvreable_territories(remote, True))
+    remote.reinforce(3)
+    assert remote.stats == Counter({("scripted", "calls"): 3, ("scripted", "bad_replies"): 2, ("scripted", "unavailable"): 1})
+
+
+def test_reinforce_accepts_empty_placement_when_capped():
+    # With nothing to place (the unit cap), RandomAgent and friends answer with a zero count
+    game, remote, territories = board([[[1, 0]]])
+    assert remote.reinforce(0) == [(territories[1], 0)]
+    assert remote.stats == Counter({("scripted", "calls"): 1})
+
+
+def test_manoeuvre_accepts_route_through_a_capture_the_view_predates():
+    game, remote, territories = board([])
+    manoeuvres = game.get_manoeuvreable_territories(remote, True)
+    # Capture a territory next to Alaska after the view was built, as happens in turns that reuse it
+    captured = enemy_neighbour(game, 1, remote)
+    captured.owner.remove_player_territory(captured)
+    remote.give_player_territory(captured, 1)
+    remote.connection.replies = [[1, captured.id, 2]]
+    assert remote.manoeuvre(manoeuvres) == (territories[1], captured, 2)